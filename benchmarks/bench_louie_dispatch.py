@@ -0,0 +1,80 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Copyright 2024, Alex Zhornyak, alexander.zhornyak@gmail.com
+
+""" louie dispatcher.send throughput with 0, 1 and 10 receivers
+
+Usage: python benchmarks/bench_louie_dispatch.py [-n SENDS]
+   or: blender -b --python benchmarks/bench_louie_dispatch.py -- [-n SENDS]
+"""
+
+import os
+import sys
+from timeit import default_timer as timer
+
+s_blend_scxml_path = os.path.join(os.path.dirname(__file__), "..", "src")
+sys.path.append(s_blend_scxml_path)
+
+from blend_scxml.louie import dispatcher  # noqa: E402
+from blend_scxml.consts import DispatcherConstants  # noqa: E402
+
+
+class Sender(object):
+    pass
+
+
+class Receiver(object):
+    def __init__(self):
+        self.count = 0
+
+    def on_enter(self, sender, state):
+        self.count += 1
+
+
+def run(receiver_count, sends):
+    dispatcher.reset()
+
+    sender = Sender()
+    receivers = [Receiver() for _ in range(receiver_count)]
+    for receiver in receivers:
+        dispatcher.connect(receiver.on_enter, DispatcherConstants.enter_state, sender)
+
+    send = dispatcher.send
+    signal = DispatcherConstants.enter_state
+
+    start = timer()
+    for _ in range(sends):
+        send(signal, sender, state="s")
+    elapsed = timer() - start
+
+    assert all(receiver.count == sends for receiver in receivers)
+    return elapsed
+
+
+if __name__ == "__main__":
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]
+
+    n_sends = 100000
+    for idx, arg in enumerate(argv):
+        if arg == "-n":
+            n_sends = int(argv[idx + 1])
+
+    for receiver_count in (0, 1, 10):
+        elapsed = run(receiver_count, n_sends)
+        print(f"{receiver_count:>3} receivers: {elapsed:.3f}s, {n_sends / elapsed:.0f} sends/s")
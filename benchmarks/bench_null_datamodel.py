@@ -0,0 +1,82 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Copyright 2024, Alex Zhornyak, alexander.zhornyak@gmail.com
+
+""" Null vs Python datamodel on a pure control-flow chart
+
+Usage: blender -b --python benchmarks/bench_null_datamodel.py -- [-n EVENTS] [-r REGIONS]
+"""
+
+import os
+import sys
+from timeit import default_timer as timer
+
+s_blend_scxml_path = os.path.join(os.path.dirname(__file__), "..", "src")
+sys.path.append(s_blend_scxml_path)
+
+from blend_scxml.py_blend_scxml import StateMachine  # noqa: E402
+
+
+def make_chart(datamodel, regions):
+    t_regions = []
+    for i in range(regions):
+        t_regions.append(
+            f'<state id="r{i}">'
+            f'<state id="r{i}_a"><transition event="tick" target="r{i}_b"/></state>'
+            f'<state id="r{i}_b"><transition event="tick" cond="In(\'r{(i + 1) % regions}_b\')" target="r{i}_a"/>'
+            f'<transition event="tick" target="r{i}_c"/></state>'
+            f'<state id="r{i}_c"><transition cond="In(\'r{i}_c\')" target="r{i}_a"/></state>'
+            f'</state>')
+
+    return (
+        f'<scxml xmlns="http://www.w3.org/2005/07/scxml" version="1.0" datamodel="{datamodel}">'
+        f'<parallel id="p">{"".join(t_regions)}</parallel>'
+        '</scxml>')
+
+
+def run(datamodel, regions, events):
+    sm = StateMachine(make_chart(datamodel, regions), setup_session=False)
+    sm._start()
+    interpreter = sm.interpreter
+
+    start = timer()
+    for _ in range(events):
+        sm.send("tick")
+        interpreter.externalQueueGuard = False
+        interpreter.mainEventLoop()
+        interpreter.mainEventLoop()
+    return timer() - start
+
+
+if __name__ == "__main__":
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+
+    n_events = 2000
+    n_regions = 10
+    for idx, arg in enumerate(argv):
+        if arg == "-n":
+            n_events = int(argv[idx + 1])
+        elif arg == "-r":
+            n_regions = int(argv[idx + 1])
+
+    t_results = {datamodel: run(datamodel, n_regions, n_events) for datamodel in ("python", "null")}
+
+    for datamodel, elapsed in t_results.items():
+        print(f"{datamodel:>8}: {elapsed:.3f}s, {n_events / elapsed:.0f} events/s")
+    print(f" speedup: {t_results['python'] / t_results['null']:.2f}x")
@@ -0,0 +1,268 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Copyright 2024, Alex Zhornyak, alexander.zhornyak@gmail.com
+
+""" Microbenchmarks of the interpreter primitives
+
+The hot functions run on the started machines of the unittest_xml fixtures
+and of a synthetic chart (see chart_generator), the time per call is the
+best of REPEATS runs. The fixtures are always taken from this checkout, so
+'-src' measures the code of another checkout on the same inputs:
+
+Usage: blender -b --python benchmarks/bench_primitives.py -- [-src SRC_DIR] [-r REPEATS] [-k FILTER] [-o JSON_OUTPUT]
+       python benchmarks/bench_primitives.py -- -compare BASE_JSON NEW_JSON [-t THRESHOLD_PERCENT]
+"""
+
+import os
+import sys
+import json
+import time
+import timeit
+import platform
+import logging
+from xml.etree import ElementTree as etree
+
+s_benchmarks_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(s_benchmarks_path)
+
+FIXTURES = ("all_configs.scxml", "history.scxml", "cross_parallel.scxml", "parallel4.scxml", "issue_626.scxml")
+
+
+def receiver(**kwargs):
+    pass
+
+
+def drain(interpreter):
+    '''steps the interpreter until its queues are empty, only the API of the older checkouts is used'''
+    interpreter.externalQueueGuard = False
+    while interpreter.running and not interpreter.externalQueueGuard:
+        interpreter.mainEventLoop()
+
+
+def bench(func, repeat, min_time=0.02):
+    '''returns the best time per call in nanoseconds'''
+    number = 1
+    while True:
+        elapsed = timeit.timeit(func, number=number)
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= 2
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1e9
+
+
+def load_fixture(filepath):
+    from blend_scxml.py_blend_scxml import StateMachine
+
+    sm = StateMachine(filepath, setup_session=False, log_function=lambda label, msg: None)
+    sm._start()
+    drain(sm.interpreter)
+    return sm
+
+
+def fixture_benchmarks(sm, name, repeat):
+    from blend_scxml.interpreter import nameMatch
+    from blend_scxml.eventprocessor import Event
+
+    interpreter = sm.interpreter
+    t_transitions = [t for node in sm.doc.stateDict.values() for t in getattr(node, "transition", ())]
+    t_events = sorted({".".join(e) for t in t_transitions for e in (t.event or [])})
+    t_event_objects = [Event(x.split(".")) for x in t_events] or [Event(["none"])]
+    t_tokens = [x.name.split(".") for x in t_event_objects]
+    t_descriptors = [t.event for t in t_transitions if t.event]
+    t_targeted = [t for t in t_transitions if t.target]
+
+    def select():
+        for event in t_event_objects:
+            interpreter.selectTransitions(event)
+
+    t_enabled = [interpreter.selectTransitions(event) for event in t_event_objects]
+
+    def remove_conflicting():
+        for enabled in t_enabled:
+            interpreter.removeConflictingTransitions(enabled)
+
+    def name_match():
+        for descriptor in t_descriptors:
+            for tokens in t_tokens:
+                nameMatch(descriptor, tokens)
+
+    def find_lcca():
+        for t in t_targeted:
+            interpreter.findLCCA([t.source] + interpreter.getTargetStates(t.target))
+
+    return {
+        f"selectTransitions[{name}]": bench(select, repeat) / len(t_event_objects),
+        f"selectEventlessTransitions[{name}]": bench(interpreter.selectEventlessTransitions, repeat),
+        f"removeConflictingTransitions[{name}]": bench(remove_conflicting, repeat) / len(t_enabled),
+        f"nameMatch[{name}]": bench(name_match, repeat) / max(1, len(t_descriptors) * len(t_tokens)),
+        f"findLCCA[{name}]": bench(find_lcca, repeat) / max(1, len(t_targeted)),
+    }
+
+
+def transition_benchmarks(repeat, n_cycles=2000):
+    '''exitStates and enterStates of the 'tick' transitions of the synthetic chart'''
+    from blend_scxml.py_blend_scxml import StateMachine
+    from blend_scxml.eventprocessor import Event
+    from chart_generator import make_chart
+
+    sm = StateMachine(
+        make_chart(depth=4, width=4, transitions=2), setup_session=False, log_function=lambda label, msg: None)
+    sm._start()
+    drain(sm.interpreter)
+    interpreter = sm.interpreter
+    event = Event(["tick"])
+
+    p_best = {"exitStates[synthetic]": None, "enterStates[synthetic]": None}
+    clock = time.perf_counter_ns
+    for _ in range(repeat):
+        exit_ns = enter_ns = 0
+        for _ in range(n_cycles):
+            enabled = interpreter.selectTransitions(event)
+            start = clock()
+            interpreter.exitStates(enabled)
+            middle = clock()
+            interpreter.enterStates(enabled)
+            exit_ns += middle - start
+            enter_ns += clock() - middle
+        interpreter.statesToInvoke.clear()
+        for key, value in (("exitStates[synthetic]", exit_ns), ("enterStates[synthetic]", enter_ns)):
+            if p_best[key] is None or value / n_cycles < p_best[key]:
+                p_best[key] = value / n_cycles
+    return p_best
+
+
+def support_benchmarks(sm, repeat):
+    from blend_scxml.datastructures import OrderedSet
+    from blend_scxml.dotsi import Dict
+    from blend_scxml.louie import dispatcher
+
+    t_items = list(range(32))
+
+    def ordered_set():
+        s = OrderedSet()
+        for x in t_items:
+            s.add(x)
+        for x in t_items:
+            s.member(x)
+        for x in t_items:
+            s.delete(x)
+
+    dm = sm.datamodel
+    dm["bench_x"] = 0
+    assign_node = etree.Element("assign", {"location": "bench_x", "expr": "bench_x + 1"})
+    p_data = {"name": "event", "values": [1, 2, 3], "nested": {"a": 1, "b": {"c": "d"}}}
+
+    sender = object()
+    dispatcher.connect(receiver, "bench_signal", sender)
+    try:
+        dispatch_ns = bench(lambda: dispatcher.send("bench_signal", sender, value=1), repeat)
+    finally:
+        dispatcher.disconnect(receiver, "bench_signal", sender)
+
+    return {
+        "OrderedSet[add+member+delete x32]": bench(ordered_set, repeat),
+        "PythonDataModel.evalExpr": bench(lambda: dm.evalExpr("bench_x + 1"), repeat),
+        "PythonDataModel.assign": bench(lambda: dm.assign(assign_node), repeat),
+        "Dict(event data)": bench(lambda: Dict(p_data), repeat),
+        "dispatcher.send": dispatch_ns,
+    }
+
+
+def run(repeat, s_filter=None):
+    s_fixtures_path = os.path.join(s_benchmarks_path, "..", "unittest_xml")
+    p_results = {}
+    t_machines = []
+    for fixture in FIXTURES:
+        sm = load_fixture(os.path.abspath(os.path.join(s_fixtures_path, fixture)))
+        t_machines.append(sm)
+        p_results.update(fixture_benchmarks(sm, os.path.splitext(fixture)[0], repeat))
+    p_results.update(transition_benchmarks(repeat))
+    p_results.update(support_benchmarks(t_machines[0], repeat))
+    if s_filter:
+        p_results = {key: value for key, value in p_results.items() if s_filter in key}
+    return p_results
+
+
+def compare(s_base, s_new, threshold):
+    with open(s_base) as f:
+        p_base = json.load(f)["results"]
+    with open(s_new) as f:
+        p_new = json.load(f)["results"]
+
+    n_regressions = 0
+    print(f"{'benchmark':<52} {'base ns':>10} {'new ns':>10} {'change':>8}")
+    for key in sorted(set(p_base) | set(p_new)):
+        base, new = p_base.get(key), p_new.get(key)
+        if base is None or new is None:
+            print(f"{key:<52} {base or '-':>10} {new or '-':>10}")
+            continue
+        change = (new - base) / base * 100.0 if base else 0.0
+        mark = ""
+        if change > threshold:
+            mark = " slower"
+            n_regressions += 1
+        elif change < -threshold:
+            mark = " faster"
+        print(f"{key:<52} {base:10.1f} {new:10.1f} {change:+7.1f}%{mark}")
+    return n_regressions
+
+
+if __name__ == "__main__":
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+
+    s_src = os.path.join(s_benchmarks_path, "..", "src")
+    n_repeat = 5
+    s_filter = None
+    s_json_output = None
+    t_compare = None
+    threshold = 5.0
+    for idx, arg in enumerate(argv):
+        if arg == "-src":
+            s_src = argv[idx + 1]
+        elif arg == "-r":
+            n_repeat = int(argv[idx + 1])
+        elif arg == "-k":
+            s_filter = argv[idx + 1]
+        elif arg == "-o":
+            s_json_output = argv[idx + 1]
+        elif arg == "-compare":
+            t_compare = argv[idx + 1: idx + 3]
+        elif arg == "-t":
+            threshold = float(argv[idx + 1])
+
+    if t_compare:
+        sys.exit(1 if compare(t_compare[0], t_compare[1], threshold) else 0)
+
+    sys.path.insert(0, os.path.abspath(s_src))
+    logging.disable(logging.CRITICAL)
+
+    from blend_scxml.version import VERSION
+
+    p_results = run(n_repeat, s_filter)
+    for key, value in p_results.items():
+        print(f"{key:<52} {value:10.1f} ns")
+
+    if s_json_output:
+        with open(s_json_output, "w") as f:
+            json.dump({
+                "meta": {
+                    "version": VERSION, "src": os.path.abspath(s_src),
+                    "python": platform.python_version(), "platform": platform.platform(),
+                    "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+                "results": p_results}, f, indent=2)
@@ -0,0 +1,174 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Copyright 2024, Alex Zhornyak, alexander.zhornyak@gmail.com
+
+""" Scaling of the interpreter with the synthetic charts (see chart_generator)
+
+Each parameter is grown alone from 1 to MAX (powers of 2) while the others
+keep their defaults. For every chart the parse time, the startup time,
+the events per second, the mean microstep latency and the traced memory
+per session are measured, the machines run in the virtual time of
+replay.ManualTimers, so the delayed sends fire without waiting.
+
+Usage: blender -b --python benchmarks/bench_scaling.py -- [-n EVENTS] [-m MAX] [-p PARAM,...] [-s SESSIONS] [-o JSON_OUTPUT]
+"""
+
+import os
+import sys
+import gc
+import json
+import time
+import platform
+import tracemalloc
+from timeit import default_timer as timer
+
+s_blend_scxml_path = os.path.join(os.path.dirname(__file__), "..", "src")
+sys.path.append(s_blend_scxml_path)
+sys.path.append(os.path.dirname(__file__))
+
+from blend_scxml.py_blend_scxml import StateMachine  # noqa: E402
+from blend_scxml.observer import InterpreterObserver  # noqa: E402
+from blend_scxml.replay import ManualTimers, run_until_idle  # noqa: E402
+from blend_scxml.version import VERSION  # noqa: E402
+from chart_generator import DEFAULTS, make_chart  # noqa: E402
+
+
+class MicrostepCounter(InterpreterObserver):
+    def __init__(self):
+        self.microsteps = 0
+
+    def on_new_configuration(self, interpreter):
+        self.microsteps += 1
+
+
+def make_machine(source):
+    timers = ManualTimers()
+    sm = StateMachine(source, setup_session=False, timers=timers, log_function=lambda label, msg: None)
+    return sm, timers
+
+
+def step(sm, timers, interval=0.01):
+    '''runs the pending events and the delayed sends which are due in the next interval'''
+    interpreter = sm.interpreter
+    run_until_idle(interpreter)
+    until = timers.now + interval
+    while timers.fire_next(until):
+        run_until_idle(interpreter)
+
+
+def measure(source, events, sessions):
+    start = timer()
+    sm, timers = make_machine(source)
+    parse_s = timer() - start
+
+    start = timer()
+    sm._start()
+    run_until_idle(sm.interpreter)
+    startup_s = timer() - start
+
+    counter = MicrostepCounter()
+    sm.interpreter.addObserver(counter)
+    start = timer()
+    for _ in range(events):
+        sm.send("tick")
+        step(sm, timers)
+    events_s = timer() - start
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    t_machines = []
+    for _ in range(sessions):
+        session, session_timers = make_machine(source)
+        session._start()
+        run_until_idle(session.interpreter)
+        t_machines.append(session)
+    gc.collect()
+    memory = (tracemalloc.get_traced_memory()[0] - before) / sessions
+    tracemalloc.stop()
+    del t_machines
+
+    return {
+        "parse_ms": parse_s * 1e3,
+        "startup_ms": startup_s * 1e3,
+        "events_per_s": events / events_s if events_s else 0.0,
+        "microsteps": counter.microsteps,
+        "microstep_us": events_s / counter.microsteps * 1e6 if counter.microsteps else 0.0,
+        "memory_kb_per_session": memory / 1024,
+    }
+
+
+if __name__ == "__main__":
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+
+    n_events = 200
+    n_max = 32
+    n_sessions = 10
+    t_params = list(DEFAULTS)
+    s_json_output = None
+    for idx, arg in enumerate(argv):
+        if arg == "-n":
+            n_events = int(argv[idx + 1])
+        elif arg == "-m":
+            n_max = int(argv[idx + 1])
+        elif arg == "-p":
+            t_params = argv[idx + 1].split(",")
+        elif arg == "-s":
+            n_sessions = int(argv[idx + 1])
+        elif arg == "-o":
+            s_json_output = argv[idx + 1]
+
+    t_values = []
+    value = 1
+    while value <= n_max:
+        t_values.append(value)
+        value *= 2
+
+    p_results = {}
+    for param in t_params:
+        p_results[param] = []
+        for value in t_values:
+            p_chart_params = dict(DEFAULTS)
+            p_chart_params[param] = value
+            if param == "history":
+                # NOTE: the history regions need as many regions
+                p_chart_params["width"] = max(p_chart_params["width"], value)
+            p_result = measure(make_chart(**p_chart_params), n_events, n_sessions)
+            p_result["value"] = value
+            p_results[param].append(p_result)
+            print(
+                f"{param:>12}={value:<4} parse: {p_result['parse_ms']:8.2f}ms, startup: {p_result['startup_ms']:8.2f}ms, "
+                f"{p_result['events_per_s']:9.0f} events/s, microstep: {p_result['microstep_us']:8.1f}us, "
+                f"memory: {p_result['memory_kb_per_session']:8.1f}KB")
+
+    p_report = {
+        "meta": {
+            "version": VERSION,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "events": n_events,
+            "sessions": n_sessions,
+            "defaults": DEFAULTS,
+        },
+        "results": p_results,
+    }
+    if s_json_output:
+        with open(s_json_output, "w") as f:
+            json.dump(p_report, f, indent=2)
@@ -0,0 +1,148 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Copyright 2024, Alex Zhornyak, alexander.zhornyak@gmail.com
+
+""" Cost of the flight recorder per microstep (see trace.TraceRecorder)
+
+    cached:   on_microstep on the recorded microsteps of a synthetic chart,
+              the repeated microsteps reuse their packed slots
+    uncached: the same with the cache of the packed slots off, the cost of
+              a microstep which is seen first
+
+The time is the best of REPEATS runs. The difference of whole macrosteps
+with and without the recorder is under the noise of a macrostep, so it is
+not measured. BUDGET_NS is a known marginal miss: the cached on_microstep
+takes 0.8-1.5 us on a slow single CPU, it is reported as MISS. Exits with 1
+if the trace does not read back as the records.
+
+Usage: blender -b --python benchmarks/bench_trace.py -- [-r REPEATS] [-n TICKS]
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+s_benchmarks_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(s_benchmarks_path)
+sys.path.append(os.path.join(s_benchmarks_path, "..", "src"))
+
+from blend_scxml.py_blend_scxml import StateMachine  # noqa: E402
+from blend_scxml.observer import InterpreterObserver  # noqa: E402
+from blend_scxml import trace  # noqa: E402
+from blend_scxml.trace import TraceRecorder, read_trace  # noqa: E402
+from chart_generator import make_chart  # noqa: E402
+
+BUDGET_NS = 1000
+
+
+class RecordCollector(InterpreterObserver):
+    def __init__(self):
+        self.records = []
+
+    def on_microstep(self, interpreter, record):
+        self.records.append(record.copy())
+
+
+def drain(sm):
+    sm.interpreter.externalQueueGuard = False
+    while sm.interpreter.running and not sm.interpreter.externalQueueGuard:
+        sm.interpreter.mainEventLoop()
+
+
+def start(observer=None):
+    sm = StateMachine(
+        make_chart(depth=3, width=3, transitions=2, history=1, datamodel="null"),
+        setup_session=False, log_function=lambda label, msg: None)
+    if observer is not None:
+        sm.interpreter.addObserver(observer)
+    sm._start()
+    drain(sm)
+    return sm
+
+
+def run_ticks(sm, ticks):
+    '''returns the seconds of the 'tick' macrosteps'''
+    start_time = time.perf_counter()
+    for _ in range(ticks):
+        sm.send("tick")
+        drain(sm)
+    return time.perf_counter() - start_time
+
+
+def bench_callback(filepath, t_records, repeat, cached=True):
+    '''
+    returns (the best nanoseconds of on_microstep, the trace reads back as the records)
+    @param cached: False turns the cache of the packed slots off
+    '''
+    recorder = TraceRecorder(filepath, slots=4096)
+    callback = recorder.on_microstep
+    n_max_tails = trace.MAX_TAILS
+    if not cached:
+        trace.MAX_TAILS = 0
+    try:
+        f_best = None
+        for _ in range(repeat):
+            start_time = time.perf_counter_ns()
+            for record in t_records:
+                callback(None, record)
+            elapsed = (time.perf_counter_ns() - start_time) / len(t_records)
+            f_best = elapsed if f_best is None else min(f_best, elapsed)
+    finally:
+        trace.MAX_TAILS = n_max_tails
+    recorder.close()
+
+    # NOTE: the ring keeps the last slots of all the runs
+    t_read = list(read_trace(filepath))
+    t_expected = (t_records * repeat)[-len(t_read):]
+    b_equal = len(t_read) == min(4096, len(t_records) * repeat) and all(
+        read["exited"] == record.exited and read["entered"] == record.entered and
+        read["transitions"] == record.transitions and
+        read["event"] == (record.event.name if record.event is not None else None)
+        for read, record in zip(t_read, t_expected))
+    return f_best, recorder.errors == 0 and b_equal
+
+
+if __name__ == "__main__":
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+
+    n_repeat = 5
+    n_ticks = 2000
+    for idx, arg in enumerate(argv):
+        if arg == "-r":
+            n_repeat = int(argv[idx + 1])
+        elif arg == "-n":
+            n_ticks = int(argv[idx + 1])
+
+    collector = RecordCollector()
+    run_ticks(start(collector), n_ticks)
+    t_records = collector.records
+
+    with tempfile.TemporaryDirectory() as s_dir:
+        filepath = os.path.join(s_dir, "bench.trace")
+        f_cached, b_cached_ok = bench_callback(filepath, t_records, n_repeat)
+        f_uncached, b_uncached_ok = bench_callback(filepath, t_records, n_repeat, cached=False)
+
+    print(f"on_microstep cached:   {f_cached:8.0f} ns (budget {BUDGET_NS} ns)")
+    print(f"on_microstep uncached: {f_uncached:8.0f} ns ({len(t_records)} records)")
+    print("budget: " + ("met" if f_cached <= BUDGET_NS else "MISS"))
+    b_ok = b_cached_ok and b_uncached_ok
+    if not b_ok:
+        print("FAIL the trace does not read back as the records")
+    sys.exit(0 if b_ok else 1)
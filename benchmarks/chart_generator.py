@@ -0,0 +1,106 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Copyright 2024, Alex Zhornyak, alexander.zhornyak@gmail.com
+
+""" Parameterized synthetic charts for the benchmarks
+
+Every 'tick' event moves each region of the chart one step through its
+cycle, so the work per event grows with the parameters:
+
+    depth:       compound states around the cycle of a region
+    width:       regions of the top-level <parallel>
+    transitions: non-matching transitions scanned before the 'tick' one in every state
+    history:     regions whose cycle leaves and re-enters through a deep <history>
+    data:        <data> entries of the datamodel, the 'tick' transitions assign one of them
+    delayed:     delayed <send>s of every region per cycle
+
+Usage: python benchmarks/chart_generator.py -- [-depth N] [-width N] ... > chart.scxml
+"""
+
+import sys
+
+DEFAULTS = {
+    "depth": 1,
+    "width": 1,
+    "transitions": 1,
+    "history": 0,
+    "data": 1,
+    "delayed": 0,
+}
+
+
+def make_noise(n):
+    return "".join(f'<transition event="noise{j}"/>' for j in range(n))
+
+
+def make_region(i, depth, transitions, history, delayed, data):
+    assign = f'<assign location="d{i % data}" expr="d{i % data} + 1"/>' if data else ""
+    sends = "".join(f'<send event="later" delay="{10 * (k + 1)}ms"/>' for k in range(delayed))
+    noise = make_noise(transitions)
+
+    s_cycle_back = f"r{i}_away" if history else f"r{i}_a"
+    s_leaves = (
+        f'<state id="r{i}_a">{noise}<transition event="tick" target="r{i}_b">{assign}</transition></state>'
+        f'<state id="r{i}_b"><onentry>{sends}</onentry>{noise}<transition event="tick" target="{s_cycle_back}"/></state>')
+
+    s_nested = s_leaves
+    for k in reversed(range(1, depth)):
+        s_nested = f'<state id="r{i}_d{k}">{noise}{s_nested}</state>'
+    # NOTE: the deep history of the outer state restores r{i}_b after the away state
+    s_history = f'<history id="r{i}_h" type="deep"><transition target="r{i}_a"/></history>' if history else ""
+    s_outer = f'<state id="r{i}_d0">{s_history}{noise}{s_nested}</state>'
+
+    if history:
+        return (
+            f'<state id="r{i}">{s_outer}'
+            f'<state id="r{i}_away">{noise}<transition event="tick" target="r{i}_h"/></state>'
+            f'</state>')
+    return f'<state id="r{i}">{s_outer}</state>'
+
+
+def make_chart(depth=1, width=1, transitions=1, history=0, data=1, delayed=0, datamodel="python"):
+    '''returns the source of the synthetic chart, see the module docstring for the parameters'''
+    depth = max(depth, 1)
+    width = max(width, 1)
+    if datamodel != "python":
+        data = 0
+
+    t_regions = [
+        make_region(i, depth, transitions, i < history, delayed, data)
+        for i in range(width)]
+    s_datamodel = (
+        '<datamodel>' + "".join(f'<data id="d{k}" expr="{k}"/>' for k in range(data)) + '</datamodel>'
+        if data else "")
+
+    return (
+        f'<scxml xmlns="http://www.w3.org/2005/07/scxml" version="1.0" datamodel="{datamodel}" name="synthetic">'
+        f'{s_datamodel}'
+        f'<parallel id="p">{"".join(t_regions)}</parallel>'
+        '</scxml>')
+
+
+if __name__ == "__main__":
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+
+    p_params = dict(DEFAULTS)
+    for idx, arg in enumerate(argv):
+        if arg.startswith("-") and arg[1:] in p_params:
+            p_params[arg[1:]] = int(argv[idx + 1])
+
+    print(make_chart(**p_params))
@@ -0,0 +1,140 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Copyright 2024, Alex Zhornyak, alexander.zhornyak@gmail.com
+
+""" Flood checks of the coalescing external queue (see datastructures.EventQueue)
+
+A flood of a coalescible event between two ticks must hold one entry of the
+deque, with and without the queue bound, and the other events must stay
+within the bound. The traced memory of the flood must stay flat. Exits with
+1 on a failure.
+
+    -n: events of every flood
+
+Usage: blender -b --python benchmarks/check_coalescing.py -- [-n 100000]
+"""
+
+import os
+import sys
+import tracemalloc
+
+s_blend_scxml_path = os.path.join(os.path.dirname(__file__), "..", "src")
+sys.path.append(s_blend_scxml_path)
+
+from blend_scxml.py_blend_scxml import StateMachine  # noqa: E402
+from blend_scxml.consts import QueuePolicy  # noqa: E402
+
+CHART = '''
+<scxml xmlns="http://www.w3.org/2005/07/scxml" xmlns:blend="http://www.blend-scxml.org/scxml"
+        version="1.0" datamodel="python" blend:coalesce="u">
+    <datamodel><data id="seen" expr="[]"/></datamodel>
+    <state id="s">
+        <transition event="*"><script>seen.append((_event.name, _event.data.get("i")))</script></transition>
+    </state>
+</scxml>
+'''
+
+# NOTE: the flood may hold a few KiB of the allocator caches, 65 MiB were held when the duplicates stayed queued
+MAX_FLOOD_KIB = 256
+
+
+def drain(sm):
+    sm.interpreter.externalQueueGuard = False
+    while sm.interpreter.running and not sm.interpreter.externalQueueGuard:
+        sm.interpreter.mainEventLoop()
+
+
+def start(**kwargs):
+    sm = StateMachine(CHART, setup_session=False, log_function=lambda label, msg: None, **kwargs)
+    sm._start()
+    drain(sm)
+    return sm
+
+
+def flood(sm, n, names):
+    '''sends n events between two ticks, returns the KiB held by the queue afterwards'''
+    tracemalloc.start()
+    start_kib = tracemalloc.get_traced_memory()[0] / 1024
+    for i in range(n):
+        sm.send(names[i % len(names)], {"i": i})
+    held_kib = tracemalloc.get_traced_memory()[0] / 1024 - start_kib
+    tracemalloc.stop()
+    return held_kib
+
+
+def check_bounded(n):
+    sm = start(queue_size=8, queue_policy=QueuePolicy.drop_newest)
+    q = sm.interpreter.externalQueue
+    held_kib = flood(sm, n, ["u"])
+    p_results = {
+        "bounded: one entry in the deque": len(q.queue) == 1,
+        "bounded: qsize": q.qsize() == 1,
+        "bounded: coalesced": q.coalesced == n - 1,
+        "bounded: nothing dropped": q.dropped == 0,
+        "bounded: memory": held_kib < MAX_FLOOD_KIB or f"{held_kib:.1f} KiB",
+    }
+    drain(sm)
+    p_results["bounded: the newest is processed"] = list(sm.datamodel["seen"]) == [("u", n - 1)]
+    return p_results
+
+
+def check_unbounded(n):
+    sm = start()
+    q = sm.interpreter.externalQueue
+    held_kib = flood(sm, n, ["u"])
+    return {
+        "unbounded: one entry in the deque": len(q.queue) == 1,
+        "unbounded: memory": held_kib < MAX_FLOOD_KIB or f"{held_kib:.1f} KiB",
+    }
+
+
+def check_mixed(n):
+    sm = start(queue_size=8, queue_policy=QueuePolicy.drop_oldest)
+    q = sm.interpreter.externalQueue
+    flood(sm, n, ["u", "a", "u", "b"])
+    p_results = {
+        "mixed: the deque is within the bound": len(q.queue) <= 8,
+        "mixed: one 'u' waiting": sum(event.name == "u" for event in q.queue) == 1,
+    }
+    drain(sm)
+    p_results["mixed: the newest 'u' is processed"] = ("u", n - 2) in [tuple(x) for x in sm.datamodel["seen"]]
+    return p_results
+
+
+if __name__ == "__main__":
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+
+    n_events = 100000
+    for idx, arg in enumerate(argv):
+        if arg == "-n":
+            n_events = int(argv[idx + 1])
+
+    p_results = {}
+    for check in (check_bounded, check_unbounded, check_mixed):
+        try:
+            p_results.update(check(n_events))
+        except Exception as e:
+            p_results[check.__name__] = repr(e)
+    n_failures = 0
+    for name, result in p_results.items():
+        if result is not True:
+            n_failures += 1
+            print(f"FAIL {name}: {result}")
+    print(f"{len(p_results) - n_failures} of {len(p_results)} checks passed")
+    sys.exit(1 if n_failures else 0)
@@ -0,0 +1,124 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Copyright 2024, Alex Zhornyak, alexander.zhornyak@gmail.com
+
+""" Regression checks of the eventless cond tracking (see Interpreter.dependencyTracking)
+
+A <data> often holds a live object (bpy.context.scene) which is changed
+outside of the chart. By default every eventless cond is evaluated after
+every microstep, so such a change is seen with the next event. The tracking
+is turned on only by blend:dependency-tracking="true" or by the
+'dependency_tracking' argument, and then still re-evaluates the conds whose
+names are assigned. Exits with 1 on a failure.
+
+Usage: blender -b --python benchmarks/check_cond_dependencies.py
+"""
+
+import os
+import sys
+
+s_blend_scxml_path = os.path.join(os.path.dirname(__file__), "..", "src")
+sys.path.append(s_blend_scxml_path)
+
+from blend_scxml.py_blend_scxml import StateMachine  # noqa: E402
+
+# NOTE: 'scene' stands for bpy.context.scene, its engine is changed by the user, not by the chart
+CHART = '''
+<scxml xmlns="http://www.w3.org/2005/07/scxml" xmlns:blend="http://www.blend-scxml.org/scxml"
+        version="1.0" datamodel="python" initial="p" %s>
+    <datamodel>
+        <data id="scene" expr="__import__('types').SimpleNamespace(engine='BLENDER_EEVEE')"/>
+    </datamodel>
+    <parallel id="p">
+        <state id="A">
+            <state id="a1"><transition cond="scene.engine == 'CYCLES'" target="a2"/></state>
+            <state id="a2"/>
+        </state>
+        <state id="B">
+            <state id="b1">
+                <transition event="unrelated"/>
+                <transition event="assign">
+                    <assign location="scene" expr="__import__('types').SimpleNamespace(engine='CYCLES')"/>
+                </transition>
+            </state>
+        </state>
+    </parallel>
+</scxml>
+'''
+
+TRACKED = 'blend:dependency-tracking="true"'
+
+
+def drain(sm):
+    sm.interpreter.externalQueueGuard = False
+    while sm.interpreter.running and not sm.interpreter.externalQueueGuard:
+        sm.interpreter.mainEventLoop()
+
+
+def start(attribute="", **kwargs):
+    sm = StateMachine(CHART % attribute, setup_session=False, log_function=lambda label, msg: None, **kwargs)
+    sm._start()
+    drain(sm)
+    return sm
+
+
+def external_change(sm):
+    '''the engine is changed outside of the chart, then an event which does not touch the cond is sent'''
+    sm.datamodel["scene"].engine = "CYCLES"
+    sm.send("unrelated")
+    drain(sm)
+    return sm.interpreter.getConfigurationIDs()
+
+
+def check_default():
+    sm = start()
+    return {
+        "default: tracking is off": sm.interpreter.dependencyTracking is False,
+        "default: external change is seen": "a2" in external_change(sm),
+    }
+
+
+def check_opt_in():
+    tracked = start(TRACKED)
+    assigned = start(TRACKED)
+    assigned.send("assign")
+    drain(assigned)
+    return {
+        "attribute: tracking is on": tracked.interpreter.dependencyTracking is True,
+        "attribute: false cond is cached": len(tracked.interpreter.condCache) == 1,
+        "attribute: assigned name is re-evaluated": "a2" in assigned.interpreter.getConfigurationIDs(),
+        "argument: tracking is on": start(dependency_tracking=True).interpreter.dependencyTracking is True,
+        "argument overrides attribute": "a2" in external_change(start(TRACKED, dependency_tracking=False)),
+    }
+
+
+if __name__ == "__main__":
+    p_results = {}
+    for check in (check_default, check_opt_in):
+        try:
+            p_results.update(check())
+        except Exception as e:
+            p_results[check.__name__] = repr(e)
+    n_failures = 0
+    for name, result in p_results.items():
+        if result is not True:
+            n_failures += 1
+            print(f"FAIL {name}: {result}")
+    print(f"{len(p_results) - n_failures} of {len(p_results)} checks passed")
+    sys.exit(1 if n_failures else 0)
@@ -0,0 +1,120 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Copyright 2024, Alex Zhornyak, alexander.zhornyak@gmail.com
+
+""" Regression checks of the dot access to the lazily dotsified values
+
+Every accessor of dotsi.Dict and dotsi.List must return the nested dicts
+with dot access, as the eagerly dotsified values did. The same accessors
+are checked on _event.data inside a chart. Exits with 1 on a failure.
+
+Usage: python benchmarks/check_dotsi_access.py
+"""
+
+import os
+import sys
+import copy
+import json
+
+s_blend_scxml_path = os.path.join(os.path.dirname(__file__), "..", "src")
+sys.path.append(s_blend_scxml_path)
+
+from blend_scxml.dotsi import Dict  # noqa: E402
+
+
+def make_data():
+    return {"a": [{"b": 1}], "c": {"d": {"e": 2}}}
+
+
+CHECKS = {
+    "getattr": "d.c.d.e == 2",
+    "getitem": "d['c']['d'].e == 2",
+    "get": "d.get('c').d.e == 2",
+    "items": "[v for k, v in d.items()][1].d.e == 2",
+    "values": "list(d.values())[1].d.e == 2",
+    "dict()": "dict(d)['c'].d.e == 2",
+    "unpacking": "{**d}['c'].d.e == 2",
+    "copy": "d.copy().c.d.e == 2",
+    "copy.copy": "copy.copy(d).c.d.e == 2",
+    "pop": "d.pop('c').d.e == 2",
+    "popitem": "d.popitem()[1].d.e == 2",
+    "setdefault": "d.setdefault('c').d.e == 2",
+    "list iteration": "[x for x in d.a][0].b == 1",
+    "list()": "list(d.a)[0].b == 1",
+    "list pop": "d.a.pop().b == 1",
+    "list slice": "d.a[0:1][0].b == 1",
+    "list reversed": "list(reversed(d.a))[0].b == 1",
+    "list add": "(d.a + [{'f': 3}])[1].f == 3",
+    "list mul": "(d.a * 2)[1].b == 1",
+    "json": "json.loads(json.dumps(d)) == make_data()",
+    "isinstance": "isinstance(d, dict) and isinstance(d.a, list)",
+}
+
+CHART = '''
+<scxml xmlns="http://www.w3.org/2005/07/scxml" version="1.0" datamodel="python">
+    <datamodel><data id="results" expr="{}"/></datamodel>
+    <state id="s">
+        <transition event="check">
+            <script>
+import copy, json
+try:
+    results[_event.data.name] = bool(eval(_event.data.check, {
+        "copy": copy, "json": json, "make_data": _event.data.make_data, "d": _event.data.value}))
+except Exception as e:
+    results[_event.data.name] = repr(e)
+            </script>
+        </transition>
+    </state>
+</scxml>
+'''
+
+
+def check_dicts():
+    p_results = {}
+    for name, check in CHECKS.items():
+        try:
+            p_results[name] = bool(eval(check, {"copy": copy, "json": json, "make_data": make_data, "d": Dict(make_data())}))
+        except Exception as e:
+            p_results[name] = repr(e)
+    return p_results
+
+
+def check_event_data():
+    from blend_scxml.py_blend_scxml import StateMachine
+
+    sm = StateMachine(CHART, setup_session=False, log_function=lambda label, msg: None)
+    sm._start()
+    for name, check in CHECKS.items():
+        sm.send("check", {"name": name, "check": check, "value": make_data(), "make_data": make_data})
+    sm.interpreter.externalQueueGuard = False
+    while sm.interpreter.running and not sm.interpreter.externalQueueGuard:
+        sm.interpreter.mainEventLoop()
+    return dict(sm.datamodel["results"])
+
+
+if __name__ == "__main__":
+    n_failures = 0
+    for label, p_results in (("Dict", check_dicts()), ("_event.data", check_event_data())):
+        for name in CHECKS:
+            result = p_results.get(name, "not run")
+            if result is not True:
+                n_failures += 1
+                print(f"FAIL {label}: {name}: {CHECKS[name]} -> {result}")
+    print(f"{len(CHECKS) * 2 - n_failures} of {len(CHECKS) * 2} checks passed")
+    sys.exit(1 if n_failures else 0)
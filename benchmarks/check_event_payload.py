@@ -0,0 +1,180 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Copyright 2024, Alex Zhornyak, alexander.zhornyak@gmail.com
+
+""" Regression checks of the event payloads of broadcasts and sends (see Interpreter.send)
+
+_event.data is a dict with dot access which json can dump, the send
+processors (custom send types, x-pyscxml-soap, the #_websocket messages)
+get a Dict, and the receivers of one broadcast never see the changes of
+each other or change the sender data.
+A recorded broadcast is replayed (see replay.ReplayRecorder). Exits with 1
+on a failure.
+
+Usage: blender -b --python benchmarks/check_event_payload.py
+"""
+
+import os
+import sys
+import json
+import tempfile
+from xml.etree import ElementTree as etree
+
+s_blend_scxml_path = os.path.join(os.path.dirname(__file__), "..", "src")
+sys.path.append(s_blend_scxml_path)
+
+from blend_scxml.py_blend_scxml import StateMachine, MultiSession, custom_sendtype  # noqa: E402
+from blend_scxml.eventprocessor import SCXMLEventProcessor  # noqa: E402
+from blend_scxml.dotsi import Dict  # noqa: E402
+from blend_scxml.replay import ReplayRecorder, read_recording, replay  # noqa: E402
+
+RECEIVER = '''
+<scxml xmlns="http://www.w3.org/2005/07/scxml" version="1.0" datamodel="python">
+    <datamodel><data id="results" expr="{}"/></datamodel>
+    <state id="s">
+        <transition event="check">
+            <script>
+import json
+results["isinstance"] = isinstance(_event.data, dict)
+results["json"] = json.loads(json.dumps(_event.data)) == {"nested": {"x": 1}, "items": [{"y": 2}]}
+results["dot access"] = _event.data.nested.x == 1 and _event.data["items"][0].y == 2
+results["items()"] = [v for k, v in _event.data.items()][0].x == 1
+_event.data.nested.x = _sessionid
+_event.data["items"].append(_sessionid)
+            </script>
+        </transition>
+        <transition event="read">
+            <script>results["read"] = _event.data.nested.x</script>
+        </transition>
+    </state>
+</scxml>
+'''
+
+SENDER = '''
+<scxml xmlns="http://www.w3.org/2005/07/scxml" version="1.0" datamodel="python">
+    <datamodel>
+        <data id="nested" expr="{'x': 1}"/>
+        <data id="items" expr="[{'y': 2}]"/>
+    </datamodel>
+    <state id="s">
+        <onentry><send event="check" namelist="nested items"/></onentry>
+        <onentry><send event="custom" type="x-check" target="somewhere" namelist="nested items"/></onentry>
+        <onentry><send event="soap" type="x-pyscxml-soap" target="#soap" namelist="nested items"/></onentry>
+        <transition event="check">
+            <script>
+import json
+received["isinstance"] = isinstance(_event.data, dict)
+received["json"] = json.loads(json.dumps(_event.data)) == {"nested": {"x": 1}, "items": [{"y": 2}]}
+received["dot access"] = _event.data.nested.x == 1
+            </script>
+        </transition>
+    </state>
+</scxml>
+'''
+
+p_processors = {}
+
+
+@custom_sendtype("x-check")
+def check_sendtype(message, dm):
+    p_processors["custom data is Dict"] = isinstance(message.data, Dict)
+    p_processors["custom data json"] = json.loads(json.dumps(message.data))["nested"] == {"x": 1}
+    p_processors["custom dot access"] = message.data.nested.x == 1
+
+
+class SoapTarget(object):
+    def send(self, event, data):
+        p_processors["soap data is Dict"] = isinstance(data, Dict)
+        p_processors["soap dot access"] = data.nested.x == 1
+
+
+def drain(sm):
+    sm.interpreter.externalQueueGuard = False
+    while sm.interpreter.running and not sm.interpreter.externalQueueGuard:
+        sm.interpreter.mainEventLoop()
+
+
+def check_broadcast():
+    ms = MultiSession(RECEIVER, init_sessions={"a": None, "b": None}, log_function=lambda label, msg: None)
+    for sm in ms:
+        sm._start()
+    p_sent = {"nested": {"x": 1}, "items": [{"y": 2}]}
+    ms.send("check", p_sent)
+    ms.send("read", p_sent)
+    p_results = {}
+    for sessionid in ("a", "b"):
+        sm = ms[sessionid]
+        drain(sm)
+        for key, value in sm.datamodel["results"].items():
+            p_results[f"broadcast {key} [{sessionid}]"] = value if key != "read" else value == 1
+    p_results["broadcast sender data unchanged"] = p_sent == {"nested": {"x": 1}, "items": [{"y": 2}]}
+    return p_results
+
+
+def check_send():
+    sm = StateMachine(SENDER, setup_session=False, log_function=lambda label, msg: None)
+    received = {}
+    sm.datamodel["received"] = received
+    sm.datamodel["soap"] = SoapTarget()
+    sm.datamodel["_ioprocessors"] = {"x-check": {"location": "#_scxml_" + sm.sessionid}}
+    sm._start()
+    drain(sm)
+    p_results = {f"send {key}": value for key, value in received.items()}
+    p_results.update(p_processors)
+
+    # NOTE: the #_websocket messages of the python datamodel pickle the values, json is checked here
+    p_results["websocket toxml"] = etree.fromstring(SCXMLEventProcessor.toxml(
+        "e", "#_websocket", Dict({"nested": {"x": 1}}), language="json")).get("name") == "e"
+    return p_results
+
+
+def check_replay():
+    ms = MultiSession(RECEIVER, init_sessions={"r": None}, log_function=lambda label, msg: None)
+    sm = ms["r"]
+    with tempfile.TemporaryDirectory() as s_dir:
+        filepath = os.path.join(s_dir, "broadcast.replay")
+        recorder = ReplayRecorder(sm, filepath)
+        sm._start()
+        ms.send("check", {"nested": {"x": 1}, "items": [{"y": 2}]})
+        drain(sm)
+        recorder.close()
+        _, t_lines = read_recording(filepath)
+        report = replay(RECEIVER, filepath)
+    t_inputs = [x for x in t_lines if "input" in x]
+    return {
+        "replay broadcast data recorded": t_inputs == [
+            {"t": t_inputs[0]["t"], "input": "check", "data": {"nested": {"x": 1}, "items": [{"y": 2}]}}],
+        "replay broadcast ok": report.ok,
+    }
+
+
+if __name__ == "__main__":
+    p_results = {}
+    for check in (check_broadcast, check_send, check_replay):
+        try:
+            p_results.update(check())
+        except Exception as e:
+            p_results[check.__name__] = repr(e)
+    n_failures = 0
+    for name, result in p_results.items():
+        if result is not True:
+            n_failures += 1
+            print(f"FAIL {name}: {result}")
+    print(f"{len(p_results) - n_failures} of {len(p_results)} checks passed")
+    sys.exit(1 if n_failures else 0)
@@ -0,0 +1,181 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Copyright 2024, Alex Zhornyak, alexander.zhornyak@gmail.com
+
+""" Differential check of the vectorized engine against the Interpreter
+
+The same random event streams are sent to a VectorizedMachine and to one
+scalar StateMachine per instance. After every step the configuration and
+the finished flag of each instance must be equal. Exits with 1 on a mismatch.
+
+    -count: instances of every chart
+    -steps: steps of every event stream
+    -seed:  seed of the event streams
+
+Usage: blender -b --python benchmarks/check_vectorized.py -- [-count 50] [-steps 300] [-seed 1]
+"""
+
+import os
+import sys
+import random
+
+s_blend_scxml_path = os.path.join(os.path.dirname(__file__), "..", "src")
+sys.path.append(s_blend_scxml_path)
+sys.path.append(os.path.dirname(__file__))
+
+from blend_scxml.py_blend_scxml import StateMachine  # noqa: E402
+from blend_scxml.vectorized import VectorizedMachine, NO_EVENT  # noqa: E402
+from chart_generator import make_chart  # noqa: E402
+
+DEFAULTS = {
+    "count": 50,
+    "steps": 300,
+    "seed": 1,
+}
+
+# NOTE: deep history, In() conditions, eventless and internal transitions, done events and a top-level final
+HISTORY_CHART = '''
+<scxml xmlns="http://www.w3.org/2005/07/scxml" version="1.0" datamodel="null" initial="p">
+    <parallel id="p">
+        <state id="a" initial="a1">
+            <history id="ah" type="deep"><transition target="a1"/></history>
+            <state id="a1"><transition event="go" target="a2"/></state>
+            <state id="a2">
+                <state id="a2x"><transition event="go.deep" target="a2y"/></state>
+                <state id="a2y"><transition event="back" target="a1"/></state>
+            </state>
+            <transition event="reset" target="ah"/>
+        </state>
+        <state id="b" initial="b1">
+            <state id="b1"><transition event="go" cond="In('a1')" target="b2"/></state>
+            <state id="b2"><transition cond="In('a2y')" target="b3"/></state>
+            <state id="b3">
+                <onentry><raise event="internal.x"/></onentry>
+                <transition event="internal" target="bf"/>
+            </state>
+            <final id="bf"/>
+        </state>
+        <transition event="done.state.b" target="out"/>
+        <transition event="quit" target="out"/>
+        <transition event="leave" target="a"/>
+    </parallel>
+    <state id="out">
+        <transition event="quit" target="end"/>
+        <transition event="*" target="p"/>
+    </state>
+    <final id="end"/>
+</scxml>
+'''
+
+# NOTE: shallow history, targetless and internal transitions, multiple targets
+SHALLOW_CHART = '''
+<scxml xmlns="http://www.w3.org/2005/07/scxml" version="1.0" datamodel="null">
+    <state id="s">
+        <history id="sh"><transition target="s1"/></history>
+        <state id="s1">
+            <state id="s11"><transition event="next" target="s12"/></state>
+            <state id="s12"><transition event="next" target="s11"/></state>
+            <transition event="swap" target="s2"/>
+        </state>
+        <state id="s2">
+            <transition event="swap" target="s1"/>
+            <transition event="next"/>
+        </state>
+        <transition event="away" target="t"/>
+        <transition event="inner" type="internal" target="s2"/>
+    </state>
+    <state id="t">
+        <transition event="away" target="sh"/>
+        <transition event="split" target="q1 q2"/>
+    </state>
+    <parallel id="q">
+        <state id="q1"><state id="q1a"/><state id="q1b"/><transition event="next" target="q1b"/></state>
+        <state id="q2"><state id="q2a"/><state id="q2b"/><transition event="swap" target="q2b"/></state>
+        <transition event="away" cond="In('q1b') and In('q2b')" target="s"/>
+    </parallel>
+</scxml>
+'''
+
+CHARTS = {
+    "history": (HISTORY_CHART, ["go", "go.deep", "back", "reset", "leave", "quit", "nothing", "go.x"]),
+    "shallow": (SHALLOW_CHART, ["next", "swap", "away", "inner", "split", "nothing"]),
+    "synthetic": (
+        make_chart(depth=3, width=3, transitions=2, history=2, datamodel="null"),
+        ["tick", "noise0", "noise1", "nothing"]),
+}
+
+
+def drain(sm):
+    sm.interpreter.externalQueueGuard = False
+    while sm.interpreter.running and not sm.interpreter.externalQueueGuard:
+        sm.interpreter.mainEventLoop()
+
+
+def check_chart(name, source, events, count, steps, seed):
+    '''returns the list of the mismatches of the event streams'''
+    vm = VectorizedMachine(source, count)
+    t_ids = [vm.event_id(event) for event in events] + [NO_EVENT]
+
+    t_machines = []
+    for _ in range(count):
+        sm = StateMachine(source, setup_session=False, log_function=lambda label, msg: None)
+        sm._start()
+        drain(sm)
+        t_machines.append(sm)
+
+    rnd = random.Random(seed)
+    t_mismatches = []
+    for step in range(-1, steps):
+        if step >= 0:
+            t_events = [rnd.choice(t_ids) for _ in range(count)]
+            vm.step_all(t_events)
+            for sm, event in zip(t_machines, t_events):
+                if event != NO_EVENT and sm.interpreter.running:
+                    sm.send(events[event])
+                    drain(sm)
+
+        t_finished = vm.isFinished()
+        for i, sm in enumerate(t_machines):
+            t_scalar = sorted(sm.interpreter.getConfigurationIDs())
+            t_vector = sorted(vm.getConfigurationIDs(i))
+            if t_scalar != t_vector or bool(t_finished[i]) == sm.interpreter.running:
+                t_mismatches.append(
+                    f"{name}: step {step} instance {i}: "
+                    f"interpreter {t_scalar} running={sm.interpreter.running}, "
+                    f"vectorized {t_vector} finished={bool(t_finished[i])}")
+    return t_mismatches
+
+
+if __name__ == "__main__":
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+
+    p_params = dict(DEFAULTS)
+    for idx, arg in enumerate(argv):
+        if arg.startswith("-") and arg[1:] in p_params:
+            p_params[arg[1:]] = int(argv[idx + 1])
+
+    n_failures = 0
+    for name, (source, events) in CHARTS.items():
+        t_mismatches = check_chart(name, source, events, **p_params)
+        for mismatch in t_mismatches[:10]:
+            print(f"FAIL {mismatch}")
+        if t_mismatches:
+            n_failures += 1
+    print(f"{len(CHARTS) - n_failures} of {len(CHARTS)} checks passed")
+    sys.exit(1 if n_failures else 0)
@@ -0,0 +1,79 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Copyright 2024, Alex Zhornyak, alexander.zhornyak@gmail.com
+
+""" Replay of a recorded event stream (see blend_scxml.replay.ReplayRecorder)
+
+The recording is replayed REPEATS times on fresh machines, the configurations
+are verified against the recording and the timings of the fastest run are
+reported. Run it on two revisions to bisect a regression of the Interpreter
+or the Compiler. Exits with 1 if the configurations differ.
+
+Usage: blender -b --python benchmarks/replay_recording.py -- SCXML RECORDING [-n REPEATS] [-j JSON_OUTPUT]
+"""
+
+import os
+import sys
+import json
+
+s_blend_scxml_path = os.path.join(os.path.dirname(__file__), "..", "src")
+sys.path.append(s_blend_scxml_path)
+
+from blend_scxml.replay import replay  # noqa: E402
+
+
+if __name__ == "__main__":
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+
+    n_repeats = 5
+    s_json_output = None
+    t_positional = []
+    it_argv = iter(argv)
+    for arg in it_argv:
+        if arg == "-n":
+            n_repeats = int(next(it_argv))
+        elif arg == "-j":
+            s_json_output = next(it_argv)
+        else:
+            t_positional.append(arg)
+
+    if len(t_positional) != 2:
+        print(__doc__)
+        sys.exit(2)
+
+    s_source, s_recording = t_positional
+    t_reports = [replay(os.path.abspath(s_source), s_recording) for _ in range(n_repeats)]
+    p_summary = min((x.summary() for x in t_reports), key=lambda x: x["total_s"])
+
+    print(f"inputs: {p_summary['inputs']}, macrosteps: {p_summary['macrosteps']}, mismatches: {p_summary['mismatches']}")
+    if p_summary["first_mismatch"]:
+        idx, expected, actual = p_summary["first_mismatch"]
+        print(f"first mismatch at macrostep {idx}:\n  recorded: {expected}\n  replayed: {actual}")
+    print(
+        f"total: {p_summary['total_s'] * 1e3:.3f}ms, mean: {p_summary['mean_s'] * 1e6:.1f}us, "
+        f"p50: {p_summary['p50_s'] * 1e6:.1f}us, p95: {p_summary['p95_s'] * 1e6:.1f}us, "
+        f"max: {p_summary['max_s'] * 1e6:.1f}us")
+    for idx, event, elapsed in p_summary["slowest"]:
+        print(f"  macrostep {idx} ({event}): {elapsed * 1e6:.1f}us")
+
+    if s_json_output:
+        with open(s_json_output, "w") as f:
+            json.dump(p_summary, f, indent=2)
+
+    sys.exit(0 if p_summary["ok"] else 1)
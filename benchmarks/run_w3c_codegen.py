@@ -0,0 +1,137 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Copyright 2024, Alex Zhornyak, alexander.zhornyak@gmail.com
+
+""" W3C tests as the oracle of the generated transition selection (see blend_scxml.codegen)
+
+Every test of w3c_tests is run twice, by the regular Interpreter and by the
+Interpreter which codegen generates for the document. The machines are
+stepped in the virtual time of replay.ManualTimers, so the delayed sends do
+not wait. The verdict of a test is the id of the top-level final state
+('pass', 'fail'), TIMEOUT or ERROR. Both pass counts are printed together
+with the tests whose verdicts differ. Exits with 1 if any verdict differs.
+
+    -t: virtual seconds before a test is a TIMEOUT
+    -v: print the verdicts of every test
+
+Usage: blender -b --python benchmarks/run_w3c_codegen.py -- [-t 10] [-v] [test.scxml ...]
+"""
+
+import os
+import sys
+import glob
+import logging
+
+s_blend_scxml_path = os.path.join(os.path.dirname(__file__), "..", "src")
+sys.path.append(s_blend_scxml_path)
+
+from blend_scxml.py_blend_scxml import StateMachine  # noqa: E402
+from blend_scxml.interpreter import Interpreter  # noqa: E402
+from blend_scxml.observer import InterpreterObserver  # noqa: E402
+from blend_scxml.replay import ManualTimers  # noqa: E402
+from blend_scxml import codegen  # noqa: E402
+
+W3C_TESTS_DIR = os.path.join(os.path.dirname(__file__), "..", "w3c_tests")
+
+
+class FinalObserver(InterpreterObserver):
+    def __init__(self):
+        self.final = None
+
+    def on_exit(self, interpreter, final):
+        self.final = final
+
+
+def run_test(filepath, interpreter_class, timeout):
+    '''returns the verdict of the test run by the interpreter class'''
+    timers = ManualTimers()
+    observer = FinalObserver()
+    try:
+        sm = StateMachine(
+            filepath, log_function=lambda label, msg: None,
+            interpreter_class=interpreter_class, timers=timers)
+        sm.interpreter.addObserver(observer)
+        sm.start()
+        while observer.final is None and timers.fire_next(timeout):
+            pass
+    except Exception as e:
+        return f"ERROR {type(e).__name__}: {e}"
+    return observer.final or "TIMEOUT"
+
+
+def run_generated_test(filepath, timeout):
+    '''returns the verdict of the test run by the Interpreter which codegen generates for the document'''
+    try:
+        doc = StateMachine(filepath, log_function=lambda label, msg: None, setup_session=False).doc
+    except Exception as e:
+        # NOTE: the documents which fail to load fail the same way in run_test
+        return f"ERROR {type(e).__name__}: {e}"
+    try:
+        interpreter_class = codegen.compile_document(doc).Interpreter
+    except Exception as e:
+        return f"ERROR codegen {type(e).__name__}: {e}"
+    return run_test(filepath, interpreter_class, timeout)
+
+
+if __name__ == "__main__":
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+
+    f_timeout = 10.0
+    b_verbose = False
+    t_files = []
+    idx = 0
+    while idx < len(argv):
+        if argv[idx] == "-t":
+            f_timeout = float(argv[idx + 1])
+            idx += 1
+        elif argv[idx] == "-v":
+            b_verbose = True
+        else:
+            t_files.append(argv[idx])
+        idx += 1
+
+    # NOTE: the 'sub' documents are invoked by the tests, they are not tests
+    t_files = t_files or [
+        filepath for filepath in sorted(glob.glob(os.path.join(W3C_TESTS_DIR, "test*.scxml")))
+        if "sub" not in os.path.basename(filepath)]
+
+    logging.disable(logging.CRITICAL)
+
+    n_passed = n_generated_passed = 0
+    t_differences = []
+    for filepath in t_files:
+        name = os.path.basename(filepath)
+        s_expected = run_test(filepath, Interpreter, f_timeout)
+        s_actual = run_generated_test(filepath, f_timeout)
+
+        n_passed += s_expected == "pass"
+        n_generated_passed += s_actual == "pass"
+        if s_actual != s_expected:
+            t_differences.append((name, s_expected, s_actual))
+        if b_verbose:
+            print(f"{name}: interpreter={s_expected} codegen={s_actual}")
+
+    logging.disable(logging.NOTSET)
+
+    for name, s_expected, s_actual in t_differences:
+        print(f"DIFF {name}: interpreter={s_expected} codegen={s_actual}")
+    print(f"interpreter: PASS {n_passed} of {len(t_files)}")
+    print(f"codegen:     PASS {n_generated_passed} of {len(t_files)}")
+    print(f"{len(t_files) - len(t_differences)} of {len(t_files)} verdicts are equal")
+    sys.exit(1 if t_differences else 0)
@@ -0,0 +1,138 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Copyright 2024, Alex Zhornyak, alexander.zhornyak@gmail.com
+
+""" Memory soak of invoke/cancel cycles
+
+Every cycle enters a state with an <invoke> of an inline child session
+and leaves it, which cancels the child. The invoke has no id, so every
+child session gets a new sessionid. The traced memory, the sizes of the
+routing tables and the count of the named loggers are sampled and must stay
+flat. Exits with 1 if they grow after the warm-up.
+
+Usage: blender -b --python benchmarks/soak_invoke_registry.py -- [-n CYCLES] [-s SAMPLES]
+"""
+
+import os
+import sys
+import gc
+import logging
+import tracemalloc
+
+import bpy
+
+s_blend_scxml_path = os.path.join(os.path.dirname(__file__), "..", "src")
+sys.path.append(s_blend_scxml_path)
+
+from blend_scxml.py_blend_scxml import StateMachine  # noqa: E402
+from blend_scxml.louie import dispatcher  # noqa: E402
+
+# NOTE: a leak of one small object per cycle is over it after 10k cycles
+MAX_GROWTH_KIB = 64
+
+SOURCE = '''
+<scxml xmlns="http://www.w3.org/2005/07/scxml" version="1.0" datamodel="python" initial="idle">
+    <state id="idle">
+        <transition event="next" target="busy"/>
+    </state>
+    <state id="busy">
+        <invoke type="scxml">
+            <content>
+                <scxml xmlns="http://www.w3.org/2005/07/scxml" version="1.0" datamodel="python">
+                    <datamodel><data id="payload" expr="list(range(16))"/></datamodel>
+                    <state id="work"/>
+                </scxml>
+            </content>
+        </invoke>
+        <transition event="next" target="idle"/>
+    </state>
+</scxml>
+'''
+
+
+def drain(sm):
+    interpreter = sm.interpreter
+    interpreter.mainEventLoop()
+    while not interpreter.externalQueueGuard:
+        interpreter.mainEventLoop()
+
+
+def finish_child(inv):
+    '''runs the cancelled child to its exit, in Blender it is done by its timer'''
+    while inv.sm.interpreter.mainEventLoop() is not None:
+        pass
+    # NOTE: the invoke unregisters the timer of the child when it exits
+    if bpy.app.timers.is_registered(inv.timer):
+        raise RuntimeError(f"The timer of the cancelled session '{inv.sm.sessionid}' is still registered")
+
+
+def table_sizes(sm):
+    return (
+        len(dispatcher.connections), len(dispatcher.senders), len(dispatcher.senders_back),
+        len(sm.registry), len(sm.datamodel.sessions.sm_mapping), len(logging.Logger.manager.loggerDict))
+
+
+def run(cycles, samples):
+    sm = StateMachine(SOURCE)
+    sm._start()
+    wrapper = sm.doc.getState("busy").invoke[0]
+
+    t_samples = []
+    step = max(cycles // samples, 1)
+    tracemalloc.start()
+    for i in range(cycles):
+        sm.send("next")
+        drain(sm)
+        inv = wrapper.invoke_obj
+        sm.send("next")
+        drain(sm)
+        finish_child(inv)
+
+        if (i + 1) % step == 0:
+            gc.collect()
+            current, _ = tracemalloc.get_traced_memory()
+            t_samples.append((i + 1, current, table_sizes(sm)))
+    tracemalloc.stop()
+    return t_samples
+
+
+if __name__ == "__main__":
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+
+    n_cycles = 100000
+    n_samples = 10
+    for idx, arg in enumerate(argv):
+        if arg == "-n":
+            n_cycles = int(argv[idx + 1])
+        elif arg == "-s":
+            n_samples = int(argv[idx + 1])
+
+    t_samples = run(n_cycles, n_samples)
+
+    print(f"{'cycles':>8} {'traced KiB':>11}  louie(connections, senders, senders_back) registry sessions loggers")
+    for cycle, current, sizes in t_samples:
+        print(f"{cycle:>8} {current / 1024:>11.1f}  {sizes[:3]} {sizes[3]} {sizes[4]} {sizes[5]}")
+
+    # NOTE: the first sample includes the warm-up allocations (caches, loggers)
+    first, last = t_samples[min(1, len(t_samples) - 1)], t_samples[-1]
+    f_growth_kib = (last[1] - first[1]) / 1024
+    print(f"growth after warm-up: {f_growth_kib:.1f} KiB")
+    if f_growth_kib > MAX_GROWTH_KIB or last[2] != first[2]:
+        print("FAIL the memory or the tables grow")
+        sys.exit(1)
@@ -0,0 +1,77 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Copyright 2024, Alex Zhornyak, alexander.zhornyak@gmail.com
+
+""" Coverage report of the saved coverage maps (see blend_scxml.scxml_coverage)
+
+Usage: blender -b --python scxml_coverage.py -- -f SCXML -c COVERAGE [-c COVERAGE]... [-html OUTPUT] [-scxml OUTPUT]
+
+The coverage files are merged, '-c' also accepts the coverage of the other
+revisions of the document, their states and transitions are matched by ids.
+"""
+import os
+import sys
+import logging
+import logging.config
+
+s_blend_scxml_path = os.path.join(os.path.dirname(__file__), "src")
+sys.path.append(s_blend_scxml_path)
+
+from blend_scxml.py_blend_scxml import StateMachine  # noqa: E402
+from blend_scxml.scxml_coverage import CoverageMap, annotate_scxml, html_report  # noqa: E402
+from blend_scxml.consts import PYSCXML_LOGGING_CONFIG, PYSCXML_LITERAL  # noqa: E402
+
+
+if __name__ == "__main__":
+    logging.config.dictConfig(PYSCXML_LOGGING_CONFIG)
+
+    logger = logging.getLogger(f"{PYSCXML_LITERAL}.coverage")
+
+    s_scxml = None
+    t_coverage_files = []
+    s_html_output = None
+    s_scxml_output = None
+
+    for idx, arg in enumerate(sys.argv):
+        if arg == "-f":
+            s_scxml = sys.argv[idx + 1]
+        elif arg == "-c":
+            t_coverage_files.append(sys.argv[idx + 1])
+        elif arg == "-html":
+            s_html_output = sys.argv[idx + 1]
+        elif arg == "-scxml":
+            s_scxml_output = sys.argv[idx + 1]
+
+    if not s_scxml or not t_coverage_files:
+        print(__doc__)
+        sys.exit(2)
+
+    sm = StateMachine(os.path.abspath(s_scxml), setup_session=False)
+    coverage_map = CoverageMap.from_document(sm.doc)
+    for s_coverage_file in t_coverage_files:
+        coverage_map.merge(CoverageMap.load(s_coverage_file))
+
+    logger.info(f"coverage: {coverage_map.summary()}")
+
+    if s_html_output:
+        with open(s_html_output, "w", encoding="utf-8") as f:
+            f.write(html_report(coverage_map, sm.compiler.root, title=os.path.basename(s_scxml)))
+    if s_scxml_output:
+        with open(s_scxml_output, "w", encoding="utf-8") as f:
+            f.write(annotate_scxml(sm.compiler.root, coverage_map))
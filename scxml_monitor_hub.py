@@ -0,0 +1,67 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Copyright 2024, Alex Zhornyak, alexander.zhornyak@gmail.com
+
+""" Monitor hub, runs outside of Blender
+
+Usage: python scxml_monitor_hub.py [-p PORT] [-s HOST:PORT [-m MACHINE,...] [-f STATE_PREFIX,...]]...
+
+Set remote_port of UdpMonitorSettings to the hub PORT (11010 by default),
+'-s' adds a static subscriber, for example ScxmlEditor at 127.0.0.1:11005,
+'-m' and '-f' filter the preceding static subscriber.
+"""
+import os
+import sys
+import logging
+import logging.config
+
+s_blend_scxml_path = os.path.join(os.path.dirname(__file__), "src")
+sys.path.append(s_blend_scxml_path)
+
+from blend_scxml.monitor_hub import MonitorHub  # noqa: E402
+from blend_scxml.consts import PYSCXML_LOGGING_CONFIG, PYSCXML_LITERAL  # noqa: E402
+
+
+if __name__ == "__main__":
+    logging.config.dictConfig(PYSCXML_LOGGING_CONFIG)
+
+    logger = logging.getLogger(f"{PYSCXML_LITERAL}.hub")
+
+    port = 11010
+    t_subscribers = []
+
+    for idx, arg in enumerate(sys.argv):
+        if arg == "-p":
+            port = int(sys.argv[idx + 1])
+        elif arg == "-s":
+            host, s_port = sys.argv[idx + 1].rsplit(":", 1)
+            t_subscribers.append({"address": (host, int(s_port))})
+        elif arg == "-m" and t_subscribers:
+            t_subscribers[-1]["machines"] = sys.argv[idx + 1].split(",")
+        elif arg == "-f" and t_subscribers:
+            t_subscribers[-1]["state_prefixes"] = sys.argv[idx + 1].split(",")
+
+    hub = MonitorHub(port=port)
+    for p_subscriber in t_subscribers:
+        hub.subscribe(p_subscriber.pop("address"), **p_subscriber)
+
+    try:
+        hub.serve_forever()
+    except KeyboardInterrupt:
+        logger.info(f"stats: {hub.stats()}")
@@ -0,0 +1,287 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Copyright 2024, Alex Zhornyak, alexander.zhornyak@gmail.com
+
+""" Specialized transition selection, generated ahead of time.
+
+The generated module contains an 'Interpreter' subclass for one particular
+SCXMLDocument which specializes the transition selection only:
+
+- event and eventless transition selection is emitted as per-state
+  straight-line 'if' dispatch on the event tokens
+- the transition domains are precomputed
+- the results of getTargetStates are cached per target list
+
+It is not an ahead-of-time interpreter: the entry and exit sequences are
+computed at runtime by the regular Interpreter and are not inlined, and
+executable content is not emitted as Python, it is still executed by the
+closures of the Compiler.
+
+    module = codegen.compile_document(StateMachine(source).doc)
+    sm = StateMachine(source, interpreter_class=module.Interpreter)
+
+The W3C tests are the oracle of the generated transition selection, see
+benchmarks/run_w3c_codegen.py.
+"""
+
+import types
+
+from .interpreter import (
+    Interpreter,
+    getProperAncestors,
+    isAtomicState,
+)
+
+
+class _Writer(object):
+    def __init__(self):
+        self.lines = []
+        self.indent = 0
+
+    def __call__(self, line=""):
+        self.lines.append(("    " * self.indent + line) if line else "")
+
+    def block(self):
+        writer = self
+
+        class _Block(object):
+            def __enter__(self):
+                writer.indent += 1
+
+            def __exit__(self, *args):
+                writer.indent -= 1
+
+        return _Block()
+
+    def source(self):
+        return "\n".join(self.lines) + "\n"
+
+
+def iter_transitions(doc):
+    '''yields (state, index, transition) for every transition in document order'''
+    for node in sorted(doc.stateDict.values(), key=lambda x: x.n):
+        for idx, t in enumerate(node.transition):
+            yield node, idx, t
+
+
+def event_test(descriptors):
+    '''returns the python expression that matches the 'tokens' list against transition event descriptors'''
+    if ["*"] in descriptors:
+        return None
+
+    t_tests = []
+    for tokens in descriptors:
+        t_parts = ["n >= %d" % len(tokens)] if len(tokens) > 1 else []
+        t_parts.extend("tokens[%d] == %r" % (i, token) for i, token in enumerate(tokens))
+        t_tests.append(" and ".join(t_parts))
+    return " or ".join("(%s)" % x for x in t_tests) if len(t_tests) > 1 else t_tests[0]
+
+
+def method_name(prefix, idx):
+    return "_%s_%d" % (prefix, idx)
+
+
+def generate_source(doc, package=None):
+    '''
+    Generates the source of a python module with an 'Interpreter' class
+    whose transition selection is specialized for the given SCXMLDocument.
+    @param package: the package the runtime is imported from, by default the package of this module
+    '''
+    package = package or __name__.rsplit(".", 1)[0]
+
+    t_transitions = list(iter_transitions(doc))
+    t_index = {id(t): i for i, (_, _, t) in enumerate(t_transitions)}
+    t_atomic = sorted((s for s in doc.stateDict.values() if isAtomicState(s)), key=lambda x: x.n)
+
+    interpreter = Interpreter()
+    interpreter.doc = doc
+
+    p_domains = {}
+    for i, (_, _, t) in enumerate(t_transitions):
+        if not t.target:
+            continue
+        try:
+            tstates = interpreter.getTargetStates(t.target)
+            ancestor = interpreter.getTransitionAncestor(t, tstates)
+        except Exception:
+            # NOTE: broken targets are reported by the runtime
+            continue
+        if ancestor is not None:
+            p_domains[i] = ancestor.id
+
+    w = _Writer()
+    w("# Generated by %s.codegen for '%s'. Do not edit." % (package, doc.name or doc.rootState.id))
+    w()
+    w("from %s.interpreter import Interpreter as BaseInterpreter" % package)
+    w("from %s.datastructures import OrderedSet" % package)
+    w()
+    w("STATE_IDS = frozenset(%r)" % sorted(doc.stateDict))
+    w()
+    w("# NOTE: (source state id, transition index) in document order")
+    w("TRANSITIONS = (")
+    with w.block():
+        for s, idx, _ in t_transitions:
+            w("(%r, %d)," % (s.id, idx))
+    w(")")
+    w()
+    w("# NOTE: transition number -> id of the state whose descendants are exited")
+    w("DOMAINS = {")
+    with w.block():
+        for i, s_id in p_domains.items():
+            w("%d: %r," % (i, s_id))
+    w("}")
+    w()
+    w("ATOMIC_STATES = {")
+    with w.block():
+        for i, s in enumerate(t_atomic):
+            w("%r: %r," % (s.id, method_name("select", i)))
+    w("}")
+    w()
+    w()
+    w("class Interpreter(BaseInterpreter):")
+    with w.block():
+        w("def interpret(self, document, invokeId=None):")
+        with w.block():
+            w("self.bind(document)")
+            w("BaseInterpreter.interpret(self, document, invokeId)")
+        w()
+        w("def bind(self, document):")
+        with w.block():
+            w("if set(document.stateDict) != STATE_IDS:")
+            with w.block():
+                w("raise RuntimeError(\"The document '%s' does not match the compiled interpreter.\" % document.name)")
+            w("self._T = T = [document.getState(s_id).transition[idx] for s_id, idx in TRANSITIONS]")
+            w("self._domains = {T[i]: document.getState(s_id) for i, s_id in DOMAINS.items()}")
+            w("self._targets = {}")
+            w("self._selectors = {}")
+            w("self._eventless = {}")
+            w("for s_id, s_name in ATOMIC_STATES.items():")
+            with w.block():
+                w("state = document.getState(s_id)")
+                w("self._selectors[state] = getattr(self, s_name)")
+                w("self._eventless[state] = getattr(self, s_name + '_eventless')")
+        w()
+        w("def getTargetStates(self, targetIds):")
+        with w.block():
+            w("key = tuple(targetIds)")
+            w("states = self._targets.get(key)")
+            w("if states is None:")
+            with w.block():
+                w("states = self._targets[key] = BaseInterpreter.getTargetStates(self, targetIds)")
+            w("return list(states)")
+        w()
+        w("def getTransitionAncestor(self, t, tstates):")
+        with w.block():
+            w("ancestor = self._domains.get(t)")
+            w("if ancestor is None:")
+            with w.block():
+                w("return BaseInterpreter.getTransitionAncestor(self, t, tstates)")
+            w("return ancestor")
+        w()
+        w("def atomicStates(self):")
+        with w.block():
+            w("selectors = self._selectors")
+            w("return sorted((s for s in self.configuration if s in selectors), key=lambda s: s.n)")
+        w()
+        w("def selectEventlessTransitions(self):")
+        with w.block():
+            w("enabledTransitions = OrderedSet()")
+            w("eventless = self._eventless")
+            w("for state in self.atomicStates():")
+            with w.block():
+                w("t = eventless[state]()")
+                w("if t is not None:")
+                with w.block():
+                    w("enabledTransitions.add(t)")
+            w("return self.filterPreempted(enabledTransitions)")
+        w()
+        w("def selectTransitions(self, event):")
+        with w.block():
+            w("enabledTransitions = OrderedSet()")
+            w("tokens = event.name.split('.')")
+            w("n = len(tokens)")
+            w("selectors = self._selectors")
+            w("for state in self.atomicStates():")
+            with w.block():
+                w("t = selectors[state](tokens, n)")
+                w("if t is not None:")
+                with w.block():
+                    w("enabledTransitions.add(t)")
+            w("return self.removeConflictingTransitions(enabledTransitions)")
+
+        for i, state in enumerate(t_atomic):
+            t_chain = [state] + getProperAncestors(state, None)
+
+            w()
+            w("def %s(self, tokens, n):" % method_name("select", i))
+            with w.block():
+                w("T = self._T")
+                for s in t_chain:
+                    w("# %s" % s)
+                    for t in s.transition:
+                        if not t.event:
+                            continue
+                        k = t_index[id(t)]
+                        s_test = event_test(t.event)
+                        if t.cond:
+                            s_test = "(%s) and self.conditionMatch(T[%d])" % (s_test, k) if s_test else "self.conditionMatch(T[%d])" % k
+                        if s_test:
+                            w("if %s:" % s_test)
+                            with w.block():
+                                w("return T[%d]" % k)
+                        else:
+                            w("return T[%d]" % k)
+                w("return None")
+
+            w()
+            w("def %s_eventless(self):" % method_name("select", i))
+            with w.block():
+                w("T = self._T")
+                for s in t_chain:
+                    for t in s.transition:
+                        if t.event:
+                            continue
+                        k = t_index[id(t)]
+                        if t.cond:
+                            w("if self.eventlessConditionMatch(T[%d]):" % k)
+                            with w.block():
+                                w("return T[%d]" % k)
+                        else:
+                            w("return T[%d]" % k)
+                w("return None")
+
+    return w.source()
+
+
+def load_module(source, name="scxml_compiled"):
+    '''Executes the generated source and returns it as a module object'''
+    module = types.ModuleType(name)
+    exec(compile(source, "<%s>" % name, "exec"), module.__dict__)
+    return module
+
+
+def compile_document(doc, name="scxml_compiled"):
+    '''Generates and loads the module with the specialized transition selection for the document'''
+    return load_module(generate_source(doc), name)
+
+
+def write_module(doc, filepath):
+    '''Writes the generated module to the file, it may be imported like any other python module'''
+    with open(filepath, "wt", encoding="utf-8") as f:
+        f.write(generate_source(doc))
@@ -23,6 +23,7 @@ This file is part of pyscxml.
 
 import bpy
 
+import io
 import re
 import os
 import logging
@@ -41,20 +42,14 @@ from .node import (
     # SCXMLNode
 )
 
-# author="Patrick K. O'Brien and contributors",
-# url="https://github.com/11craft/louie/",
-# download_url="https://pypi.python.org/pypi/Louie",
-# license="BSD"
-from .louie import dispatcher
-
+from .registry import SignalRegistry
 from .eventprocessor import Event, SCXMLEventProcessor as Processor, ScxmlMessage
 from .invoke import InvokeWrapper, InvokeSCXML
-from xml.parsers.expat import ExpatError
 from xml.etree import ElementTree as etree
 import textwrap
 
 
-from .datamodel import PythonDataModel
+from .datamodel import PythonDataModel, NullDataModel
 from .errors import (
     ExprEvalError,
     AttributeEvalError,
@@ -76,6 +71,7 @@ from queue import Queue
 # Copyright (c) 2020 Polydojo, Inc.
 # https://github.com/polydojo/dotsi
 from .dotsi import Dict
+from .consts import COALESCE_ATTRIBUTE, DEPENDENCY_TRACKING_ATTRIBUTE, CoalescePolicy
 
 
 re_csstime_pattern = r"([0123456789.]+)\s*(s|ms)?"
@@ -95,11 +91,12 @@ def split_ns(node):
 ns = "http://www.w3.org/2005/07/scxml"
 tagsForTraversal = ["scxml", "state", "parallel", "history", "final", "transition", "invoke", "onentry", "onexit", "datamodel"]
 tagsForTraversal = [prepend_ns(tag) for tag in tagsForTraversal]
+tagsForInitial = frozenset(prepend_ns(tag) for tag in ["state", "parallel", "final"])
 custom_exec_mapping = {}
 preprocess_mapping = {}
 datamodel_mapping = {
     "python": PythonDataModel,
-    "null": PythonDataModel,  # NOTE: probably shouldn't allow script in the null datamodel
+    "null": NullDataModel,
 }
 custom_sendtype_mapping = {}
 
@@ -116,6 +113,8 @@ class Compiler(object):
     '''The class responsible for compiling the statemachine'''
     def __init__(self):
         self.doc = SCXMLDocument()
+        # NOTE: the <scxml> element of the parsed document
+        self.root: etree.Element = None
 
         # used by data passed to invoked processes
         self.initData = Dict()
@@ -126,12 +125,22 @@ class Compiler(object):
         self.log_function = None
         self.strict_parse = False
         self.timer_mapping = {}
+        # NOTE: the scheduler of the delayed sends with the bpy.app.timers interface,
+        #   replaced by replay.ManualTimers to run the machine in the virtual time
+        self.timers = bpy.app.timers
         self.instantiate_datamodel = None
         self.default_datamodel = "python"
         self.invokeid_counter = 0
         self.sendid_counter = 0
+        # NOTE: the count of the errors raised by raiseError, exported by MultiSession metrics
+        self.error_counter = 0
         self.parentId = None
-        self.logger: logging.Logger = None
+        self.logger: logging.Logger | logging.LoggerAdapter = None
+        # NOTE: routes of the invokes, owned by the session (see StateMachine.registry)
+        self.registry = SignalRegistry()
+        # NOTE: ids of <data> elements and (transition, cond) for the dependency analysis
+        self.dataNames = set()
+        self.condTransitions = []
 
     def setupDatamodel(self, datamodel):
         self.datamodel = datamodel
@@ -143,13 +152,26 @@ class Compiler(object):
         self.dm["__event"] = None
         self.dm["In"] = self.interpreter.In
 
+    def setupCoalescing(self, value):
+        '''
+        @param value: the blend:coalesce attribute of <scxml>, the space separated
+        event names with the optional ':latest' or ':merge' policy suffix
+        '''
+        for item in value.split():
+            name, _, policy = item.partition(":")
+            try:
+                self.interpreter.setCoalescing(name, policy or CoalescePolicy.latest)
+            except ValueError as e:
+                self.logger.error(f"The coalescing of '{name}' is ignored: {e}")
+
     def parseAttr(self, elem, attr, default=None, is_list=False):
         if not elem.get(attr, elem.get(attr + "expr")):
             return default
         else:
             try:
                 stringify = {
-                    "python": "str"
+                    "python": "str",
+                    "null": "str"
                 }
                 expr = elem.get(attr + "expr")
 
@@ -160,8 +182,7 @@ class Compiler(object):
                 raise AttributeEvalError(e, elem, attr + "expr")
             return output if not is_list else output.split(" ")
 
-    def init_scripts(self, tree):
-        scripts = tree.iter(prepend_ns("script"))
+    def init_scripts(self, scripts):
         scripts = filter(lambda x: x.get("src"), scripts)
 
         self.script_src = self.parallelize_download(scripts)
@@ -227,8 +248,8 @@ class Compiler(object):
                     sendid = self.parseAttr(node, "sendid")
                     if sendid in self.timer_mapping:
                         p_sender = self.timer_mapping[sendid]
-                        if bpy.app.timers.is_registered(p_sender):
-                            bpy.app.timers.unregister(p_sender)
+                        if self.timers.is_registered(p_sender):
+                            self.timers.unregister(p_sender)
                         del self.timer_mapping[sendid]
                 elif node_name == "assign":
                     try:
@@ -280,6 +301,8 @@ class Compiler(object):
             elif node_ns in custom_exec_mapping:
                 # execute functions registered using scxml.pyscxml.custom_executable
                 custom_exec_mapping[node_ns](node, self.dm)
+                if hasattr(type(self.dm), "markUnknownWritten"):
+                    self.dm.markUnknownWritten()
 
             else:
                 if self.strict_parse:
@@ -475,7 +498,7 @@ class Compiler(object):
 
         if delay:
             self.timer_mapping[sendid] = sender
-            bpy.app.timers.register(sender, first_interval=delay, persistent=True)
+            self.timers.register(sender, first_interval=delay, persistent=True)
             pass
         else:
             try:
@@ -484,161 +507,213 @@ class Compiler(object):
                 raise SendExecutionError("%s: %s" % (e.__class__, e))
 
     def raiseError(self, err, exception=None, sendid=None):
+        self.error_counter += 1
         # self.interpreter.send(err.split("."), data=exception)
         self.interpreter.raiseFunction(err.split("."), exception, sendid=sendid, type="platform")
 
     def parseXML(self, xmlStr, interpreterRef):
         self.interpreter = interpreterRef
-        xmlStr = self.addDefaultNamespace(xmlStr)
+
+        builder = _StreamBuilder(self)
         try:
-            tree = self.xml_from_string(xmlStr)
-        except ExpatError:
+            for event, elem in etree.iterparse(io.StringIO(xmlStr), events=("start", "end")):
+                if event == "start":
+                    builder.start(elem)
+                else:
+                    builder.end(elem)
+        except etree.ParseError:
             xmlStr = "\n".join("%s %s" % (n, line) for n, line in enumerate(xmlStr.split("\n")))
             self.logger.error(xmlStr)
             raise
-        self.strict_parse = tree.get("exmode", "lax") == "strict"
-        self.doc.binding = tree.get("binding", "early")
-        t_items = preprocess(tree)
-        self.setupDatamodel(tree.get("datamodel", self.default_datamodel))
 
-        def init():
-            try:
-                self.setDatamodel(tree)
-            except Exception as e:
-                self.raiseError("error.execution", e)
-        self.instantiate_datamodel = init
-        self.init_scripts(tree)
-
-        for n, parent, node in t_items:
-            if parent is not None and parent.get("id"):
-                parentState = self.doc.getState(parent.get("id"))
-
-            node_ns, node_tag = split_ns(node)
-            if node_tag == "scxml":
-                s = State(node.get("id"), None, n)
-                s.initial = self.parseInitial(node)
-                self.doc.name = node.get("name", "")
-                self.dm["_name"] = node.get("name", "")
-                for scriptChild in node.findall(prepend_ns("script")):
-                    script_text = scriptChild.text
-                    if script_text is None:
-                        p_script_data = self.script_src.get(scriptChild, None)
-                        if p_script_data:
-                            script_text = p_script_data[1]
-
-                    if script_text is None:
-                        script_text = ""
+        return self.doc
 
+    def startNode(self, n, node, parentState):
+        '''
+        Creates the document node for the element at its start tag.
+        Only attributes are available here, everything that depends on
+        the children is completed in endNode.
+        '''
+        node_ns, node_tag = split_ns(node)
+        if node_tag == "scxml":
+            self.root = node
+            self.strict_parse = node.get("exmode", "lax") == "strict"
+            self.doc.binding = node.get("binding", "early")
+            self.setupCoalescing(node.get(COALESCE_ATTRIBUTE, ""))
+            self.interpreter.dependencyTracking = node.get(DEPENDENCY_TRACKING_ATTRIBUTE, "false").lower() == "true"
+            self.setupDatamodel(node.get("datamodel", self.default_datamodel))
+
+            def init():
+                try:
+                    self.setDatamodel(node)
+                except Exception as e:
+                    self.raiseError("error.execution", e)
+            self.instantiate_datamodel = init
+
+            s = State(node.get("id"), None, n)
+            self.doc.name = node.get("name", "")
+            self.dm["_name"] = node.get("name", "")
+            self.doc.rootState = s
+            return s
+
+        elif node_tag == "state":
+            s = State(node.get("id"), parentState, n)
+
+            self.doc.addNode(s)
+            parentState.addChild(s)
+            return s
+
+        elif node_tag == "parallel":
+            s = Parallel(node.get("id"), parentState, n)
+            self.doc.addNode(s)
+            parentState.addChild(s)
+            return s
+
+        elif node_tag == "final":
+            s = Final(node.get("id"), parentState, n)
+            self.doc.addNode(s)
+            s.donedata = lambda: {}
+            parentState.addFinal(s)
+            return s
+
+        elif node_tag == "history":
+            h = History(node.get("id"), parentState, node.get("type"), n)
+            self.doc.addNode(h)
+            parentState.addHistory(h)
+            return h
+
+        elif node_tag == "transition":
+            t = Transition(parentState)
+
+            if node.get("target"):
+                t.target = node.get("target").split(" ")
+            if node.get("event"):
+                t.event = list(map(lambda x: re.sub(r"(.*)\.\*$", r"\1", x).split("."), node.get("event").split(" ")))
+            p_compiled_cond = None
+            if node.get("cond") and hasattr(type(self.dm), "compileCond"):
+                p_compiled_cond = self.dm.compileCond(node.get("cond"))
+
+            if p_compiled_cond is not None:
+                t.cond = p_compiled_cond
+            elif node.get("cond"):
+                def f(expr):
                     try:
-                        self.execExpr(script_text)
-                    except ExprEvalError:
-                        # TODO: we should probably crash here.
-                        self.logger.exception("An exception was raised in a top-level script element.")
-
-                self.doc.rootState = s
-            elif node_tag == "state":
-                s = State(node.get("id"), parentState, n)
-                s.initial = self.parseInitial(node)
-
-                self.doc.addNode(s)
-                parentState.addChild(s)
+                        return self.getExprValue(expr)
+                    except Exception as e:
+                        self.raiseError("error.execution", e)
+                        xml_str = etree.tostring(node, encoding='unicode')
+                        self.logger.error("Evaluation of cond failed on line %s: %s :%s" % (xml_str, expr, str(e)))
 
-            elif node_tag == "parallel":
-                s = Parallel(node.get("id"), parentState, n)
-                self.doc.addNode(s)
-                parentState.addChild(s)
+                t.cond = partial(f, node.get("cond"))
+                self.condTransitions.append((t, node.get("cond")))
+            t.type = node.get("type", "external")
 
-            elif node_tag == "final":
-                s = Final(node.get("id"), parentState, n)
-                self.doc.addNode(s)
+            t.exe = partial(self.try_execute_content, node)
+            parentState.addTransition(t)
 
-                if node.find(prepend_ns("donedata")) is not None:
+        elif node_tag == "invoke":
+            parentState.addInvoke(self.make_invoke_wrapper(node, parentState.id, n))
+        elif node_tag == "onentry":
+            s = Onentry()
 
-                    doneNode = node.find(prepend_ns("donedata"))
+            s.exe = partial(self.try_execute_content, node)
+            parentState.addOnentry(s)
 
-                    def donedata(node):
-                        try:
-                            data = self.parseData(node, forSend=True)
-
-                            try:
-                                # NOTE: 'test561'
-                                if isinstance(data, etree.Element):
-                                    return data
-                                else:
-                                    return Dict(data)
-                            except (TypeError, ValueError):
-                                # NOTE: not key/value data, probably from <content>
-                                return data
-                        except Exception as e:
-                            # TODO: what happens if donedata in the top-level final fails?
-                            # we can't set the _event.data with anything. answer: catch the error in
-                            # the interpreter, insert error in outgoing done event.
-                            xml_str = etree.tostring(node, encoding='unicode')
-                            self.logger.exception("Line %s: Donedata crashed." % xml_str)
-                            self.raiseError("error.execution", exception=e)
-                            # TODO: this may not be consistent with how _event.data is populated from <send>
-                        return None
+        elif node_tag == "onexit":
+            s = Onexit()
+            s.exe = partial(self.try_execute_content, node)
+            parentState.addOnexit(s)
 
-                    s.donedata = partial(donedata, doneNode)
+        elif node_tag == "datamodel":
+            # NOTE: data children are collected when the element is closed
+            pass
 
-                else:
-                    s.donedata = lambda: {}
+        else:
+            xml_str = etree.tostring(node, encoding='unicode')
+            self.logger.error("Parsing of element '%s' failed at line %s" % (node_tag, xml_str or "unknown"))
 
-                parentState.addFinal(s)
+        return None
 
-            elif node_tag == "history":
-                h = History(node.get("id"), parentState, node.get("type"), n)
-                self.doc.addNode(h)
-                parentState.addHistory(h)
+    def endNode(self, node, state, parentState, scripts):
+        '''Completes the document node when all children of the element are parsed'''
+        node_ns, node_tag = split_ns(node)
+        if node_tag == "scxml":
+            state.initial = self.parseInitial(node)
+            self.setCondDependencies()
+            self.init_scripts(scripts)
+            for scriptChild in node.findall(prepend_ns("script")):
+                script_text = scriptChild.text
+                if script_text is None:
+                    p_script_data = self.script_src.get(scriptChild, None)
+                    if p_script_data:
+                        script_text = p_script_data[1]
+
+                if script_text is None:
+                    script_text = ""
 
-            elif node_tag == "transition":
-                t = Transition(parentState)
+                try:
+                    self.execExpr(script_text)
+                except ExprEvalError:
+                    # TODO: we should probably crash here.
+                    self.logger.exception("An exception was raised in a top-level script element.")
 
-                if node.get("target"):
-                    t.target = node.get("target").split(" ")
-                if node.get("event"):
-                    t.event = list(map(lambda x: re.sub(r"(.*)\.\*$", r"\1", x).split("."), node.get("event").split(" ")))
-                if node.get("cond"):
-                    def f(expr):
-                        try:
-                            return self.getExprValue(expr)
-                        except Exception as e:
-                            self.raiseError("error.execution", e)
-                            xml_str = etree.tostring(node, encoding='unicode')
-                            self.logger.error("Evaluation of cond failed on line %s: %s :%s" % (xml_str, expr, str(e)))
+        elif node_tag == "state":
+            state.initial = self.parseInitial(node)
 
-                    t.cond = partial(f, node.get("cond"))
-                t.type = node.get("type", "external")
+        elif node_tag == "final":
+            if node.find(prepend_ns("donedata")) is not None:
 
-                t.exe = partial(self.try_execute_content, node)
-                parentState.addTransition(t)
+                doneNode = node.find(prepend_ns("donedata"))
 
-            elif node_tag == "invoke":
-                parentState.addInvoke(self.make_invoke_wrapper(node, parentState.id, n))
-            elif node_tag == "onentry":
-                s = Onentry()
+                def donedata(node):
+                    try:
+                        data = self.parseData(node, forSend=True)
 
-                s.exe = partial(self.try_execute_content, node)
-                parentState.addOnentry(s)
+                        try:
+                            # NOTE: 'test561'
+                            if isinstance(data, etree.Element):
+                                return data
+                            else:
+                                return Dict(data)
+                        except (TypeError, ValueError):
+                            # NOTE: not key/value data, probably from <content>
+                            return data
+                    except Exception as e:
+                        # TODO: what happens if donedata in the top-level final fails?
+                        # we can't set the _event.data with anything. answer: catch the error in
+                        # the interpreter, insert error in outgoing done event.
+                        xml_str = etree.tostring(node, encoding='unicode')
+                        self.logger.exception("Line %s: Donedata crashed." % xml_str)
+                        self.raiseError("error.execution", exception=e)
+                        # TODO: this may not be consistent with how _event.data is populated from <send>
+                    return None
 
-            elif node_tag == "onexit":
-                s = Onexit()
-                s.exe = partial(self.try_execute_content, node)
-                parentState.addOnexit(s)
+                state.donedata = partial(donedata, doneNode)
 
-            elif node_tag == "datamodel":
-                def initDatamodel(datalist):
-                    try:
-                        self.setDataList(datalist)
-                    except Exception:
-                        self.logger.exception("Evaluation of a data element failed.")
-                parentState.initDatamodel = partial(initDatamodel, node.findall(prepend_ns("data")))
+        elif node_tag == "datamodel":
+            self.dataNames.update(data.get("id") for data in node.findall(prepend_ns("data")))
 
-            else:
-                xml_str = etree.tostring(node, encoding='unicode')
-                self.logger.error("Parsing of element '%s' failed at line %s" % (node_tag, xml_str or "unknown"))
+            def initDatamodel(datalist):
+                try:
+                    self.setDataList(datalist)
+                except Exception:
+                    self.logger.exception("Evaluation of a data element failed.")
+            parentState.initDatamodel = partial(initDatamodel, node.findall(prepend_ns("data")))
 
-        return self.doc
+    def setCondDependencies(self):
+        '''
+        Marks the transition conds which read only <data> names, _event and In(),
+        so the interpreter may skip them while nothing they read has changed.
+        NOTE: used only when Interpreter.dependencyTracking is on (blend:dependency-tracking)
+        '''
+        if not hasattr(type(self.dm), "exprInfo"):
+            return
+        trackedNames = self.dataNames | {"_event", "_name", "_sessionid"}
+        for t, expr in self.condTransitions:
+            info = self.dm.exprInfo(expr)
+            if info.is_pure and info.names <= trackedNames:
+                t.dependencies = info
+        self.condTransitions = []
 
     def execExpr(self, expr):
         if not expr or not expr.strip():
@@ -670,15 +745,22 @@ class Compiler(object):
                 return
             wrapper.set_invoke(inv)
 
-            dispatcher.connect(self.onInvokeSignal, "init.invoke." + inv.invokeid, inv)
-            dispatcher.connect(self.onInvokeSignal, "result.invoke." + inv.invokeid, inv)
-            dispatcher.connect(self.onInvokeSignal, "error.communication.invoke." + inv.invokeid, inv)
+            def cancel():
+                # NOTE: the routes of the invoke are released with it
+                self.registry.disconnect_sender(inv)
+                inv.cancel()
+            wrapper.cancel = cancel
+
+            registry = self.registry
+            registry.connect(self.onInvokeSignal, "init.invoke." + inv.invokeid, inv)
+            registry.connect(self.onInvokeSignal, "result.invoke." + inv.invokeid, inv)
+            registry.connect(self.onInvokeSignal, "error.communication.invoke." + inv.invokeid, inv)
             try:
                 if isinstance(inv, InvokeSCXML):
                     def onCreated(sender, sm):
                         sessionid = sm.sessionid
                         self.dm.sessions.make_session(sessionid, sm)
-                    dispatcher.connect(onCreated, "created", inv, weak=False)
+                    registry.connect(onCreated, "created", inv)
                 inv.start(self.dm.sessionid)
             except Exception as e:
                 xml_str = etree.tostring(node, encoding='unicode')
@@ -771,8 +853,7 @@ class Compiler(object):
             initial.exe = partial(self.try_execute_content, transitionNode)
             return initial
         else:  # NOTE: has neither initial tag or attribute, so we'll make the first valid state a target instead.
-            childNodes = filter(lambda x: x.tag in map(prepend_ns, ["state", "parallel", "final"]), list(node))
-            firstChild = next(childNodes, None)
+            firstChild = next((x for x in node if x.tag in tagsForInitial), None)
             if firstChild is not None:
                 return Initial([firstChild.get("id")])
             return None  # NOTE: leaf nodes have no initial
@@ -833,23 +914,6 @@ class Compiler(object):
             #            self.dm.setdefault(key, value)
             self.dm[key] = value
 
-    def addDefaultNamespace(self, xmlStr):
-        root: etree.Element = etree.fromstring(xmlStr)
-        warnmsg = (
-            "Your document lacks the correct "
-            "default namespace declaration. It has been added for you, for parsing purposes.")
-
-        if "scxml" in root.tag and root.tag != prepend_ns("scxml"):
-            self.logger.warn(warnmsg)
-            return xmlStr.replace("<scxml", "<scxml xmlns='http://www.w3.org/2005/07/scxml'", 1)
-
-        return xmlStr
-
-    def xml_from_string(self, xmlstr):
-        parser = etree.XMLParser()
-        tree = etree.XML(xmlstr, parser)
-        return tree
-
     def parallelize_download(self, nodelist):
         def download(node):
             src = node.get("src")
@@ -902,52 +966,88 @@ class Compiler(object):
             urllib.request.urlopen(url).read().decode(encoding="utf-8"))
 
 
-def preprocess(tree: etree.ElementTree):
-    tree.set("id", "__main__")
-    toAppend = []
-    for parent in tree.iter():
-        for child in parent:
-            node_ns, node_tag = split_ns(child)
+_scriptTag = prepend_ns("script")
+
+
+class _StreamBuilder(object):
+    '''
+    Single pass front end for Compiler.parseXML.
+    Consumes iterparse start/end events, fixes up the default namespace,
+    runs preprocessors, synthesizes missing ids and feeds node construction
+    in document order.
+    '''
+    def __init__(self, compiler):
+        self.compiler = compiler
+        self.n = 0
+        self.fix_ns = None
+        # NOTE: (element, is traversed, document node) for every open element
+        self.stack = []
+        self.scripts = []
+
+    def start(self, elem):
+        if self.fix_ns is None:
+            self.fix_ns = "{" not in elem.tag and "scxml" in elem.tag
+            if self.fix_ns:
+                self.compiler.logger.warning(
+                    "Your document lacks the correct "
+                    "default namespace declaration. It has been added for you, for parsing purposes.")
+        if self.fix_ns and "{" not in elem.tag:
+            elem.tag = prepend_ns(elem.tag)
+
+        if not self.stack:
+            elem.set("id", "__main__")
+            is_traversed = True
+            parent, parentState = None, None
+        else:
+            parent, is_parent_traversed, parentState = self.stack[-1]
+            is_traversed = is_parent_traversed and elem.tag in tagsForTraversal
+
+        state = None
+        if is_traversed:
+            node_tag = elem.tag[len(ns) + 2:]
+            if node_tag in ("state", "parallel", "final", "history") and not elem.get("id"):
+                elem.set("id", parent.get("id") + "_%s_child_%s" % (node_tag, self.n))
+            state = self.compiler.startNode(self.n, elem, parentState)
+            self.n += 1
+        self.stack.append((elem, is_traversed, state))
+
+    def end(self, elem):
+        _, is_traversed, state = self.stack.pop()
+        if elem.tag == _scriptTag:
+            self.scripts.append(elem)
+
+        if is_traversed:
+            parentState = self.stack[-1][2] if self.stack else None
+            self.compiler.endNode(elem, state, parentState, self.scripts)
+        elif self.stack:
+            node_ns, node_tag = split_ns(elem)
             if node_ns in preprocess_mapping:
-                xmlstr = preprocess_mapping[node_ns](child)
-                i = list(parent).index(child)
-
-                newNode = etree.fromstring("<wrapper>%s</wrapper>" % xmlstr)
-                for node in newNode:
-                    if "{" not in node.tag:
-                        node.set("xmlns", ns)
-                newNode = etree.fromstring(etree.tostring(newNode))
-                toAppend.append((parent, (i, len(newNode)-1), newNode))
-    for parent, (i, j), newNode in toAppend:
-        parent[i:j] = newNode[:]
-
-    t_items = []
-    for n, parent, node in iter_elems(tree):
-        node_ns, node_tag = split_ns(node)
-        if node_tag in ["state", "parallel", "final", "history"] and not node.get("id"):
-            id = parent.get("id") + "_%s_child_%s" % (node_tag, n)
-            node.set('id', id)
-        t_items.append((n, parent, node))
-    return t_items
+                self.replace(elem, preprocess_mapping[node_ns](elem))
 
+    def replace(self, elem, xmlstr):
+        newNode = etree.fromstring("<wrapper>%s</wrapper>" % xmlstr)
+        for node in newNode:
+            if "{" not in node.tag:
+                node.set("xmlns", ns)
+        newNode = etree.fromstring(etree.tostring(newNode))
 
-# TODO: this should be moved to the python datamodel class.
-def normalizeExpr(expr):
-    return textwrap.dedent(expr)
+        # NOTE: the element is the last closed child of its parent at this point
+        parent = self.stack[-1][0]
+        i = len(parent) - 1
+        parent[i:i + 1] = newNode[:]
+        for node in parent[i:i + len(newNode)]:
+            self.walk(node)
 
+    def walk(self, elem):
+        self.start(elem)
+        for child in list(elem):
+            self.walk(child)
+        self.end(elem)
 
-def iter_elems(tree: etree.ElementTree):
-    stack = [(None, tree)]
-    n = 0
 
-    while (len(stack) > 0):
-        parent, child = stack.pop()
-        yield (n, parent, child)
-        n += 1
-        el: etree.Element
-        for el in reversed(child):
-            if el.tag in tagsForTraversal:
-                stack.append((child, el))
+# TODO: this should be moved to the python datamodel class.
+def normalizeExpr(expr):
+    return textwrap.dedent(expr)
 
 
 def iterMain(tree: etree.ElementTree):
@@ -33,6 +33,27 @@ class DispatcherConstants:
     exit                = "signal_exit"
 
 
+class QueuePolicy:
+    """ What the bounded external queue does with an event when it is full (see datastructures.EventQueue) """
+    block               = "block"
+    drop_newest         = "drop_newest"
+    drop_oldest         = "drop_oldest"
+    error               = "error"
+
+
+class CoalescePolicy:
+    """ How a waiting event is collapsed with its new duplicate (see datastructures.EventQueue) """
+    latest              = "latest"
+    merge               = "merge"
+
+
+# NOTE: <scxml blend:coalesce="scene.update bake.changed:merge"> declares the coalescible events of the chart
+BLEND_SCXML_NAMESPACE = "http://www.blend-scxml.org/scxml"
+COALESCE_ATTRIBUTE = "{%s}coalesce" % BLEND_SCXML_NAMESPACE
+# NOTE: <scxml blend:dependency-tracking="true"> turns on the skipping of the unchanged eventless conds
+DEPENDENCY_TRACKING_ATTRIBUTE = "{%s}dependency-tracking" % BLEND_SCXML_NAMESPACE
+
+
 class ErrorFilter(logging.Filter):
     def filter(self, record):
         return record.levelno < logging.ERROR
@@ -6,7 +6,9 @@ Created on Nov 1, 2011
 
 # NOTE: modified by Alex Zhornyak, alexander.zhornyak@gmail.com
 
+import ast
 import sys
+from functools import partial
 import traceback
 import re
 from xml.etree import ElementTree as etree
@@ -28,6 +30,9 @@ from .dotsi import Dict
 assignOnce = ["_sessionid", "_x", "_name", "_ioprocessors"]
 hidden = ["_event"]
 
+# NOTE: builtins which do not modify the datamodel when called in expressions
+pureBuiltins = frozenset(["len", "abs", "min", "max", "bool", "int", "float", "str", "round", "isinstance", "hasattr"])
+
 
 def getTraceback():
     tb_list = traceback.extract_tb(sys.exc_info()[2])
@@ -47,6 +52,49 @@ def exceptionFormatter(f):
     return wrapper
 
 
+class ExprInfo(object):
+    '''Result of the static analysis of an expression'''
+    def __init__(self, is_pure, names=frozenset(), states=frozenset()):
+        # NOTE: evaluation can not change the datamodel
+        self.is_pure = is_pure
+        # NOTE: global names which are read by the expression
+        self.names = names
+        # NOTE: state ids which are checked by In('...')
+        self.states = states
+
+
+def analyzeExpr(expr):
+    try:
+        tree = ast.parse(expr.strip(), mode="eval")
+    except SyntaxError:
+        return ExprInfo(False)
+
+    names = set()
+    states = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call):
+            func = node.func
+            if not isinstance(func, ast.Name):
+                return ExprInfo(False)
+            if func.id == "In":
+                if node.keywords or len(node.args) != 1:
+                    return ExprInfo(False)
+                arg = node.args[0]
+                if isinstance(arg, ast.Constant) and isinstance(arg.value, str):
+                    states.add(arg.value)
+                else:
+                    return ExprInfo(False)
+            elif func.id not in pureBuiltins:
+                return ExprInfo(False)
+        elif isinstance(node, (ast.NamedExpr, ast.Yield, ast.YieldFrom, ast.Await)):
+            return ExprInfo(False)
+        elif isinstance(node, ast.Name):
+            names.add(node.id)
+
+    names.discard("In")
+    return ExprInfo(True, frozenset(names - pureBuiltins), frozenset(states))
+
+
 class ImperativeDataModel(object):
     '''A base class for the python and ecmascript datamodels'''
 
@@ -101,6 +149,11 @@ class ImperativeDataModel(object):
 class PythonDataModel(Dict, ImperativeDataModel):
     '''The default Python Datamodel'''
     def __init__(self, *args, **kwargs):
+        # NOTE: write tracking lives outside of the dict items
+        object.__setattr__(self, "writeVersion", 0)
+        object.__setattr__(self, "_nameVersions", {})
+        object.__setattr__(self, "_unknownVersion", 0)
+        object.__setattr__(self, "_exprInfoCache", {})
         Dict.__init__(self, *args, **kwargs)
 
     def _checkLegalAssignment(self, key):
@@ -111,6 +164,40 @@ class PythonDataModel(Dict, ImperativeDataModel):
         self._checkLegalAssignment(key)
 
         Dict.__setitem__(self, key, val)
+        self.markWritten(key)
+
+    __setattr__ = __setitem__
+
+    def markWritten(self, name):
+        '''
+        Marks the top-level name as changed.
+        NOTE: host code which modifies datamodel values in place should call it
+        '''
+        if name == "__event":
+            name = "_event"
+        object.__setattr__(self, "writeVersion", self.writeVersion + 1)
+        self._nameVersions[name] = self.writeVersion
+
+    def markUnknownWritten(self):
+        '''Marks that any name might be changed'''
+        object.__setattr__(self, "writeVersion", self.writeVersion + 1)
+        object.__setattr__(self, "_unknownVersion", self.writeVersion)
+
+    def isChangedSince(self, names, version):
+        '''Checks whether any of the names was written after writeVersion was equal to version'''
+        if self._unknownVersion > version:
+            return True
+        nameVersions = self._nameVersions
+        for name in names:
+            if nameVersions.get(name, 0) > version:
+                return True
+        return False
+
+    def exprInfo(self, expr):
+        info = self._exprInfoCache.get(expr)
+        if info is None:
+            info = self._exprInfoCache[expr] = analyzeExpr(expr)
+        return info
 
     def __getitem__(self, key):
         # NOTE: raises keyerror
@@ -141,6 +228,7 @@ class PythonDataModel(Dict, ImperativeDataModel):
         self._checkLegalAssignment(s_location)
 
         exec(f"self.{s_location} = self.parseContent(assignNode)")
+        self.markWritten(re.match(r"\w*", s_location).group(0))
 
     def parseContent(self, contentNode):
         output = None
@@ -163,10 +251,82 @@ class PythonDataModel(Dict, ImperativeDataModel):
                 self.logger.error("Line %s: error when parsing content node." % xml_str)
         return output
 
-    @exceptionFormatter
     def evalExpr(self, expr):
+        if not self.exprInfo(expr).is_pure:
+            self.markUnknownWritten()
+        return self._evalExpr(expr)
+
+    @exceptionFormatter
+    def _evalExpr(self, expr):
         return eval(expr, self)
 
     @exceptionFormatter
     def execExpr(self, expr):
+        self.markUnknownWritten()
         exec(expr, self)
+
+
+re_in_cond = re.compile(r"""^\s*In\(\s*(?:'([^']*)'|"([^"]*)")\s*\)\s*$""")
+
+
+class NullDataModel(object):
+    '''
+    The Null Datamodel, see https://www.w3.org/TR/scxml/#minimal-profile
+    Only In('state') conditions are supported, they are compiled at load time.
+    '''
+    def __init__(self):
+        self.data = {}
+
+    def __setitem__(self, key, val):
+        self.data[key] = val
+
+    def __getitem__(self, key):
+        # NOTE: raises keyerror
+        if key in hidden:
+            return self.data["_" + key]
+        return self.data[key]
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def compileCond(self, expr):
+        '''returns the callable which evaluates the condition or None if the expression is not supported'''
+        match = re_in_cond.match(expr)
+        if match is None:
+            return None
+        return partial(self.data["In"], match.group(1) if match.group(1) is not None else match.group(2))
+
+    def evalExpr(self, expr):
+        cond = self.compileCond(expr)
+        if cond is None:
+            raise ExprEvalError(
+                DataModelError("The null datamodel supports only In() conditions, got '%s'." % expr), [])
+        return cond()
+
+    def execExpr(self, expr):
+        raise ExprEvalError(DataModelError("The null datamodel does not support scripts."), [])
+
+    def hasLocation(self, location):
+        return False
+
+    def isLegalName(self, name):
+        return False
+
+    def assign(self, assignNode):
+        raise ExecutableError(
+            IllegalLocationError("The null datamodel does not support assignments."), assignNode)
+
+    def parseContent(self, contentNode):
+        if contentNode is None:
+            return None
+        if contentNode.get("expr"):
+            return self.evalExpr(contentNode.get("expr"))
+        for elem in contentNode:
+            return elem
+        return re.sub(r"\s+", " ", contentNode.text or "").strip()
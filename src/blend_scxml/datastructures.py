@@ -3,7 +3,13 @@ Created on Jan 4, 2010
 
 @author: johan
 '''
+import time
+import queue
 from functools import reduce
+from collections.abc import Mapping
+
+from .consts import QueuePolicy, CoalescePolicy
+from .dotsi import Dict
 
 
 class Nodeset(list):
@@ -32,3 +38,160 @@ class OrderedSet(list):
 
     def clear(self):
         self.__init__()
+
+
+class EventQueue(queue.Queue):
+    '''
+    The external event queue, unbounded while maxsize is 0. When the bounded
+    queue is full the policy (see consts.QueuePolicy) decides:
+        block:       the producer waits up to 'timeout' seconds for a free slot, then the event is dropped
+        drop_newest: the new event is dropped
+        drop_oldest: the oldest waiting event is dropped
+        error:       the new event is dropped and on_overflow is called
+    put() returns False when the new event was dropped. on_overflow(event) is called
+    with the dropped event once per overflow, until the consumer takes the next event.
+
+    The coalescible events (see setCoalescing) have at most one instance waiting,
+    a new duplicate replaces the waiting one and takes the place of the newest,
+    so it is still processed after the events which were queued before it:
+        latest: the data of the new event wins
+        merge:  the dict data of both are merged (one level), the new values win
+    The replaced event is removed from the queue at once and counted in 'coalesced',
+    so a flood of one coalescible event holds one slot of maxsize.
+    NOTE: the producers on the thread of the interpreter (bpy.app.timers, the depsgraph handlers)
+    can't be unblocked by it, 'block' waits the whole timeout there
+    '''
+
+    def __init__(self, maxsize=0, policy=QueuePolicy.block, timeout=1.0, on_overflow=None):
+        queue.Queue.__init__(self, maxsize)
+        self.policy = policy
+        self.timeout = timeout
+        self.on_overflow = on_overflow
+        self.dropped = 0
+        self.blocked = 0
+        self.overflowing = False
+        # NOTE: the ids of the forced events, drop_oldest never drops them
+        self.forced = set()
+        # NOTE: event name -> CoalescePolicy, event name -> the waiting event of the name
+        self.coalesce = {}
+        self.pending = {}
+        self.coalesced = 0
+
+    def configure(self, maxsize, policy=QueuePolicy.block, timeout=1.0):
+        if policy not in (QueuePolicy.block, QueuePolicy.drop_newest, QueuePolicy.drop_oldest, QueuePolicy.error):
+            raise ValueError(f"unknown queue policy '{policy}'")
+        with self.mutex:
+            self.maxsize = maxsize
+            self.policy = policy
+            self.timeout = timeout
+            self.not_full.notify_all()
+
+    def setCoalescing(self, name, policy=CoalescePolicy.latest):
+        '''
+        @param name: the exact event name
+        @param policy: consts.CoalescePolicy, None stops the coalescing of the name
+        '''
+        if policy not in (None, CoalescePolicy.latest, CoalescePolicy.merge):
+            raise ValueError(f"unknown coalesce policy '{policy}'")
+        with self.mutex:
+            if policy is None:
+                self.coalesce.pop(name, None)
+                self.pending.pop(name, None)
+            else:
+                self.coalesce[name] = policy
+
+    def put(self, item, block=True, timeout=None):
+        with self.not_full:
+            replaced = False
+            if self.coalesce:
+                name = getattr(item, "name", None)
+                policy = self.coalesce.get(name)
+                if policy is not None:
+                    waiting = self.pending.get(name)
+                    if waiting is not None:
+                        # NOTE: Event has no __eq__, so the waiting event itself is removed
+                        self.queue.remove(waiting)
+                        self.unfinished_tasks -= 1
+                        self.coalesced += 1
+                        replaced = True
+                        if policy == CoalescePolicy.merge:
+                            item.data = merge_data(waiting.data, item.data)
+                    self.pending[name] = item
+            # NOTE: the replacement takes the slot of the removed event, it is never dropped
+            if not replaced and 0 < self.maxsize <= self._qsize():
+                dropped = self._overflow(item, block, timeout)
+                if dropped is not None:
+                    notify = not self.overflowing
+                    self.overflowing = True
+                    if notify and self.on_overflow:
+                        # NOTE: the callback may put events into the other queues, so the lock is released first
+                        self.not_full.release()
+                        try:
+                            self.on_overflow(dropped)
+                        finally:
+                            self.not_full.acquire()
+                    if dropped is item:
+                        return False
+            self._put(item)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+            return True
+
+    def _overflow(self, item, block, timeout):
+        '''returns the dropped event or None when there is a free slot, it is called under the lock'''
+        if self.policy == QueuePolicy.drop_oldest:
+            for idx, oldest in enumerate(self.queue):
+                if id(oldest) not in self.forced:
+                    del self.queue[idx]
+                    self._forget(oldest)
+                    self.dropped += 1
+                    return oldest
+        if self.policy == QueuePolicy.block and block:
+            self.blocked += 1
+            remaining = self.timeout if timeout is None else timeout
+            if remaining is None:
+                while 0 < self.maxsize <= self._qsize():
+                    self.not_full.wait()
+                return None
+            endtime = time.monotonic() + remaining
+            while 0 < self.maxsize <= self._qsize():
+                remaining = endtime - time.monotonic()
+                if remaining <= 0.0:
+                    break
+                self.not_full.wait(remaining)
+            else:
+                return None
+        self.dropped += 1
+        self._forget(item)
+        return item
+
+    def force(self, item):
+        '''puts the event regardless of the bound, for the cancel events'''
+        with self.mutex:
+            self.forced.add(id(item))
+            self._put(item)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+    def _forget(self, item):
+        name = getattr(item, "name", None)
+        if self.pending.get(name) is item:
+            del self.pending[name]
+
+    def _get(self):
+        self.overflowing = False
+        item = self.queue.popleft()
+        if self.forced:
+            self.forced.discard(id(item))
+        if self.pending:
+            self._forget(item)
+        return item
+
+
+def merge_data(old, new):
+    '''the one level merge of the dict data of the coalesced events, the new value wins otherwise'''
+    if isinstance(old, Mapping) and isinstance(new, Mapping):
+        data = Dict(old)
+        data.update(new)
+        return data
+    return new
@@ -15,6 +15,9 @@ The above software licensing terms DO NOT grant any right in the
 trademarks, service marks, brand names or logos of Polydojo, Inc.
 """;
 
+# NOTE: modified by Alex Zhornyak, alexander.zhornyak@gmail.com
+#   values are dotsified lazily, one level on access, see `isDotsifiable()`
+
 __version__ = "0.0.4-preview";      # Req'd by flit.
 __NOOP__ = lambda: None;    # Blank-ish reference.
 
@@ -24,10 +27,17 @@ def mapObject (func, dicty):
     for k in dicty: result[k] = func(dicty[k]);
     return result;
 
+def isDotsifiable (x):
+    "Whether a stored value is dotsified when it is accessed.";
+    # Pure dicts (& lists) only, buffers (bytes, memoryview, array,
+    # ndarray) and other objects are passed through untouched.
+    return type(x) is dict or type(x) is list;
+
 def dotsify (x):
     "Returns dot-accessible versions of pure dicts (& lists).";
-    if type(x) is dict: return DotsiDict(mapObject(dotsify, x));
-    if type(x) is list: return DotsiList(map(dotsify, x));
+    # Shallow, nested values are dotsified on access.
+    if type(x) is dict: return DotsiDict(x);
+    if type(x) is list: return DotsiList(x);
     return x;
 fy = dotsify;       # Short ALIAS, externally: dotsi.fy()
 
@@ -63,10 +73,46 @@ def shallowCopy (x):    # Undocumented, used internally.
 class DotsiDict (dict):
     "Extends `dict` to support dot-access.";
     def __setitem__ (self, key, value):     # PRIMARY
-        super(DotsiDict, self).__setitem__(key, dotsify(value));
+        super(DotsiDict, self).__setitem__(key, value); # Lazy, see below.
+
+    def __getitem__ (self, key):            # PRIMARY
+        value = super(DotsiDict, self).__getitem__(key);
+        if isDotsifiable(value):
+            value = dotsify(value);
+            super(DotsiDict, self).__setitem__(key, value);
+        return value;
+
+    def get (self, key, default=None):
+        return self[key] if key in self else default;
+
+    def _dotsifyValues (self):
+        "Wraps all the stored values, for the accessors which bypass `__getitem__()`.";
+        for k, v in list(super(DotsiDict, self).items()):
+            if isDotsifiable(v):
+                super(DotsiDict, self).__setitem__(k, dotsify(v));
+
+    def __iter__ (self):
+        # NOTE: overridden only to turn off the fast copy of `dict(self)`,
+        #   which reads the stored values without `__getitem__()`
+        return super(DotsiDict, self).__iter__();
+
+    def items (self):
+        self._dotsifyValues();
+        return super(DotsiDict, self).items();
+
+    def values (self):
+        self._dotsifyValues();
+        return super(DotsiDict, self).values();
+
+    def pop (self, key, *default):
+        return dotsify(super(DotsiDict, self).pop(key, *default));
+
+    def popitem (self):
+        k, v = super(DotsiDict, self).popitem();
+        return k, dotsify(v);
 
     __setattr__ = __setitem__;
-    __getattr__ = dict.__getitem__;
+    __getattr__ = __getitem__;
     __delattr__ = dict.__delitem__;
     
     def __init__ (self, *args, **kwargs):
@@ -99,22 +145,40 @@ Dict = DotsiDict;   # Short ALIAS, externally: dotsi.Dict()
 
 class DotsiList (list):
     "Extends `list` to support dot-access for nested dicts.";
-    def __setitem__ (self, index, value):   # PRIMARY
-        super(DotsiList, self).__setitem__(index, dotsify(value));
-    
-    def insert (self, index, value):        # PRIMARY
-        super(DotsiList, self).insert(index, dotsify(value));
-    
-    def append (self, value):
-        self.insert(len(self), value);
+    def __getitem__ (self, index):          # PRIMARY
+        if type(index) is slice:
+            for i in range(*index.indices(len(self))): self[i];
+            return super(DotsiList, self).__getitem__(index);
+        value = super(DotsiList, self).__getitem__(index);
+        if isDotsifiable(value):
+            value = dotsify(value);
+            super(DotsiList, self).__setitem__(index, value);
+        return value;
+
+    def __iter__ (self):    # Like list, sees items appended meanwhile.
+        i = 0;
+        while i < len(self):
+            yield self[i];
+            i += 1;
+
+    def __reversed__ (self):
+        for i in range(len(self) - 1, -1, -1):
+            yield self[i];
+
+    def pop (self, index=-1):
+        return dotsify(super(DotsiList, self).pop(index));
+
+    def __mul__ (self, n):
+        return self[:] * n;
+    __rmul__ = __mul__;
 
     def extend (self, iterable):
-        for value in iterable: self.append(value);
+        super(DotsiList, self).extend(iterable);
         return self;
     __iadd__ = extend;  # x += [1] <==> x.extend([1]);
     
     def __init__ (self, *args, **kwargs):
-        self.extend(list(*args, **kwargs));
+        super(DotsiList, self).__init__(*args, **kwargs);
     
     def __add__ (self, other):
         return dotsify(list(self) + list(other));
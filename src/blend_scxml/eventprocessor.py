@@ -103,6 +103,8 @@ class Event(object):
         self.origintype = ScxmlOriginType()
         self.sendid = sendid
         self.raw = raw
+        # NOTE: time.monotonic_ns() when the event was queued by Interpreter.send or raiseFunction
+        self.timestamp = None
 
     def __str__(self):
         return "<eventprocessor.Event>, " + str(self.__dict__)
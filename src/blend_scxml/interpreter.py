@@ -25,6 +25,7 @@ This file is part of pyscxml.
 
 # NOTE: modified by Alex Zhornyak, alexander.zhornyak@gmail.com
 
+import time
 import queue
 import logging
 
@@ -38,15 +39,20 @@ from .node import (
     Transition
 )
 
-from .datastructures import OrderedSet
+from .datastructures import OrderedSet, EventQueue
+from .consts import QueuePolicy, CoalescePolicy
 from .eventprocessor import Event, ScxmlOriginType
 
+# MIT License
+# Copyright (c) 2020 Polydojo, Inc.
+# https://github.com/polydojo/dotsi
+from .dotsi import Dict
+
 # author="Patrick K. O'Brien and contributors",
 # url="https://github.com/11craft/louie/",
 # download_url="https://pypi.python.org/pypi/Louie",
 # license="BSD"
-from .louie import dispatcher
-from .consts import DispatcherConstants
+from .observer import observerCallbacks, get_callback, louie_adapter, ChangeRecord
 
 
 class Interpreter(object):
@@ -54,6 +60,10 @@ class Interpreter(object):
     The class repsonsible for keeping track of the execution of the
     statemachine.
     '''
+    # NOTE: the louie signals (see DispatcherConstants) are sent by the adapter observer,
+    #   turn it off when nothing is connected to them to make unobserved signals free
+    louieCompatibility = True
+
     def __init__(self):
         self.running = True
         self.exited = False
@@ -62,7 +72,8 @@ class Interpreter(object):
 
         self.sleep_timeout = 0.001
         self.internalQueue = queue.Queue()
-        self.externalQueue = queue.Queue()
+        # NOTE: unbounded until setQueueBound
+        self.externalQueue = EventQueue(on_overflow=self.onQueueOverflow)
         self.externalQueueGuard = False
 
         self.statesToInvoke = OrderedSet()
@@ -70,10 +81,76 @@ class Interpreter(object):
         self.dm = None
         self.invokeId = None
         self.parentId = None
-        self.logger: logging.Logger = None
+        self.logger: logging.Logger | logging.LoggerAdapter = None
 
         self.enabledTransitions = None
 
+        # NOTE: skip eventless conds which evaluated to false while nothing they read has changed,
+        #   off by default: the changes inside <data> objects (bpy.context.scene.engine, etc.)
+        #   are not seen, only the assignments of the names are
+        self.dependencyTracking = False
+        self.stateVersion = 0
+        self.stateVersions = {}
+        self.condCache = {}
+
+        # NOTE: preallocated change records, filled only while 'on_microstep' or 'on_macrostep' is observed
+        self.microstepRecord = ChangeRecord()
+        self.macrostepRecord = ChangeRecord()
+        self.recordChanges = False
+
+        self.observers = []
+        self.updateObservers()
+        if self.louieCompatibility:
+            self.addObserver(louie_adapter)
+
+    def addObserver(self, observer):
+        '''
+        Registers the lifecycle observer (see observer.InterpreterObserver).
+        @param observer: any object with some of the InterpreterObserver callbacks
+        '''
+        if observer not in self.observers:
+            self.observers.append(observer)
+            self.updateObservers()
+
+    def removeObserver(self, observer):
+        if observer in self.observers:
+            self.observers.remove(observer)
+            self.updateObservers()
+
+    def updateObservers(self):
+        for name, attr in observerCallbacks.items():
+            setattr(self, attr, tuple(filter(None, (get_callback(x, name) for x in self.observers))))
+        self.recordChanges = bool(self.microstepObservers or self.macrostepObservers)
+
+    def setQueueBound(self, maxsize, policy=QueuePolicy.block, timeout=1.0):
+        '''
+        Bounds the external queue, the queue object stays the same
+        @param maxsize: the count of the waiting events, 0 is unbounded
+        @param policy: consts.QueuePolicy, what is done with an event when the queue is full
+        @param timeout: the seconds the producer waits for a free slot with QueuePolicy.block
+        '''
+        self.externalQueue.configure(maxsize, policy, timeout)
+
+    def setCoalescing(self, name, policy=CoalescePolicy.latest):
+        '''
+        Collapses the waiting duplicates of the external event (see datastructures.EventQueue)
+        @param name: the exact event name
+        @param policy: consts.CoalescePolicy, None stops the coalescing of the name
+        '''
+        self.externalQueue.setCoalescing(name, policy)
+
+    def onQueueOverflow(self, event):
+        eventQueue = self.externalQueue
+        name = getattr(event, "name", str(event))
+        if self.logger:
+            self.logger.warning(
+                f"The external queue is full ({eventQueue.maxsize}), "
+                f"the policy '{eventQueue.policy}' dropped the event '{name}'")
+        if eventQueue.policy == QueuePolicy.error:
+            self.raiseFunction(
+                ["error", "platform", "queue_full"],
+                {"event": name, "maxsize": eventQueue.maxsize, "dropped": eventQueue.dropped}, type="platform")
+
     def interpret(self, document: SCXMLDocument, invokeId=None):
         '''Initializes the interpreter given an SCXMLDocument instance'''
 
@@ -86,6 +163,8 @@ class Interpreter(object):
 
         self.executeTransitionContent([transition])
         self.enterStates([transition])
+        if self.recordChanges:
+            self.flushMicrostep()
 
     def mainEventLoop(self):
         if self.running:
@@ -95,6 +174,7 @@ class Interpreter(object):
 
                 # now take any newly enabled null transitions and any transitions triggered by internal events
                 while self.running and not stable:
+                    internalEvent = None
                     self.enabledTransitions = self.selectEventlessTransitions()
                     if not self.enabledTransitions:
                         if self.internalQueue.empty():
@@ -102,13 +182,17 @@ class Interpreter(object):
                         else:
                             internalEvent: Event = self.internalQueue.get()  # this call returns immediately if no event is available
 
-                            dispatcher.send(DispatcherConstants.internal_event, self, event=internalEvent)
+                            for callback in self.internalEventObservers:
+                                callback(self, internalEvent)
 
                             self.dm["__event"] = internalEvent
                             self.enabledTransitions = self.selectTransitions(internalEvent)
 
                     if self.enabledTransitions:
-                        self.microstep(self.enabledTransitions)
+                        self.microstep(self.enabledTransitions, internalEvent)
+
+                if self.macrostepRecord.microsteps:
+                    self.flushMacrostep()
 
                 for state in self.statesToInvoke:
                     for inv in state.invoke:
@@ -130,9 +214,11 @@ class Interpreter(object):
                 self.running = False
                 return self.sleep_timeout
 
-            dispatcher.send(DispatcherConstants.external_event, self, event=externalEvent)
+            for callback in self.externalEventObservers:
+                callback(self, externalEvent)
 
             self.dm["__event"] = externalEvent
+            self.macrostepRecord.event = externalEvent
 
             for state in self.configuration:
                 for inv in state.invoke:
@@ -143,7 +229,7 @@ class Interpreter(object):
 
             self.enabledTransitions = self.selectTransitions(externalEvent)
             if self.enabledTransitions:
-                self.microstep(self.enabledTransitions)
+                self.microstep(self.enabledTransitions, externalEvent)
 
             return self.sleep_timeout
         else:
@@ -158,7 +244,10 @@ class Interpreter(object):
             for inv in s.invoke:
                 self.cancelInvoke(inv)
             self.configuration.delete(s)
-            dispatcher.send(DispatcherConstants.exit_state, self, state=s.id)
+            if self.recordChanges:
+                self.microstepRecord.exited.append(s.id)
+            for callback in self.exitStateObservers:
+                callback(self, s.id)
             if isFinalState(s) and isScxmlState(s.parent):
                 if self.invokeId and self.parentId and self.parentId in self.dm.sessions:
                     self.send(
@@ -166,11 +255,17 @@ class Interpreter(object):
                             "done", "invoke", self.invokeId
                         ],
                         s.donedata(), self.invokeId, self.dm.sessions[self.parentId].interpreter.externalQueue)
-                dispatcher.send(DispatcherConstants.exit, self, final=s.id)
+                if self.recordChanges:
+                    self.flushExit()
+                for callback in self.exitObservers:
+                    callback(self, s.id)
                 self.exited = True
                 return
+        if self.recordChanges:
+            self.flushExit()
         self.exited = True
-        dispatcher.send(DispatcherConstants.exit, self, final=None)
+        for callback in self.exitObservers:
+            callback(self, None)
 
     def selectEventlessTransitions(self):
         enabledTransitions = OrderedSet()
@@ -182,7 +277,7 @@ class Interpreter(object):
                 if done:
                     break
                 for t in s.transition:
-                    if not t.event and self.conditionMatch(t):
+                    if not t.event and self.eventlessConditionMatch(t):
                         enabledTransitions.add(t)
                         done = True
                         break
@@ -308,21 +403,48 @@ class Interpreter(object):
     def getConfigurationIDs(self):
         return [s.id for s in self.configuration if s.id != "__main__"]
 
-    def microstep(self, enabledTransitions):
+    def microstep(self, enabledTransitions, event=None):
+        '''
+        @param event: the event which enabled the transitions, None for eventless transitions
+        '''
         self.exitStates(enabledTransitions)
         self.executeTransitionContent(enabledTransitions)
         self.enterStates(enabledTransitions)
-        dispatcher.send(DispatcherConstants.new_configuration, self)
+        if self.recordChanges:
+            self.microstepRecord.event = event
+            self.flushMicrostep()
+        for callback in self.newConfigurationObservers:
+            callback(self)
+
+    def flushMicrostep(self):
+        record = self.microstepRecord
+        record.microsteps = 1
+        if self.macrostepObservers:
+            self.macrostepRecord.merge(record)
+        for callback in self.microstepObservers:
+            callback(self, record)
+        record.clear()
+
+    def flushMacrostep(self):
+        record = self.macrostepRecord
+        for callback in self.macrostepObservers:
+            callback(self, record)
+        record.clear()
+
+    def flushExit(self):
+        '''the states exited by the interpreter exit are reported as the last microstep and macrostep'''
+        if not self.microstepRecord.exited:
+            return
+        self.flushMicrostep()
+        if self.macrostepRecord.microsteps:
+            self.flushMacrostep()
 
     def exitStates(self, enabledTransitions):
         statesToExit = OrderedSet()
         for t in enabledTransitions:
             if t.target:
                 tstates = self.getTargetStates(t.target)
-                if t.type == "internal" and isCompoundState(t.source) and all(map(lambda s: isDescendant(s, t.source), tstates)):
-                    ancestor = t.source
-                else:
-                    ancestor = self.findLCCA([t.source] + tstates)
+                ancestor = self.getTransitionAncestor(t, tstates)
 
                 for s in self.configuration:
                     if isDescendant(s, ancestor):
@@ -348,19 +470,33 @@ class Interpreter(object):
             for inv in s.invoke:
                 self.cancelInvoke(inv)
             self.configuration.delete(s)
-            dispatcher.send(DispatcherConstants.exit_state, self, state=s.id)
+            self.touchState(s)
+            if self.recordChanges:
+                self.microstepRecord.exited.append(s.id)
+            for callback in self.exitStateObservers:
+                callback(self, s.id)
+
+    def getTransitionAncestor(self, t, tstates):
+        '''Returns the state whose descendants are exited and entered by the transition'''
+        if t.type == "internal" and isCompoundState(t.source) and all(map(lambda s: isDescendant(s, t.source), tstates)):
+            return t.source
+        return self.findLCCA([t.source] + tstates)
 
     def cancelInvoke(self, inv):
         inv.cancel()
 
     def executeTransitionContent(self, enabledTransitions):
         for t in enabledTransitions:
-            try:
-                transition_index = t.source.transition.index(t)
-                dispatcher.send(DispatcherConstants.taking_transition, self, state=t.source.id, transition_index=transition_index)
-            except Exception:
-                # NOTE: just fast skip by exception if scxml is not identified, etc.
-                pass
+            if self.takingTransitionObservers or self.recordChanges:
+                try:
+                    transition_index = t.source.transition.index(t)
+                    if self.recordChanges:
+                        self.microstepRecord.transitions.append((t.source.id, transition_index))
+                    for callback in self.takingTransitionObservers:
+                        callback(self, t.source.id, transition_index)
+                except Exception:
+                    # NOTE: just fast skip by exception if scxml is not identified, etc.
+                    pass
             self.executeContent(t)
 
     def enterStates(self, enabledTransitions):
@@ -370,10 +506,7 @@ class Interpreter(object):
         for t in enabledTransitions:
             if t.target:
                 tstates = self.getTargetStates(t.target)
-                if t.type == "internal" and isCompoundState(t.source) and all(map(lambda s: isDescendant(s, t.source), tstates)):
-                    ancestor = t.source
-                else:
-                    ancestor = self.findLCCA([t.source] + tstates)
+                ancestor = self.getTransitionAncestor(t, tstates)
                 for s in tstates:
                     self.addStatesToEnter(s, statesToEnter, statesForDefaultEntry, defaultHistoryContent)
                 for s in tstates:
@@ -388,11 +521,15 @@ class Interpreter(object):
         for s in statesToEnter:
             self.statesToInvoke.add(s)
             self.configuration.add(s)
+            self.touchState(s)
+            if self.recordChanges:
+                self.microstepRecord.entered.append(s.id)
             if self.doc.binding == "late" and s.isFirstEntry:
                 s.initDatamodel()
                 s.isFirstEntry = False
 
-            dispatcher.send(DispatcherConstants.enter_state, self, state=s.id)
+            for callback in self.enterStateObservers:
+                callback(self, s.id)
 
             for content in s.onentry:
                 self.executeContent(content)
@@ -472,6 +609,34 @@ class Interpreter(object):
         else:
             return t.cond()
 
+    def touchState(self, state):
+        self.stateVersion += 1
+        self.stateVersions[state.id] = self.stateVersion
+
+    def eventlessConditionMatch(self, t):
+        info = t.dependencies
+        if info is None or not t.cond or not self.dependencyTracking:
+            return self.conditionMatch(t)
+
+        cached = self.condCache.get(t)
+        if cached is not None:
+            dmVersion, stateVersion = cached
+            stateVersions = self.stateVersions
+            if (
+                    not self.dm.isChangedSince(info.names, dmVersion) and
+                    stateVersions.get(t.source.id, 0) <= stateVersion and
+                    all(stateVersions.get(s_id, 0) <= stateVersion for s_id in info.states)):
+                return False
+
+        dmVersion = self.dm.writeVersion
+        result = self.conditionMatch(t)
+        # NOTE: None may be returned after an error was raised, so it is evaluated every time
+        if result is not None and not result:
+            self.condCache[t] = (dmVersion, self.stateVersion)
+        else:
+            self.condCache.pop(t, None)
+        return result
+
     def In(self, name):
         return name in map(lambda x: x.id, self.configuration)
 
@@ -481,23 +646,28 @@ class Interpreter(object):
         @param data: the data associated with the event
         @param invokeid: if specified, the id of sending invoked process
         @param toQueue: if specified, the target queue on which to add the event
-
+        @return: False if the bounded queue dropped the event (see datastructures.EventQueue)
         """
         if isinstance(name, str):
             name = name.split(".")
         if not toQueue:
             toQueue = self.externalQueue
+        if type(data) is dict:
+            # NOTE: dot access for _event.data, nested values are wrapped on access
+            data = Dict(data)
         evt = Event(name, data, invokeid, sendid=sendid, eventtype=eventtype)
         evt.origin = "#_scxml_" + self.dm.sessionid
         evt.origintype = ScxmlOriginType()
         evt.raw = raw
         # TODO: and for ecmascript?
         evt.language = language
-        toQueue.put(evt)
+        evt.timestamp = time.monotonic_ns()
+        return toQueue.put(evt) is not False
 
     def raiseFunction(self, event, data, sendid=None, type="internal"):
         e = Event(event, data, eventtype=type, sendid=sendid)
         e.origintype = None
+        e.timestamp = time.monotonic_ns()
         self.internalQueue.put(e)
 
 
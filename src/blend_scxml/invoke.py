@@ -20,15 +20,8 @@ This file is part of pyscxml.
 
 # NOTE: modified by Alex Zhornyak, alexander.zhornyak@gmail.com
 
-import bpy
-
 import logging
 
-# author="Patrick K. O'Brien and contributors",
-# url="https://github.com/11craft/louie/",
-# download_url="https://pypi.python.org/pypi/Louie",
-# license="BSD"
-from .louie import dispatcher
 from .interpreter import CancelEvent
 
 
@@ -87,6 +80,11 @@ class InvokeSCXML(BaseInvoke):
 
         self.default_datamodel = compiler.default_datamodel
         self.log_function = compiler.log_function
+        self.registry = compiler.registry
+        # NOTE: the invoked session is scheduled by the timers of the parent (see Compiler.timers)
+        self.timers = compiler.timers
+        # NOTE: the function registered in the timers, it is unregistered when the invoked session exits
+        self.timer = None
 
     def start(self, parentId):
         self.parentId = parentId
@@ -100,17 +98,28 @@ class InvokeSCXML(BaseInvoke):
         self.sm = StateMachine(
             doc,
             sessionid=self.parentSessionid + "." + self.invokeid,
-            log_function=lambda label, val: dispatcher.send(signal="invoke_log", sender=self, label=label, msg=val),
+            log_function=lambda label, val: self.registry.send("invoke_log", self, label=label, msg=val),
             default_datamodel=self.default_datamodel,
-            setup_session=False, filedir=self.filedir, filename=self.filename)
+            setup_session=False, filedir=self.filedir, filename=self.filename, timers=self.timers)
         self.interpreter = self.sm.interpreter
         self.sm.compiler.initData = self.initData
         self.sm.compiler.parentId = self.parentId
         self.sm.interpreter.parentId = self.parentId
-        dispatcher.send("created", sender=self, sm=self.sm)
+        self.registry.send("created", self, sm=self.sm)
 
+        self.sm.interpreter.addObserver(self)
         self.sm._start_invoke(self.invokeid)
-        bpy.app.timers.register(self.sm.interpreter.mainEventLoop, persistent=True)
+        self.timer = self.sm.interpreter.mainEventLoop
+        self.timers.register(self.timer, persistent=True)
+
+    def on_exit(self, interpreter, final):
+        '''
+        The invoked session finished or was cancelled (see observer.InterpreterObserver).
+        NOTE: the timer which exits returns None and is dropped by the timers anyway,
+        the session may be stepped outside of the timers too
+        '''
+        if self.timer is not None and self.timers.is_registered(self.timer):
+            self.timers.unregister(self.timer)
 
     def send(self, eventobj):
         if self.sm and not self.sm.isFinished():
@@ -121,4 +130,4 @@ class InvokeSCXML(BaseInvoke):
         if not self.sm:
             return
         self.sm.interpreter.cancelled = True
-        self.sm.interpreter.externalQueue.put(CancelEvent())
+        self.sm.interpreter.externalQueue.force(CancelEvent())
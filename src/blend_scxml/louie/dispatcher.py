@@ -29,8 +29,16 @@ Internal attributes:
   deletion::
 
     { receiverkey (id) : [senderkey (id)...] }
+
+- ``receivers_cache``: Result of ``get_all_receivers``, cleared on any
+  change of the routing tables::
+
+    { (senderkey (id), signal) : (receivers...) }
 """
 
+# NOTE: modified by Alex Zhornyak, alexander.zhornyak@gmail.com
+#   receiver lists are cached, see 'receivers_cache'
+
 import weakref
 
 from . import error, robustapply, saferef
@@ -67,6 +75,7 @@ connections = {}
 senders = {}
 senders_back = {}
 plugins = []
+receivers_cache = {}
 
 
 def reset():
@@ -74,11 +83,12 @@ def reset():
 
     Useful during unit testing.  Should be avoided otherwise.
     """
-    global connections, senders, senders_back, plugins
+    global connections, senders, senders_back, plugins, receivers_cache
     connections = {}
     senders = {}
     senders_back = {}
     plugins = []
+    receivers_cache = {}
 
 
 def connect(receiver, signal=All, sender=Any, weak=True):
@@ -172,6 +182,7 @@ def connect(receiver, signal=All, sender=Any, weak=True):
     except Exception:
         pass
     receivers.append(receiver)
+    receivers_cache.clear()
     # Update stats.
     if __debug__:
         global connects
@@ -226,6 +237,7 @@ def disconnect(receiver, signal=All, sender=Any, weak=True):
             f"for signal {signal!r} from sender {sender!r}"
         )
     _cleanup_connections(senderkey, signal)
+    receivers_cache.clear()
     # Update stats.
     if __debug__:
         global disconnects
@@ -280,8 +292,26 @@ def get_all_receivers(sender=Any, signal=All):
 
     This gets all receivers which should receive the given signal from
     sender, each receiver should be produced only once by the
-    resulting generator.
+    resulting iterable.
     """
+    senderkey = id(sender)
+    if senderkey not in connections:
+        # NOTE: only Any receivers, shared entry, so that every short-lived
+        #   sender does not leave a cached record behind
+        senderkey = id(Any)
+    key = (senderkey, signal)
+    try:
+        return receivers_cache[key]
+    except KeyError:
+        pass
+    except TypeError:
+        # unhashable signal
+        return tuple(_collect_receivers(sender, signal))
+    result = receivers_cache[key] = tuple(_collect_receivers(sender, signal))
+    return result
+
+
+def _collect_receivers(sender, signal):
     yielded = set()
     for receivers in (
         # Get receivers that receive *this* signal from *this* sender.
@@ -454,6 +484,7 @@ def _remove_receiver(receiver):
     if not senders_back:
         # During module cleanup the mapping will be replaced with None.
         return False
+    receivers_cache.clear()
     backKey = id(receiver)
     for senderkey in senders_back.get(backKey, ()):
         try:
@@ -501,6 +532,7 @@ def _cleanup_connections(senderkey, signal):
 
 def _remove_sender(senderkey):
     """Remove ``senderkey`` from connections."""
+    receivers_cache.clear()
     _remove_back_refs(senderkey)
     try:
         del connections[senderkey]
@@ -12,9 +12,40 @@ callable object can take, and subset the given arguments to match only
 those which are acceptable.
 """
 
+# NOTE: modified by Alex Zhornyak, alexander.zhornyak@gmail.com
+#   signatures are cached per function, see 'signature_info'
+
+import weakref
+
 IM_FUNC = "__func__"
 FUNC_CODE = "__code__"
 
+# id(function or callable object) -> (weakref, {number of positional arguments: (positional names, acceptable names)})
+# NOTE: not a WeakKeyDictionary, it creates a weak reference on every lookup
+_method_signatures = {}
+_other_signatures = {}
+
+
+def _signature_cache(cache, key):
+    """Return the per-count dict of ``key``, it is removed from the cache
+    when ``key`` dies. Not weak-referencable keys are not cached."""
+    key_id = id(key)
+    entry = cache.get(key_id)
+    if entry is not None and entry[0]() is key:
+        return entry[1]
+
+    def forget(ref, key_id=key_id):
+        current = cache.get(key_id)
+        if current is not None and current[0] is ref:
+            del cache[key_id]
+
+    per_count = {}
+    try:
+        cache[key_id] = (weakref.ref(key, forget), per_count)
+    except TypeError:
+        pass
+    return per_count
+
 
 def function(receiver):
     """Get function-like callable object for given receiver.
@@ -38,27 +69,47 @@ def function(receiver):
         raise ValueError(f"unknown reciever type {receiver} {type(receiver)}")
 
 
+def signature_info(signature, arg_count):
+    """Return (positional names, acceptable names) of the callable for
+    ``arg_count`` positional arguments, acceptable names is None if
+    the callable takes **kwds.
+
+    The result is cached for functions, methods (by their function)
+    and weak-referencable callable objects, entries go away with them.
+    """
+    func = getattr(signature, IM_FUNC, None)
+    if func is not None:
+        per_count = _signature_cache(_method_signatures, func)
+    else:
+        per_count = _signature_cache(_other_signatures, signature)
+    info = per_count.get(arg_count)
+    if info is None:
+        _, code_object, startIndex = function(signature)
+        positional = code_object.co_varnames[startIndex : startIndex + arg_count]
+        if code_object.co_flags & 8:
+            acceptable = None
+        else:
+            acceptable = frozenset(
+                code_object.co_varnames[startIndex + arg_count : code_object.co_argcount]
+            )
+        info = per_count[arg_count] = (positional, acceptable)
+    return info
+
+
 def robust_apply(receiver, signature, *arguments, **named):
     """Call receiver with arguments and appropriate subset of named.
     ``signature`` is the callable used to determine the call signature
     of the receiver, in case ``receiver`` is a callable wrapper of the
     actual receiver."""
-    signature, code_object, startIndex = function(signature)
-    acceptable = code_object.co_varnames[
-        startIndex + len(arguments) : code_object.co_argcount
-    ]
-    for name in code_object.co_varnames[startIndex : startIndex + len(arguments)]:
+    positional, acceptable = signature_info(signature, len(arguments))
+    for name in positional:
         if name in named:
             raise TypeError(
                 f"Argument {name!r} specified both positionally "
                 f"and as a keyword for calling {signature!r}"
             )
-    if not (code_object.co_flags & 8):
+    if acceptable is not None:
         # fc does not have a **kwds type parameter, therefore
         # remove unacceptable arguments.
-        # have to make this a list type in python3 as dicts cant be
-        # modified in place, producing RuntimeError
-        for arg in list(named.keys()):
-            if arg not in acceptable:
-                del named[arg]
+        named = {arg: value for arg, value in named.items() if arg in acceptable}
     return receiver(*arguments, **named)
@@ -0,0 +1,360 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Copyright 2024, Alex Zhornyak, alexander.zhornyak@gmail.com
+
+""" Event queue metrics and the fleet metrics of the sessions.
+
+Interpreter.send and raiseFunction stamp the events when they are queued
+(Event.timestamp), QueueMetrics observes the dispatch of the events and
+records the queue-to-dispatch latency in the LatencyHistogram of the queue
+and the high-water mark of its depth. Dashboards poll snapshot():
+
+    metrics = QueueMetrics()
+    metrics.attach(sm.interpreter)
+    ...
+    p_snapshot = metrics.snapshot(reset=True)
+    p_snapshot["external"]["latency"]["p99"]
+
+The events put into the queues directly (done.state.*, the events of the
+invoked sessions) are not stamped, they are counted in 'unstamped'.
+
+SessionCounters counts the processed events and the microsteps of a
+session, MultiSession.enable_metrics() attaches them to all its sessions
+and exports the fleet in the Prometheus text format to a sink:
+
+    ms.enable_metrics(PrometheusFileSink("/var/lib/node_exporter/scxml.prom"))
+    bpy.app.timers.register(ms.export_metrics, persistent=True)
+"""
+
+import os
+import sys
+import time
+import threading
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .observer import InterpreterObserver
+
+
+class LatencyHistogram(object):
+    '''
+    Log-linear histogram of non-negative integers in the manner of HdrHistogram,
+    the values below 2 ** sub_bits are exact, the others are kept with
+    the relative precision of 2 ** (1 - sub_bits)
+    '''
+
+    def __init__(self, sub_bits=7):
+        self.sub_bits = sub_bits
+        self.half = 1 << (sub_bits - 1)
+        self.reset()
+
+    def reset(self):
+        # NOTE: bucket index -> count
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def index(self, value):
+        exponent = value.bit_length() - self.sub_bits
+        if exponent <= 0:
+            return value
+        return exponent * self.half + (value >> exponent)
+
+    def lower_bound(self, index):
+        '''returns the lowest value of the bucket'''
+        if index < 2 * self.half:
+            return index
+        exponent = index // self.half - 1
+        return (index - exponent * self.half) << exponent
+
+    def record(self, value):
+        if value < 0:
+            value = 0
+        index = self.index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+
+    def percentile(self, p):
+        '''returns the lowest value of the bucket which holds the p-th percentile (0..100)'''
+        if not self.count:
+            return 0
+        rank = max(1, int(p / 100.0 * self.count + 0.5))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(max(self.lower_bound(index), self.min), self.max)
+        return self.max
+
+    def buckets(self):
+        '''returns [(lowest value, count)] in ascending order'''
+        return [(self.lower_bound(index), self.counts[index]) for index in sorted(self.counts)]
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "min": self.min or 0,
+            "max": self.max or 0,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "p999": self.percentile(99.9),
+        }
+
+
+class QueueGauge(object):
+    '''Latency histogram (ns) and depth of one queue'''
+
+    def __init__(self, queue):
+        self.queue = queue
+        self.latency = LatencyHistogram()
+        self.max_depth = 0
+        self.unstamped = 0
+
+    def dispatched(self, event, now):
+        # NOTE: the queue only grows between the dispatches, so the depth
+        #   before the dispatch is the high-water mark
+        depth = self.queue.qsize() + 1
+        if depth > self.max_depth:
+            self.max_depth = depth
+        timestamp = getattr(event, "timestamp", None)
+        if timestamp is None:
+            self.unstamped += 1
+        else:
+            self.latency.record(now - timestamp)
+
+    def reset(self):
+        self.latency.reset()
+        self.max_depth = 0
+        self.unstamped = 0
+
+    def snapshot(self):
+        return {
+            "latency": self.latency.snapshot(),
+            "depth": self.queue.qsize(),
+            "max_depth": self.max_depth,
+            "unstamped": self.unstamped,
+        }
+
+
+class QueueMetrics(InterpreterObserver):
+    '''Queue metrics of one interpreter, the latencies are in nanoseconds'''
+
+    def __init__(self):
+        self.interpreter = None
+        self.external = None
+        self.internal = None
+
+    def attach(self, interpreter):
+        if self.interpreter is not None:
+            self.detach()
+        self.interpreter = interpreter
+        self.external = QueueGauge(interpreter.externalQueue)
+        self.internal = QueueGauge(interpreter.internalQueue)
+        interpreter.addObserver(self)
+
+    def detach(self):
+        if self.interpreter is not None:
+            self.interpreter.removeObserver(self)
+            self.interpreter = None
+
+    def on_internal_event(self, interpreter, event):
+        self.internal.dispatched(event, time.monotonic_ns())
+
+    def on_external_event(self, interpreter, event):
+        self.external.dispatched(event, time.monotonic_ns())
+
+    def snapshot(self, reset=False):
+        '''
+        @param reset: start the next window, the histograms and the high-water marks are cleared
+        '''
+        p_snapshot = {"external": self.external.snapshot(), "internal": self.internal.snapshot()}
+        if reset:
+            self.external.reset()
+            self.internal.reset()
+        return p_snapshot
+
+
+class SessionCounters(InterpreterObserver):
+    '''Counts the dispatched events and the microsteps of one interpreter'''
+
+    def __init__(self):
+        self.external_events = 0
+        self.internal_events = 0
+        self.microsteps = 0
+
+    def on_internal_event(self, interpreter, event):
+        self.internal_events += 1
+
+    def on_external_event(self, interpreter, event):
+        self.external_events += 1
+
+    def on_new_configuration(self, interpreter):
+        self.microsteps += 1
+
+
+# NOTE: the platform entries of the datamodel which are not the data of the document
+DATAMODEL_SYSTEM_NAMES = frozenset(("In", "self", "sessionid", "sessions", "response", "websocket"))
+
+
+def datamodel_size(dm):
+    '''returns (entries, shallow bytes) of the data of the datamodel, the system variables are skipped'''
+    p_data = dm if isinstance(dm, dict) else getattr(dm, "data", {})
+    entries = 0
+    size = 0
+    for key, value in list(p_data.items()):
+        if key.startswith("_") or key in DATAMODEL_SYSTEM_NAMES:
+            continue
+        entries += 1
+        size += sys.getsizeof(value)
+    return entries, size
+
+
+def session_sample(sm, counters=None):
+    '''returns the metric values of the StateMachine session'''
+    interpreter = sm.interpreter
+    compiler = sm.compiler
+    timers = compiler.timers
+    entries, size = datamodel_size(sm.datamodel)
+    return {
+        "external_events": counters.external_events if counters else 0,
+        "internal_events": counters.internal_events if counters else 0,
+        "microsteps": counters.microsteps if counters else 0,
+        "errors": compiler.error_counter,
+        "active_invokes": sum(len(state.invoke) for state in interpreter.configuration),
+        "pending_delayed_sends": sum(1 for sender in list(compiler.timer_mapping.values()) if timers.is_registered(sender)),
+        "external_queue_depth": interpreter.externalQueue.qsize(),
+        "external_queue_dropped": getattr(interpreter.externalQueue, "dropped", 0),
+        "external_queue_coalesced": getattr(interpreter.externalQueue, "coalesced", 0),
+        "datamodel_entries": entries,
+        "datamodel_bytes": size,
+    }
+
+
+# NOTE: sample key -> (metric name, type, help)
+PROMETHEUS_METRICS = {
+    "external_events": ("scxml_external_events_total", "counter", "External events processed by the session"),
+    "internal_events": ("scxml_internal_events_total", "counter", "Internal events processed by the session"),
+    "microsteps": ("scxml_microsteps_total", "counter", "Microsteps taken by the session"),
+    "errors": ("scxml_errors_total", "counter", "Error events raised by the session"),
+    "active_invokes": ("scxml_active_invokes", "gauge", "Invokes of the states in the configuration"),
+    "pending_delayed_sends": ("scxml_pending_delayed_sends", "gauge", "Delayed sends waiting for their timer"),
+    "external_queue_depth": ("scxml_external_queue_depth", "gauge", "Events waiting in the external queue"),
+    "external_queue_dropped": (
+        "scxml_external_queue_dropped_total", "counter", "Events dropped by the bounded external queue"),
+    "external_queue_coalesced": (
+        "scxml_external_queue_coalesced_total", "counter", "Events collapsed into their newer duplicates"),
+    "datamodel_entries": ("scxml_datamodel_entries", "gauge", "Entries of the datamodel"),
+    "datamodel_bytes": ("scxml_datamodel_bytes", "gauge", "Shallow size estimate of the datamodel values"),
+}
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render_prometheus(samples):
+    '''
+    Renders the Prometheus text exposition format
+    @param samples: {sessionid: session_sample()}
+    '''
+    t_lines = [
+        "# HELP scxml_sessions Active sessions",
+        "# TYPE scxml_sessions gauge",
+        f"scxml_sessions {len(samples)}"]
+    for key, (name, metric_type, s_help) in PROMETHEUS_METRICS.items():
+        t_lines.append(f"# HELP {name} {s_help}")
+        t_lines.append(f"# TYPE {name} {metric_type}")
+        for sessionid, p_sample in samples.items():
+            t_lines.append(f'{name}{{session="{escape_label(sessionid)}"}} {p_sample[key]}')
+    return "\n".join(t_lines) + "\n"
+
+
+class PrometheusFileSink(object):
+    '''Writes the metrics to a file atomically, for the node_exporter textfile collector'''
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+
+    def write(self, text):
+        s_tmp = self.filepath + ".tmp"
+        with open(s_tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(s_tmp, self.filepath)
+
+    def close(self):
+        pass
+
+
+class PrometheusHttpSink(object):
+    '''
+    Serves the last written metrics on http://host:port/metrics from a background thread,
+    the metrics are rendered by the owner thread, the server only returns the text
+    '''
+
+    def __init__(self, host="127.0.0.1", port=9464):
+        self.text = ""
+        self.logger = logging.getLogger("pyscxml.metrics")
+        sink = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = sink.text.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                sink.logger.debug(format % args)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.address = self.server.server_address
+        self._thread = threading.Thread(target=self.server.serve_forever, name="pyscxml.metrics.http", daemon=True)
+        self._thread.start()
+
+    def write(self, text):
+        self.text = text
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
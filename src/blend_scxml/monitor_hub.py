@@ -0,0 +1,248 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Copyright 2024, Alex Zhornyak, alexander.zhornyak@gmail.com
+
+""" Monitor hub, fans out the monitor notifications to many subscribers.
+
+The machine sends its notifications once to the hub (UdpMonitorSettings
+remote_host/remote_port), the hub runs in a separate process (see
+scxml_monitor_hub.py), so the subscribers cost nothing to Blender.
+
+Subscribers are either static (ScxmlEditor) or subscribe themselves by
+sending a control datagram to the hub port, renewed before it expires:
+
+    SUBSCRIBE [machine=m1,m2] [state=prefix1,prefix2] [batch=N]
+    UNSUBSCRIBE
+
+Both monitor protocols are accepted (see monitor_protocol). The binary
+dictionaries are forwarded to every subscriber, the ids are assigned by
+each machine, so the binary streams of several Blender processes should
+go to separate hubs.
+"""
+
+import time
+import struct
+import socket
+import selectors
+import logging
+from collections import deque
+
+from .consts import PYSCXML_MONITOR_LITERAL
+from .monitor_protocol import MonitorBinaryDecoder, MONITOR_DICTIONARY
+
+
+class MonitorSubscriber(object):
+    '''
+    @param machines: the machine names to forward, empty - all
+    @param state_prefixes: the state id prefixes to forward, empty - all
+    @param queue_size: the count of the pending messages, the oldest ones are dropped
+    @param batch_size: the max count of the messages in one datagram
+    @param timeout: seconds until the subscription expires, None - never
+    '''
+
+    def __init__(self, address, machines=(), state_prefixes=(), queue_size=4096, batch_size=1, timeout=None):
+        self.address = address
+        self.machines = frozenset(machines)
+        self.state_prefixes = tuple(state_prefixes)
+        self.queue = deque(maxlen=queue_size)
+        self.batch_size = max(batch_size, 1)
+        self.timeout = timeout
+        self.renewed = time.monotonic()
+
+        self.forwarded = 0
+        self.dropped = 0
+
+    def accepts(self, machine, state):
+        if machine is None:
+            return True
+        if self.machines and machine not in self.machines:
+            return False
+        if self.state_prefixes and not state.startswith(self.state_prefixes):
+            return False
+        return True
+
+    def expired(self, now):
+        return self.timeout is not None and now - self.renewed > self.timeout
+
+    def put(self, message, separator):
+        queue = self.queue
+        if len(queue) == queue.maxlen:
+            self.dropped += 1
+        queue.append((message, separator))
+
+    def flush(self, sock, max_datagram=1400):
+        '''sends the pending messages, the rest stays queued if the socket would block'''
+        queue = self.queue
+        while queue:
+            message, separator = queue[0]
+            t_batch = [message]
+            size = len(message)
+            count = 1
+            while count < self.batch_size and count < len(queue):
+                next_message, next_separator = queue[count]
+                if next_separator != separator or size + len(separator) + len(next_message) > max_datagram:
+                    break
+                t_batch.append(next_message)
+                size += len(separator) + len(next_message)
+                count += 1
+            try:
+                sock.sendto(separator.join(t_batch), self.address)
+            except BlockingIOError:
+                return
+            except OSError:
+                # NOTE: the subscriber is gone, the messages are lost
+                self.dropped += count
+            else:
+                self.forwarded += count
+            for _ in range(count):
+                queue.popleft()
+
+
+class MonitorHub(object):
+    '''
+    Receives the monitor notifications on (host, port) and forwards them to the subscribers
+    @param subscription_timeout: seconds until a self-subscribed subscriber expires
+    '''
+
+    def __init__(self, host="127.0.0.1", port=11010, subscription_timeout=30.0, receive_buffer=1 << 20):
+        self.address = (host, port)
+        self.subscription_timeout = subscription_timeout
+        self.subscribers = {}
+        # NOTE: one decoder per sender, binary ids are assigned by each machine
+        self.decoders = {}
+
+        self.received = 0
+        self.malformed = 0
+        self.logger = logging.getLogger(PYSCXML_MONITOR_LITERAL + ".hub")
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if receive_buffer:
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, receive_buffer)
+        self.sock.bind(self.address)
+        self.sock.setblocking(False)
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.sock, selectors.EVENT_READ)
+        self.stopped = False
+
+    def subscribe(self, address, **kwargs):
+        '''adds or replaces the subscriber of the address'''
+        subscriber = self.subscribers[address] = MonitorSubscriber(address, **kwargs)
+        # NOTE: the late subscriber does not wait for the next dictionary of the binary streams
+        for decoder in self.decoders.values():
+            for message in decoder.dictionary():
+                subscriber.put(message, b"")
+        self.logger.info(f"subscribed: {address}")
+        return subscriber
+
+    def unsubscribe(self, address):
+        if self.subscribers.pop(address, None) is not None:
+            self.logger.info(f"unsubscribed: {address}")
+
+    def on_control(self, datagram, address):
+        t_words = datagram.decode().split()
+        if t_words[0] == "UNSUBSCRIBE":
+            self.unsubscribe(address)
+            return
+        p_args = dict(word.split("=", 1) for word in t_words[1:] if "=" in word)
+        subscriber = self.subscribers.get(address)
+        machines = tuple(filter(None, p_args.get("machine", "").split(",")))
+        state_prefixes = tuple(filter(None, p_args.get("state", "").split(",")))
+        batch_size = int(p_args.get("batch", 1))
+        if (
+                subscriber is not None and subscriber.machines == frozenset(machines) and
+                subscriber.state_prefixes == state_prefixes and subscriber.batch_size == batch_size):
+            subscriber.renewed = time.monotonic()
+            return
+        self.subscribe(
+            address, machines=machines, state_prefixes=state_prefixes, batch_size=batch_size,
+            timeout=self.subscription_timeout)
+
+    def dispatch(self, datagram, address):
+        self.received += 1
+        subscribers = self.subscribers.values()
+        if datagram[0] < 0x20 or datagram[0] == MONITOR_DICTIONARY:
+            decoder = self.decoders.get(address)
+            if decoder is None:
+                decoder = self.decoders[address] = MonitorBinaryDecoder()
+            try:
+                # NOTE: the messages are decoded first, a malformed datagram is dropped as a whole
+                t_messages = list(decoder.split(datagram))
+            except (struct.error, ValueError, UnicodeDecodeError, AttributeError) as e:
+                self.malformed += 1
+                self.logger.warning(f"Malformed datagram from {address} is dropped: {e}")
+                return
+            for _, machine, state, message in t_messages:
+                for subscriber in subscribers:
+                    if subscriber.accepts(machine, state):
+                        subscriber.put(message, b"")
+        elif subscribers:
+            for message in datagram.split(b"\n"):
+                # NOTE: kind@machine@state[|transition index]
+                t_parts = message.decode(errors="replace").split("@", 2)
+                machine, state = (t_parts[1], t_parts[2].split("|", 1)[0]) if len(t_parts) == 3 else (None, None)
+                for subscriber in subscribers:
+                    if subscriber.accepts(machine, state):
+                        subscriber.put(message, b"\n")
+
+    def poll(self, timeout=0.1):
+        '''receives the ready datagrams and flushes the subscribers'''
+        if self.selector.select(timeout):
+            while True:
+                try:
+                    datagram, address = self.sock.recvfrom(65535)
+                except (BlockingIOError, InterruptedError):
+                    break
+                if not datagram:
+                    continue
+                if datagram.startswith((b"SUBSCRIBE", b"UNSUBSCRIBE")):
+                    try:
+                        self.on_control(datagram, address)
+                    except Exception as e:
+                        self.logger.error(f"Wrong control message from {address}: {e}")
+                else:
+                    self.dispatch(datagram, address)
+
+        now = time.monotonic()
+        for address, subscriber in list(self.subscribers.items()):
+            if subscriber.expired(now):
+                self.unsubscribe(address)
+            else:
+                subscriber.flush(self.sock)
+
+    def serve_forever(self, timeout=0.1):
+        self.logger.info(f"monitor hub is listening on {self.address}")
+        try:
+            while not self.stopped:
+                self.poll(timeout)
+        finally:
+            self.close()
+
+    def stats(self):
+        return {
+            "received": self.received,
+            "malformed": self.malformed,
+            "subscribers": {
+                address: {"forwarded": x.forwarded, "dropped": x.dropped, "depth": len(x.queue)}
+                for address, x in self.subscribers.items()}}
+
+    def close(self):
+        self.stopped = True
+        self.selector.close()
+        self.sock.close()
@@ -0,0 +1,211 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Copyright 2024, Alex Zhornyak, alexander.zhornyak@gmail.com
+
+""" Inbound UDP events of the external controllers (ScxmlEditor triggers).
+
+A background thread receives the datagrams from a non-blocking socket
+(selectors) and appends the parsed events to a bounded ring buffer, the
+machine drains the buffer in its own timer tick. The parsed datagrams are
+cached, controllers usually repeat the same few triggers.
+
+    <event name="go"><param name="x" expr="1" type="2"/></event>
+    <event name="go"><content type="5">{"x": 1}</content></event>
+"""
+
+import json
+import socket
+import selectors
+import threading
+import logging
+from collections import deque
+import xml.etree.ElementTree as etree
+
+from .consts import PYSCXML_MONITOR_LITERAL
+
+
+class TContentTriggerType:
+    cttDefault = 0
+    cttBool = 1
+    cttInteger = 2
+    cttDouble = 3
+    cttString = 4
+    cttJson = 5
+    cttUserData = 6
+
+
+def get_trigger_value(s_text, trigger_type: int):
+    if trigger_type == TContentTriggerType.cttInteger:
+        return int(s_text)
+    elif trigger_type == TContentTriggerType.cttDouble:
+        return float(s_text)
+    elif trigger_type == TContentTriggerType.cttJson:
+        if s_text:
+            return json.loads(s_text)
+    return s_text
+
+
+def parse_trigger(s_data):
+    '''returns (event name, data) of the trigger xml'''
+    root = etree.fromstring(s_data)
+    s_event = root.get("name")
+    p_data_value = {}
+    p_data_map = {}
+
+    b_is_context = False
+
+    for elem in root:
+        if elem.tag == 'content':
+            trigger_type = int(elem.get("type", 0))
+            p_data_value = get_trigger_value(elem.text, trigger_type)
+            b_is_context = True
+        elif elem.tag == 'param':
+            s_key = elem.get("name", "")
+            s_val = elem.get("expr", "")
+            trigger_type = int(elem.get("type", 0))
+            p_data_map[s_key] = get_trigger_value(s_val, trigger_type)
+
+    return s_event, p_data_value if b_is_context else p_data_map
+
+
+class UdpInbound(object):
+    '''
+    Receives the triggers on (host, port) in a background thread
+    @param queue_size: the count of the pending events, the oldest ones are dropped
+    @param cache_size: the count of the cached parsed datagrams
+    @param receive_buffer: SO_RCVBUF in bytes, absorbs the bursts while the thread waits for the GIL
+    '''
+
+    # NOTE: the datagram which stops the thread of the previous versions, still accepted
+    STOP_DATAGRAM = b"_"
+
+    def __init__(self, host, port, queue_size=4096, cache_size=256, receive_buffer=1 << 20, select_timeout=0.1):
+        self.address = (host, port)
+        self.receive_buffer = receive_buffer
+        self.queue = deque(maxlen=queue_size)
+        self.queue_size = queue_size
+        self.cache_size = cache_size
+        self.select_timeout = select_timeout
+        # NOTE: datagram bytes -> (event name, data)
+        self.templates = {}
+
+        self.received = 0
+        self.dropped = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.max_depth = 0
+
+        self.logger = logging.getLogger(PYSCXML_MONITOR_LITERAL + ".inbound")
+
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="pyscxml.monitor.inbound", daemon=True)
+        self._thread.start()
+
+    def depth(self):
+        return len(self.queue)
+
+    def stats(self):
+        return {
+            "received": self.received, "dropped": self.dropped, "errors": self.errors,
+            "cache_hits": self.cache_hits, "depth": len(self.queue), "max_depth": self.max_depth}
+
+    def drain(self, send, limit=None):
+        '''
+        Calls send(event, data) for the pending events in the arrival order
+        @param limit: max count of the events per call, None - all the pending ones
+        @return: the count of the sent events
+        '''
+        queue = self.queue
+        popleft = queue.popleft
+        count = 0
+        while queue and (limit is None or count < limit):
+            try:
+                s_event, data = popleft()
+            except IndexError:
+                break
+            send(s_event, data)
+            count += 1
+        return count
+
+    def stop(self, timeout=1.0):
+        if not self._stop_event.is_set():
+            self._stop_event.set()
+            self._thread.join(timeout)
+            self.logger.info(f"inbound stats: {self.stats()}")
+
+    def parse(self, datagram):
+        template = self.templates.get(datagram)
+        if template is not None:
+            self.cache_hits += 1
+            return template
+
+        s_event, data = parse_trigger(datagram.decode())
+        # NOTE: the events of one template share the data, Interpreter.send copies the top level of a dict,
+        #   a list would be shared as is, so it is not cached
+        if isinstance(data, list):
+            return s_event, data
+        if len(self.templates) >= self.cache_size:
+            self.templates.clear()
+        template = self.templates[datagram] = (s_event, data)
+        return template
+
+    def _run(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        selector = selectors.DefaultSelector()
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+            if self.receive_buffer:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.receive_buffer)
+            sock.bind(self.address)
+            sock.setblocking(False)
+            selector.register(sock, selectors.EVENT_READ)
+
+            queue = self.queue
+            while not self._stop_event.is_set():
+                if not selector.select(self.select_timeout):
+                    continue
+                # NOTE: reads all the datagrams which are ready, one select per batch
+                while True:
+                    try:
+                        datagram = sock.recv(8096)
+                    except (BlockingIOError, InterruptedError):
+                        break
+                    if datagram == self.STOP_DATAGRAM:
+                        self._stop_event.set()
+                        break
+                    self.received += 1
+                    try:
+                        template = self.parse(datagram)
+                    except Exception as e:
+                        self.errors += 1
+                        self.logger.error(str(e))
+                        continue
+                    if len(queue) >= self.queue_size:
+                        self.dropped += 1
+                    queue.append(template)
+                    depth = len(queue)
+                    if depth > self.max_depth:
+                        self.max_depth = depth
+        except Exception as e:
+            self.logger.error(f"Error:{str(e)}")
+        finally:
+            selector.close()
+            sock.close()
+            self.logger.info("socket was closed")
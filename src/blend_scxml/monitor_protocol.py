@@ -0,0 +1,260 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Copyright 2024, Alex Zhornyak, alexander.zhornyak@gmail.com
+
+""" Encoding of the monitor notifications.
+
+Text protocol (ScxmlEditor, the default): one message per notification
+    2@{machine}@{state}, 4@{machine}@{state}, 12@{machine}@{state}|{index}
+
+Binary protocol: the names are replaced by small integers declared in the
+dictionary messages which are sent before the first record, when new names
+appear and every 'handshake_interval' seconds for late listeners. A large
+dictionary is split into several messages of up to 'max_dictionary' bytes,
+so each of them fits into one datagram, the listener merges them.
+All the values are little-endian, messages may be concatenated in one datagram.
+
+    dictionary: B type=0xFF, B version, H length, utf-8 json
+                {"machines": {name: id}, "states": {name: id}}
+    record:     B type (2 enter, 4 exit, 12 transition), B flags,
+                H machine id, H state id, H transition index,
+                [I sequence number if flags & 1], [Q timestamp in us if flags & 2]
+"""
+
+import json
+import struct
+import time
+
+MONITOR_ENTER = 2
+MONITOR_EXIT = 4
+MONITOR_TRANSITION = 12
+
+MONITOR_DICTIONARY = 0xFF
+MONITOR_VERSION = 1
+
+FLAG_SEQUENCE = 1
+FLAG_TIMESTAMP = 2
+
+# NOTE: the dictionary messages stay below the usual MTU with the IP and UDP headers
+MAX_DICTIONARY_SIZE = 1200
+
+_dictionary_header = struct.Struct("<BBH")
+
+
+def _dictionary_message(machines, states):
+    payload = json.dumps({"machines": machines, "states": states}, separators=(",", ":")).encode()
+    return _dictionary_header.pack(MONITOR_DICTIONARY, MONITOR_VERSION, len(payload)) + payload
+
+
+def encode_dictionary(machines, states, max_size=MAX_DICTIONARY_SIZE):
+    '''
+    returns the list of the dictionary messages of the name -> id mappings,
+    each of them is up to max_size bytes unless a single name is longer
+    '''
+    t_messages = []
+    p_chunk = {"machines": {}, "states": {}}
+    # NOTE: the header, the keys and the braces of an empty dictionary message
+    empty_size = size = len(_dictionary_message({}, {}))
+    for key, mapping in (("machines", machines), ("states", states)):
+        for name, name_id in mapping.items():
+            entry_size = len(json.dumps(name).encode()) + len(str(name_id)) + 2
+            if size + entry_size > max_size and size > empty_size:
+                t_messages.append(_dictionary_message(p_chunk["machines"], p_chunk["states"]))
+                p_chunk = {"machines": {}, "states": {}}
+                size = empty_size
+            p_chunk[key][name] = name_id
+            size += entry_size
+    if size > empty_size or not t_messages:
+        t_messages.append(_dictionary_message(p_chunk["machines"], p_chunk["states"]))
+    return t_messages
+
+
+def record_struct(flags):
+    return struct.Struct(
+        "<BBHHH" + ("I" if flags & FLAG_SEQUENCE else "") + ("Q" if flags & FLAG_TIMESTAMP else ""))
+
+
+class MonitorTextProtocol(object):
+    separator = b"\n"
+
+    def declare(self, machines=(), states=()):
+        pass
+
+    def encode(self, kind, machine, state, transition_index=0):
+        '''returns the list of the messages of the notification'''
+        if kind == MONITOR_TRANSITION:
+            return [f"{kind}@{machine}@{state}|{transition_index}"]
+        return [f"{kind}@{machine}@{state}"]
+
+
+class MonitorBinaryProtocol(object):
+    '''
+    @param sequence: append the sequence number to the records, lets the listener count the lost ones
+    @param timestamp: append the time in microseconds since the protocol was created
+    @param handshake_interval: seconds between the repeated dictionaries, 0 - sent only on changes
+    @param max_dictionary: the max size of one dictionary message in bytes
+    '''
+    separator = b""
+
+    def __init__(self, sequence=True, timestamp=True, handshake_interval=5.0, max_dictionary=MAX_DICTIONARY_SIZE):
+        self.flags = (FLAG_SEQUENCE if sequence else 0) | (FLAG_TIMESTAMP if timestamp else 0)
+        self.record = record_struct(self.flags)
+        self.handshake_interval = handshake_interval
+        self.max_dictionary = max_dictionary
+
+        self.machines = {}
+        self.states = {}
+        self.sequence = 0
+        self.start_ns = time.monotonic_ns()
+        self.handshake_ns = None
+        # NOTE: names declared after the last dictionary message
+        self.new_machines = {}
+        self.new_states = {}
+
+    def declare(self, machines=(), states=()):
+        '''assigns the ids of the names in advance, so the first dictionary contains all of them'''
+        for machine in machines:
+            self._machine_id(machine)
+        for state in states:
+            self._state_id(state)
+
+    def _machine_id(self, name):
+        machine_id = self.machines.get(name)
+        if machine_id is None:
+            machine_id = self.machines[name] = self.new_machines[name] = len(self.machines)
+        return machine_id
+
+    def _state_id(self, name):
+        state_id = self.states.get(name)
+        if state_id is None:
+            state_id = self.states[name] = self.new_states[name] = len(self.states)
+        return state_id
+
+    def dictionary(self, full=True):
+        '''returns the list of the dictionary messages'''
+        t_messages = (
+            encode_dictionary(self.machines, self.states, self.max_dictionary) if full else
+            encode_dictionary(self.new_machines, self.new_states, self.max_dictionary))
+        self.new_machines = {}
+        self.new_states = {}
+        return t_messages
+
+    def encode(self, kind, machine, state, transition_index=0):
+        '''returns the list of the messages of the notification, the due dictionary messages first'''
+        machine_id = self.machines.get(machine)
+        if machine_id is None:
+            machine_id = self._machine_id(machine)
+        state_id = self.states.get(state)
+        if state_id is None:
+            state_id = self._state_id(state)
+
+        now = time.monotonic_ns()
+        t_messages = []
+        if self.handshake_ns is None or (
+                self.handshake_interval and now - self.handshake_ns > self.handshake_interval * 1e9):
+            t_messages = self.dictionary(full=True)
+            self.handshake_ns = now
+        elif self.new_machines or self.new_states:
+            t_messages = self.dictionary(full=False)
+
+        t_values = [kind, self.flags, machine_id, state_id, transition_index]
+        if self.flags & FLAG_SEQUENCE:
+            self.sequence = (self.sequence + 1) & 0xFFFFFFFF
+            t_values.append(self.sequence)
+        if self.flags & FLAG_TIMESTAMP:
+            t_values.append((now - self.start_ns) // 1000)
+        t_messages.append(self.record.pack(*t_values))
+        return t_messages
+
+
+class MonitorBinaryDecoder(object):
+    '''Listener side of MonitorBinaryProtocol, keeps the received dictionary'''
+
+    def __init__(self):
+        self.machines = {}
+        self.states = {}
+        self.records = {}
+
+    def _messages(self, datagram):
+        '''yields (kind, record values or None for a dictionary, start offset, end offset)'''
+        offset = 0
+        size = len(datagram)
+        while offset < size:
+            start = offset
+            kind = datagram[offset]
+            if kind == MONITOR_DICTIONARY:
+                _, _, length = _dictionary_header.unpack_from(datagram, offset)
+                offset += _dictionary_header.size
+                p_dict = json.loads(datagram[offset: offset + length])
+                offset += length
+                for name, machine_id in p_dict.get("machines", {}).items():
+                    self.machines[machine_id] = name
+                for name, state_id in p_dict.get("states", {}).items():
+                    self.states[state_id] = name
+                yield kind, None, start, offset
+                continue
+
+            flags = datagram[offset + 1]
+            record = self.records.get(flags)
+            if record is None:
+                record = self.records[flags] = record_struct(flags)
+            t_values = record.unpack_from(datagram, offset)
+            offset += record.size
+            yield kind, t_values, start, offset
+
+    def decode(self, datagram):
+        '''
+        yields (kind, machine, state, transition_index, sequence, timestamp) of the records,
+        the names of the records received before their dictionary are None
+        '''
+        for kind, t_values, _, _ in self._messages(datagram):
+            if t_values is None:
+                continue
+            flags = t_values[1]
+            t_extra = list(t_values[5:])
+            sequence = t_extra.pop(0) if flags & FLAG_SEQUENCE else None
+            timestamp = t_extra.pop(0) if flags & FLAG_TIMESTAMP else None
+            yield (
+                kind, self.machines.get(t_values[2]), self.states.get(t_values[3]),
+                t_values[4], sequence, timestamp)
+
+    def dictionary(self):
+        '''returns the list of the dictionary messages of the received names'''
+        return encode_dictionary(
+            {name: machine_id for machine_id, name in self.machines.items()},
+            {name: state_id for state_id, name in self.states.items()})
+
+    def split(self, datagram):
+        '''
+        yields (kind, machine, state, message bytes) of each message in the datagram,
+        machine and state of a dictionary message are None
+        '''
+        for kind, t_values, start, end in self._messages(datagram):
+            if t_values is None:
+                yield kind, None, None, datagram[start:end]
+            else:
+                yield kind, self.machines.get(t_values[2]), self.states.get(t_values[3]), datagram[start:end]
+
+
+def make_protocol(settings):
+    '''returns the protocol selected by UdpMonitorSettings.protocol ("text" or "binary")'''
+    if settings.protocol == "binary":
+        return MonitorBinaryProtocol(
+            sequence=settings.binary_sequence, timestamp=settings.binary_timestamp)
+    return MonitorTextProtocol()
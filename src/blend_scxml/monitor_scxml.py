@@ -21,18 +21,16 @@
 import bpy
 
 from pathlib import Path
-import socket
-import xml.etree.ElementTree as etree
 import sys
-from functools import partial
-import threading
-import json
 from dataclasses import dataclass
 import logging
 
 from .py_blend_scxml import StateMachine, default_logfunction
-from .consts import DispatcherConstants, PYSCXML_MONITOR_LITERAL
-from .louie import dispatcher
+from .consts import PYSCXML_MONITOR_LITERAL
+from .observer import InterpreterObserver
+from .monitor_transport import UdpMonitorTransport
+from .monitor_protocol import make_protocol, MONITOR_ENTER, MONITOR_EXIT, MONITOR_TRANSITION
+from .monitor_inbound import UdpInbound, TContentTriggerType, get_trigger_value  # noqa: F401
 
 
 @dataclass
@@ -50,26 +48,18 @@ class UdpMonitorSettings:
 
     scxml_file_path: str = ""
 
+    # NOTE: see monitor_transport.UdpMonitorTransport
+    queue_size: int = 4096
+    drop_oldest: bool = True
+    batch_size: int = 1
 
-class TContentTriggerType:
-    cttDefault = 0
-    cttBool = 1
-    cttInteger = 2
-    cttDouble = 3
-    cttString = 4
-    cttJson = 5
-    cttUserData = 6
+    # NOTE: "text" (ScxmlEditor) or "binary", see monitor_protocol
+    protocol: str = "text"
+    binary_sequence: bool = True
+    binary_timestamp: bool = True
 
-
-def get_trigger_value(s_text, trigger_type: int):
-    if trigger_type == TContentTriggerType.cttInteger:
-        return int(s_text)
-    elif trigger_type == TContentTriggerType.cttDouble:
-        return float(s_text)
-    elif trigger_type == TContentTriggerType.cttJson:
-        if s_text:
-            return json.loads(s_text)
-    return s_text
+    # NOTE: see monitor_inbound.UdpInbound
+    inbound_queue_size: int = 4096
 
 
 def flushing_logfunction(label, msg):
@@ -78,6 +68,28 @@ def flushing_logfunction(label, msg):
     sys.stdout.flush()
 
 
+class UdpMonitorObserver(InterpreterObserver):
+    '''Reports the changes of each microstep in ScxmlEditor order: exits, transitions, entries'''
+
+    def __init__(self, machine):
+        self.machine = machine
+        self.errors = 0
+
+    def on_microstep(self, interpreter, record):
+        machine = self.machine
+        try:
+            for state in record.exited:
+                machine.send_exit(interpreter, state)
+            for state, transition_index in record.transitions:
+                machine.send_taking_transition(interpreter, state, transition_index)
+            for state in record.entered:
+                machine.send_enter(interpreter, state)
+        except Exception as e:
+            # NOTE: the monitor must never stop the machine, the rest of the microstep is not reported
+            self.errors += 1
+            machine.monitor_logger.error(f"The monitor notification failed: {e}")
+
+
 class UdpMonitorMachine(StateMachine):
     def __init__(
             self, source,
@@ -89,9 +101,15 @@ class UdpMonitorMachine(StateMachine):
             filedir="", filename=""):
 
         self._monitor_enabled = False
+        self.monitor_observer = UdpMonitorObserver(self)
+        # NOTE: created by the first notification
+        self.monitor_transport: UdpMonitorTransport = None
 
         self.monitor_settings = monitor_settings
+        self.monitor_protocol = make_protocol(monitor_settings)
         self.monitor_logger = logging.getLogger(PYSCXML_MONITOR_LITERAL)
+        # NOTE: id(interpreter) -> scxml name
+        self.scxml_names = {}
 
         super().__init__(
             source,
@@ -99,6 +117,7 @@ class UdpMonitorMachine(StateMachine):
             sessionid=sessionid, default_datamodel=default_datamodel,
             setup_session=setup_session, filedir=filedir, filename=filename)
 
+        self.monitor_protocol.declare(states=self.doc.stateDict.keys())
         self.monitor_enabled = monitor_enabled
 
     @property
@@ -110,50 +129,63 @@ class UdpMonitorMachine(StateMachine):
         if value != self._monitor_enabled:
             self._monitor_enabled = value
             if self._monitor_enabled:
-                dispatcher.connect(self.send_enter, DispatcherConstants.enter_state, self.interpreter)
-                dispatcher.connect(self.send_exit, DispatcherConstants.exit_state, self.interpreter)
-                dispatcher.connect(self.send_taking_transition, DispatcherConstants.taking_transition, self.interpreter)
+                self.interpreter.addObserver(self.monitor_observer)
             else:
-                dispatcher.disconnect(self.send_enter, DispatcherConstants.enter_state, self.interpreter)
-                dispatcher.disconnect(self.send_exit, DispatcherConstants.exit_state, self.interpreter)
-                dispatcher.disconnect(self.send_taking_transition, DispatcherConstants.taking_transition, self.interpreter)
-
-    def send_udp(self, message: str):
-        sock = socket.socket(
-            socket.AF_INET,  # Internet
-            socket.SOCK_DGRAM)  # UDP
-        sock.sendto(
-            message.encode(),
-            (self.monitor_settings.remote_host, self.monitor_settings.remote_port))
+                self.interpreter.removeObserver(self.monitor_observer)
+
+    def send_udp(self, messages):
+        '''@param messages: the list of the messages returned by the monitor protocol'''
+        if self.monitor_transport is None:
+            settings = self.monitor_settings
+            self.monitor_transport = UdpMonitorTransport(
+                settings.remote_host, settings.remote_port,
+                queue_size=settings.queue_size, drop_oldest=settings.drop_oldest,
+                batch_size=settings.batch_size, separator=self.monitor_protocol.separator)
+        for message in messages:
+            self.monitor_transport.send(message)
+
+    def close_monitor_transport(self):
+        '''sends the pending notifications and stops the transport thread'''
+        if self.monitor_transport is not None:
+            self.monitor_transport.close()
+            self.monitor_transport = None
+
+    def on_exit(self, sender, final):
+        super().on_exit(sender, final)
+
+        if sender is self.interpreter:
+            self.close_monitor_transport()
 
     def get_scxml_name(self, sender):
-        s_name = sender.dm.get("_name", "")
-        if not s_name:
-            try:
-                s_name = Path(sender.dm.self.filename).stem
-            except Exception:
-                pass
+        s_name = self.scxml_names.get(id(sender))
+        if s_name is None:
+            s_name = sender.dm.get("_name", "")
+            if not s_name:
+                try:
+                    s_name = Path(sender.dm.self.filename).stem
+                except Exception:
+                    pass
+            self.scxml_names[id(sender)] = s_name
         return s_name
 
     def send_enter(self, sender, state):
         s_machine = self.get_scxml_name(sender)
 
+        # NOTE: ScxmlEditor does not intercept Blender output without flushing, it is done by the transport
         self.monitor_logger.info(f"machine: {s_machine} enter: {state}")
-        # NOTE: ScxmlEditor does not intercept Blender output without it
-        sys.stdout.flush()
 
-        self.send_udp(f"2@{s_machine}@{state}")
+        self.send_udp(self.monitor_protocol.encode(MONITOR_ENTER, s_machine, state))
 
     def send_exit(self, sender, state):
         s_machine = self.get_scxml_name(sender)
 
         self.monitor_logger.info(f"machine: {s_machine} exit: {state}")
-        self.send_udp(f"4@{s_machine}@{state}")
+        self.send_udp(self.monitor_protocol.encode(MONITOR_EXIT, s_machine, state))
 
     def send_taking_transition(self, sender, state, transition_index):
         s_machine = self.get_scxml_name(sender)
         self.monitor_logger.info(f"machine: {s_machine} transition: {state} index: {transition_index}")
-        self.send_udp(f"12@{s_machine}@{state}|{transition_index}")
+        self.send_udp(self.monitor_protocol.encode(MONITOR_TRANSITION, s_machine, state, transition_index))
 
 
 class UdpTestingMachine(UdpMonitorMachine):
@@ -171,10 +203,19 @@ class UdpTestingMachine(UdpMonitorMachine):
             monitor_settings=monitor_settings,
             log_function=flushing_logfunction)
 
-        self._stop_event = threading.Event()
-        self.listen_thread = threading.Thread(target=self.listen_udp)
-        self.listen_thread.daemon = True
-        self.listen_thread.start()
+        self.inbound = UdpInbound(
+            monitor_settings.local_host, monitor_settings.local_port,
+            queue_size=monitor_settings.inbound_queue_size)
+
+    def _register_timer(self):
+        self.compiler.timers.register(self.tick, persistent=True)
+
+    def tick(self):
+        '''drains the inbound triggers before the interpreter step'''
+        inbound = self.inbound
+        if inbound is not None and inbound.queue:
+            inbound.drain(self.send)
+        return self.interpreter.mainEventLoop()
 
     def on_exit(self, sender, final):
         super().on_exit(sender, final)
@@ -184,62 +225,9 @@ class UdpTestingMachine(UdpMonitorMachine):
             bpy.ops.wm.quit_blender()
 
     def stop_listen_thread(self):
-        if self.listen_thread:
-            self._stop_event.set()
-
-            if self.listen_thread.is_alive:
-                sock = socket.socket(
-                    socket.AF_INET,  # Internet
-                    socket.SOCK_DGRAM)  # UDP
-                sock.sendto(
-                    "_".encode(),
-                    ("localhost", self.monitor_settings.local_port))
-
-                self.listen_thread.join()
-
-            self.listen_thread = None
+        if getattr(self, "inbound", None):
+            self.inbound.stop()
+            self.inbound = None
 
     def __del__(self):
         self.stop_listen_thread()
-
-    def listen_udp(self):
-        try:
-            self.udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
-            self.udp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            self.udp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-
-            self.udp_socket.bind((self.monitor_settings.local_host, self.monitor_settings.local_port))
-
-            while not self._stop_event.is_set():
-                data, addr = self.udp_socket.recvfrom(8096)
-                try:
-                    s_data = data.decode()
-                    if s_data == '_':
-                        break
-                    root = etree.fromstring(s_data)
-                    s_event = root.get("name")
-                    p_data_value = {}
-                    p_data_map = {}
-
-                    b_is_context = False
-
-                    for elem in root:
-                        if elem.tag == 'content':
-                            trigger_type = int(elem.get("type", 0))
-                            p_data_value = get_trigger_value(elem.text, trigger_type)
-                            b_is_context = True
-                        elif elem.tag == 'param':
-                            s_key = elem.get("name", "")
-                            s_val = elem.get("expr", "")
-                            trigger_type = int(elem.get("type", 0))
-                            p_data_map[s_key] = get_trigger_value(s_val, trigger_type)
-
-                    bpy.app.timers.register(partial(self.send, s_event, p_data_value if b_is_context else p_data_map), persistent=True)
-
-                except Exception as e:
-                    self.monitor_logger.error(str(e))
-        except Exception as e:
-            self.monitor_logger.error(f"Error:{str(e)}")
-        finally:
-            self.udp_socket.close()
-            self.monitor_logger.info("socket was closed")
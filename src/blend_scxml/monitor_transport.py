@@ -0,0 +1,145 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Copyright 2024, Alex Zhornyak, alexander.zhornyak@gmail.com
+
+""" Asynchronous UDP transport of the monitor notifications.
+
+The interpreter thread only appends the message to a bounded deque
+(append and popleft are atomic, no lock is taken), a background thread
+owns the single socket and sends the queued messages, optionally several
+of them per datagram. When the queue is full the oldest (or the newest)
+messages are dropped, so a slow or absent ScxmlEditor never blocks the
+state machine.
+"""
+
+import sys
+import socket
+import threading
+import logging
+from collections import deque
+
+from .consts import PYSCXML_MONITOR_LITERAL
+
+
+class UdpMonitorTransport(object):
+    '''
+    Sends the messages to (host, port) from a background thread
+    @param queue_size: the count of the pending messages, the extra ones are dropped
+    @param drop_oldest: True - the oldest pending messages are dropped, False - the new ones
+    @param batch_size: the max count of the messages in one datagram, joined by 'separator'
+    @param max_datagram: the max size of a batched datagram in bytes
+    @param flush_stdout: flush sys.stdout after each sent batch (ScxmlEditor reads Blender output)
+    '''
+
+    def __init__(
+            self, host, port,
+            queue_size=4096, drop_oldest=True,
+            batch_size=1, separator=b"\n", max_datagram=1400,
+            flush_stdout=True):
+        self.address = (host, port)
+        self.drop_oldest = drop_oldest
+        self.batch_size = max(batch_size, 1)
+        self.separator = separator
+        self.max_datagram = max_datagram
+        self.flush_stdout = flush_stdout
+
+        self.queue = deque(maxlen=queue_size) if drop_oldest else deque()
+        self.queue_size = queue_size
+        self.dropped = 0
+        self.sent = 0
+        self.datagrams = 0
+
+        self.logger = logging.getLogger(PYSCXML_MONITOR_LITERAL + ".transport")
+
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="pyscxml.monitor.transport", daemon=True)
+        self._thread.start()
+
+    def send(self, message):
+        '''queues the message, it never blocks'''
+        queue = self.queue
+        if len(queue) >= self.queue_size:
+            # NOTE: the counter is approximate, it is not synchronized with the sender thread
+            self.dropped += 1
+            if not self.drop_oldest:
+                return
+        queue.append(message.encode() if isinstance(message, str) else message)
+        if not self._wakeup.is_set():
+            self._wakeup.set()
+
+    def pending(self):
+        return len(self.queue)
+
+    def close(self, timeout=1.0):
+        '''sends the pending messages and stops the thread'''
+        if self._stopped:
+            return
+        self._stopped = True
+        self._wakeup.set()
+        self._thread.join(timeout)
+
+    def _run(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            while True:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                self._drain(sock)
+                if self._stopped:
+                    self._drain(sock)
+                    break
+        finally:
+            sock.close()
+
+    def _drain(self, sock):
+        queue = self.queue
+        popleft = queue.popleft
+        b_sent = False
+        while queue:
+            try:
+                datagram = popleft()
+            except IndexError:
+                break
+            count = 1
+            if self.batch_size > 1:
+                t_batch = [datagram]
+                size = len(datagram)
+                while count < self.batch_size and queue:
+                    next_size = size + len(self.separator) + len(queue[0])
+                    if next_size > self.max_datagram:
+                        break
+                    try:
+                        t_batch.append(popleft())
+                    except IndexError:
+                        break
+                    size = next_size
+                    count += 1
+                datagram = self.separator.join(t_batch)
+            try:
+                sock.sendto(datagram, self.address)
+                self.sent += count
+                self.datagrams += 1
+                b_sent = True
+            except OSError as e:
+                # NOTE: nobody listens or the network is down, the monitor must not stop the machine
+                self.dropped += count
+                self.logger.debug(f"Can not send to {self.address}: {e}")
+        if b_sent and self.flush_stdout:
+            sys.stdout.flush()
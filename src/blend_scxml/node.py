@@ -124,6 +124,8 @@ class Transition(Executable):
         self.target = []
         self.event = []
         self.cond = None
+        # NOTE: ExprInfo of the cond if it can be cached between datamodel changes
+        self.dependencies = None
         self.type = "external"
 
     def __str__(self):
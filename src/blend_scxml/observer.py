@@ -0,0 +1,198 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Copyright 2024, Alex Zhornyak, alexander.zhornyak@gmail.com
+
+""" Interpreter lifecycle observers.
+
+An observer is any object with some of the InterpreterObserver callbacks,
+it is registered with Interpreter.addObserver(). The interpreter keeps a
+tuple of bound callbacks per signal, so a signal nobody observes costs a
+single truth test.
+
+The consolidated ChangeRecord of a microstep or a macrostep (on_microstep,
+on_macrostep) replaces the per-state signals for the consumers which
+update their view incrementally.
+"""
+
+# author="Patrick K. O'Brien and contributors",
+# url="https://github.com/11craft/louie/",
+# download_url="https://pypi.python.org/pypi/Louie",
+# license="BSD"
+from .louie import dispatcher
+from .louie.sender import Any
+from .consts import DispatcherConstants
+
+
+class InterpreterObserver(object):
+    '''Base class of interpreter observers, override the callbacks you need'''
+
+    def on_internal_event(self, interpreter, event):
+        pass
+
+    def on_external_event(self, interpreter, event):
+        pass
+
+    def on_enter_state(self, interpreter, state):
+        pass
+
+    def on_exit_state(self, interpreter, state):
+        pass
+
+    def on_taking_transition(self, interpreter, state, transition_index):
+        pass
+
+    def on_new_configuration(self, interpreter):
+        pass
+
+    def on_exit(self, interpreter, final):
+        pass
+
+    def on_microstep(self, interpreter, record):
+        '''receives the ChangeRecord of each microstep, it is recorded only while observed'''
+        pass
+
+    def on_macrostep(self, interpreter, record):
+        '''receives the ChangeRecord of each macrostep, it is recorded only while observed'''
+        pass
+
+
+class ChangeRecord(object):
+    '''
+    Changes of the configuration made by a microstep or a macrostep.
+    The interpreter reuses its records, use copy() to keep one after the callback.
+    - event: the triggering event, None for eventless transitions and the initial configuration
+    - exited, entered: state ids in exit and entry order
+    - transitions: (source state id, transition index) of the taken transitions
+    - microsteps: the count of the recorded microsteps
+    '''
+
+    __slots__ = ("event", "exited", "entered", "transitions", "microsteps")
+
+    def __init__(self):
+        self.event = None
+        self.exited = []
+        self.entered = []
+        self.transitions = []
+        self.microsteps = 0
+
+    def clear(self):
+        self.event = None
+        self.exited.clear()
+        self.entered.clear()
+        self.transitions.clear()
+        self.microsteps = 0
+
+    def merge(self, record):
+        '''
+        Accumulates the record of a microstep,
+        'exited' and 'entered' remain the net change of the configuration
+        '''
+        exited, entered = self.exited, self.entered
+        for state in record.exited:
+            if state in entered:
+                entered.remove(state)
+            else:
+                exited.append(state)
+        for state in record.entered:
+            if state in exited:
+                exited.remove(state)
+            else:
+                entered.append(state)
+        self.transitions.extend(record.transitions)
+        self.microsteps += record.microsteps
+
+    def copy(self):
+        record = ChangeRecord()
+        record.event = self.event
+        record.exited.extend(self.exited)
+        record.entered.extend(self.entered)
+        record.transitions.extend(self.transitions)
+        record.microsteps = self.microsteps
+        return record
+
+    def __repr__(self):
+        return "<ChangeRecord event=%s exited=%s entered=%s transitions=%s>" % (
+            getattr(self.event, "name", None), self.exited, self.entered, self.transitions)
+
+
+# NOTE: callback name -> name of the interpreter attribute with the tuple of bound callbacks
+observerCallbacks = {
+    "on_internal_event": "internalEventObservers",
+    "on_external_event": "externalEventObservers",
+    "on_enter_state": "enterStateObservers",
+    "on_exit_state": "exitStateObservers",
+    "on_taking_transition": "takingTransitionObservers",
+    "on_new_configuration": "newConfigurationObservers",
+    "on_exit": "exitObservers",
+    "on_microstep": "microstepObservers",
+    "on_macrostep": "macrostepObservers",
+}
+
+
+def get_callback(observer, name):
+    '''returns the bound callback or None if the observer does not implement it'''
+    callback = getattr(observer, name, None)
+    if callback is None or getattr(callback, "__func__", None) is getattr(InterpreterObserver, name):
+        return None
+    return callback
+
+
+class LouieAdapter(InterpreterObserver):
+    '''
+    Sends the observed signals through louie dispatcher (see DispatcherConstants)
+    for the receivers which are connected to the interpreter
+    '''
+
+    @staticmethod
+    def is_connected(interpreter):
+        # NOTE: 'dispatcher.connections' is rebound by 'dispatcher.reset()'
+        connections = dispatcher.connections
+        return id(interpreter) in connections or id(Any) in connections
+
+    def on_internal_event(self, interpreter, event):
+        if self.is_connected(interpreter):
+            dispatcher.send(DispatcherConstants.internal_event, interpreter, event=event)
+
+    def on_external_event(self, interpreter, event):
+        if self.is_connected(interpreter):
+            dispatcher.send(DispatcherConstants.external_event, interpreter, event=event)
+
+    def on_enter_state(self, interpreter, state):
+        if self.is_connected(interpreter):
+            dispatcher.send(DispatcherConstants.enter_state, interpreter, state=state)
+
+    def on_exit_state(self, interpreter, state):
+        if self.is_connected(interpreter):
+            dispatcher.send(DispatcherConstants.exit_state, interpreter, state=state)
+
+    def on_taking_transition(self, interpreter, state, transition_index):
+        if self.is_connected(interpreter):
+            dispatcher.send(
+                DispatcherConstants.taking_transition, interpreter, state=state, transition_index=transition_index)
+
+    def on_new_configuration(self, interpreter):
+        if self.is_connected(interpreter):
+            dispatcher.send(DispatcherConstants.new_configuration, interpreter)
+
+    def on_exit(self, interpreter, final):
+        if self.is_connected(interpreter):
+            dispatcher.send(DispatcherConstants.exit, interpreter, final=final)
+
+
+louie_adapter = LouieAdapter()
@@ -0,0 +1,195 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Copyright 2024, Alex Zhornyak, alexander.zhornyak@gmail.com
+
+""" Per-state and per-transition profiling counters.
+
+InterpreterProfiler counts the entries and exits of the states and the
+taken transitions (source state id, transition index as in
+'on_taking_transition'), and accumulates the time of <onentry>, <onexit>,
+the transition content and the 'cond' evaluations.
+
+It is attached to one interpreter by shadowing its executeContent and
+conditionMatch methods with timed ones, a detached interpreter runs the
+class methods, so the profiling costs nothing when it is off:
+
+    profiler = InterpreterProfiler()
+    profiler.attach(sm.interpreter, sm.doc)
+    ...
+    print(profiler.report())
+    profiler.detach()
+"""
+
+import time
+
+from .observer import InterpreterObserver
+
+ONENTRY = "onentry"
+ONEXIT = "onexit"
+CONTENT = "content"
+COND = "cond"
+
+
+class InterpreterProfiler(InterpreterObserver):
+    '''
+    @param clock: the integer clock in nanoseconds
+    '''
+
+    def __init__(self, clock=time.perf_counter_ns):
+        self.clock = clock
+        self.interpreter = None
+        # NOTE: id(executable content) -> (kind, state id or (source state id, transition index))
+        self.contents = {}
+        # NOTE: id(transition) -> (source state id, transition index)
+        self.transition_keys = {}
+        self.reset()
+
+    def reset(self):
+        # NOTE: state id -> [entries, exits, onentry ns, onexit ns]
+        self.states = {}
+        # NOTE: (source state id, transition index) -> [taken, content ns, cond evaluations, cond ns]
+        self.transitions = {}
+
+    def _state(self, state_id):
+        counters = self.states.get(state_id)
+        if counters is None:
+            counters = self.states[state_id] = [0, 0, 0, 0]
+        return counters
+
+    def _transition(self, key):
+        counters = self.transitions.get(key)
+        if counters is None:
+            counters = self.transitions[key] = [0, 0, 0, 0]
+        return counters
+
+    def attach(self, interpreter, doc):
+        '''
+        @param doc: the SCXMLDocument of the interpreter, its nodes are mapped to the counter keys
+        '''
+        if self.interpreter is not None:
+            self.detach()
+
+        self.contents.clear()
+        self.transition_keys.clear()
+        for node in doc.stateDict.values():
+            for idx, t in enumerate(getattr(node, "transition", ())):
+                self.transition_keys[id(t)] = (node.id, idx)
+                self.contents[id(t)] = (CONTENT, (node.id, idx))
+            for content in getattr(node, "onentry", ()):
+                self.contents[id(content)] = (ONENTRY, node.id)
+            for content in getattr(node, "onexit", ()):
+                self.contents[id(content)] = (ONEXIT, node.id)
+            # NOTE: the content of <initial> is executed while the state is entered
+            initial = getattr(node, "initial", None)
+            if initial:
+                self.contents[id(initial)] = (ONENTRY, node.id)
+
+        self.interpreter = interpreter
+        interpreter.executeContent = self._make_execute_content(type(interpreter).executeContent.__get__(interpreter))
+        interpreter.conditionMatch = self._make_condition_match(type(interpreter).conditionMatch.__get__(interpreter))
+        interpreter.addObserver(self)
+
+    def detach(self):
+        interpreter = self.interpreter
+        if interpreter is not None:
+            interpreter.removeObserver(self)
+            del interpreter.executeContent
+            del interpreter.conditionMatch
+            self.interpreter = None
+
+    def _make_execute_content(self, execute_content):
+        clock = self.clock
+        contents = self.contents
+
+        def executeContent(obj):
+            key = contents.get(id(obj))
+            if key is None:
+                return execute_content(obj)
+            start = clock()
+            try:
+                return execute_content(obj)
+            finally:
+                elapsed = clock() - start
+                kind, node_key = key
+                if kind == CONTENT:
+                    self._transition(node_key)[1] += elapsed
+                else:
+                    self._state(node_key)[2 if kind == ONENTRY else 3] += elapsed
+
+        return executeContent
+
+    def _make_condition_match(self, condition_match):
+        clock = self.clock
+        transition_keys = self.transition_keys
+
+        def conditionMatch(t):
+            if not t.cond:
+                return True
+            start = clock()
+            try:
+                return condition_match(t)
+            finally:
+                elapsed = clock() - start
+                key = transition_keys.get(id(t))
+                if key is not None:
+                    counters = self._transition(key)
+                    counters[2] += 1
+                    counters[3] += elapsed
+
+        return conditionMatch
+
+    def on_enter_state(self, interpreter, state):
+        self._state(state)[0] += 1
+
+    def on_exit_state(self, interpreter, state):
+        self._state(state)[1] += 1
+
+    def on_taking_transition(self, interpreter, state, transition_index):
+        self._transition((state, transition_index))[0] += 1
+
+    def snapshot(self):
+        '''returns the copy of the counters, the times are in seconds'''
+        return {
+            "states": {
+                state_id: {
+                    "entries": entries, "exits": exits,
+                    "onentry_s": onentry_ns * 1e-9, "onexit_s": onexit_ns * 1e-9}
+                for state_id, (entries, exits, onentry_ns, onexit_ns) in self.states.items()},
+            "transitions": {
+                key: {
+                    "taken": taken, "content_s": content_ns * 1e-9,
+                    "cond_evaluations": cond_evaluations, "cond_s": cond_ns * 1e-9}
+                for key, (taken, content_ns, cond_evaluations, cond_ns) in self.transitions.items()},
+        }
+
+    def report(self, limit=None):
+        '''returns the text table of the states and the transitions sorted by their total time'''
+        t_states = sorted(self.states.items(), key=lambda x: x[1][2] + x[1][3], reverse=True)[:limit]
+        t_transitions = sorted(self.transitions.items(), key=lambda x: x[1][1] + x[1][3], reverse=True)[:limit]
+
+        t_lines = ["%-40s %10s %10s %12s %12s" % ("state", "entries", "exits", "onentry ms", "onexit ms")]
+        for state_id, (entries, exits, onentry_ns, onexit_ns) in t_states:
+            t_lines.append("%-40s %10d %10d %12.3f %12.3f" % (state_id, entries, exits, onentry_ns * 1e-6, onexit_ns * 1e-6))
+
+        t_lines.append("")
+        t_lines.append("%-40s %10s %12s %10s %12s" % ("transition", "taken", "content ms", "conds", "cond ms"))
+        for (state_id, transition_index), (taken, content_ns, cond_evaluations, cond_ns) in t_transitions:
+            t_lines.append("%-40s %10d %12.3f %10d %12.3f" % (
+                f"{state_id}|{transition_index}", taken, content_ns * 1e-6, cond_evaluations, cond_ns * 1e-6))
+        return "\n".join(t_lines)
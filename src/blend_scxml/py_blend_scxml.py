@@ -20,8 +20,6 @@ This file is part of PySCXML.
 
 # NOTE: modified by Alex Zhornyak, alexander.zhornyak@gmail.com
 
-import bpy
-
 import logging
 import os
 import re
@@ -32,9 +30,10 @@ from xml.etree import ElementTree as etree
 # download_url="https://pypi.python.org/pypi/Louie",
 # license="BSD"
 from .louie import dispatcher
-from .consts import DispatcherConstants
+from .consts import DispatcherConstants, QueuePolicy
 
 from . import compiler
+from . import metrics
 from .interpreter import Interpreter, CancelEvent
 
 
@@ -58,6 +57,19 @@ def default_logfunction(label, msg):
     print("%s%s%s" % (label, ": " if label and msg is not None else "", msg))
 
 
+class SessionLogger(logging.LoggerAdapter):
+    '''
+    The logger of a session: the messages of all the sessions go to one shared logger
+    and are prefixed with the sessionid ('sessionid' is also in the record extras).
+    NOTE: the named loggers are never released by logging, a logger per session
+    would leak with every invoked session
+    '''
+
+    def process(self, msg, kwargs):
+        kwargs["extra"] = self.extra
+        return "[%s] %s" % (self.extra["sessionid"], msg), kwargs
+
+
 class StateMachine(object):
     '''
     This class provides the entry point for the PySCXML library.
@@ -67,22 +79,51 @@ class StateMachine(object):
             self, source,
             log_function=default_logfunction,
             sessionid=None, default_datamodel="python", setup_session=True,
-            filedir="", filename=""):
+            filedir="", filename="", interpreter_class=Interpreter, timers=None,
+            queue_size=0, queue_policy=QueuePolicy.block, queue_timeout=1.0, coalesce=None,
+            dependency_tracking=None):
+        '''
+        @param interpreter_class: the Interpreter class or a specialized subclass,
+        for example the one with the transition selection generated by blend_scxml.codegen for this document
+        @param timers: the scheduler with the bpy.app.timers interface, bpy.app.timers if None,
+        for example replay.ManualTimers
+        @param queue_size: the bound of the external queue, 0 is unbounded (see Interpreter.setQueueBound)
+        @param queue_policy: consts.QueuePolicy of the full external queue
+        @param queue_timeout: the seconds a producer waits with QueuePolicy.block
+        @param coalesce: {event name: consts.CoalescePolicy} of the external events whose waiting
+        duplicates are collapsed, in addition to the ones declared by the chart (see Interpreter.setCoalescing)
+        @param dependency_tracking: skip the eventless conds which were false while the <data> names
+        they read were not assigned, None keeps the blend:dependency-tracking attribute of the chart.
+        Turn it on only if the <data> objects the conds read are not changed outside of the chart
+        '''
         self.is_finished = False
         self.compiler = compiler.Compiler()
         self.compiler.filedir = filedir
         self.compiler.filename = filename
         self.compiler.default_datamodel = default_datamodel
         self.compiler.log_function = log_function
+        if timers is not None:
+            self.compiler.timers = timers
+
+        # NOTE: scoped signal routes of the session, released at once on exit
+        self.registry = self.compiler.registry
 
         self.sessionid = sessionid or "pyscxml_session_" + str(id(self))
-        self.interpreter = Interpreter()
-        dispatcher.connect(self.on_exit, DispatcherConstants.exit, self.interpreter)
-        self.logger = logging.getLogger("pyscxml.%s" % self.sessionid)
-        self.interpreter.logger = logging.getLogger("pyscxml.%s.interpreter" % self.sessionid)
-        self.compiler.logger = logging.getLogger("pyscxml.%s.compiler" % self.sessionid)
+        self.interpreter = interpreter_class()
+        if queue_size:
+            self.interpreter.setQueueBound(queue_size, queue_policy, queue_timeout)
+        for name, policy in (coalesce or {}).items():
+            self.interpreter.setCoalescing(name, policy)
+        # NOTE: the machine observes 'on_exit' of its interpreter (see observer.InterpreterObserver)
+        self.interpreter.addObserver(self)
+        p_extra = {"sessionid": self.sessionid}
+        self.logger = SessionLogger(logging.getLogger("pyscxml.session"), p_extra)
+        self.interpreter.logger = SessionLogger(logging.getLogger("pyscxml.session.interpreter"), p_extra)
+        self.compiler.logger = SessionLogger(logging.getLogger("pyscxml.session.compiler"), p_extra)
         self.doc = self.compiler.parseXML(
             self._open_document(source), self.interpreter)
+        if dependency_tracking is not None:
+            self.interpreter.dependencyTracking = dependency_tracking
         self.interpreter.dm = self.doc.datamodel
         self.datamodel = self.doc.datamodel
         self.doc.datamodel["_x"] = {"self": self}
@@ -132,11 +173,14 @@ class StateMachine(object):
                 if self.compiler.filedir else self.compiler.filename)
             self.logger.info("Starting %s" % doc)
         self._start()
-        bpy.app.timers.register(self.interpreter.mainEventLoop, persistent=True)
+        self._register_timer()
 
     def start_threaded(self):
         self._start()
-        bpy.app.timers.register(self.interpreter.mainEventLoop, persistent=True)
+        self._register_timer()
+
+    def _register_timer(self):
+        self.compiler.timers.register(self.interpreter.mainEventLoop, persistent=True)
 
     def isFinished(self):
         '''Returns True if the statemachine has reached it
@@ -152,18 +196,19 @@ class StateMachine(object):
         top-level <final /> state in your document instead.
         '''
         self.interpreter.running = False
-        self.interpreter.externalQueue.put(CancelEvent())
+        self.interpreter.externalQueue.force(CancelEvent())
 
     def send(self, name, data={}):
         '''
         Send an event to the running machine.
         @param name: the event name (string)
         @param data: the data passed to the _event.data variable (any data type)
+        @return: False if the bounded external queue dropped the event
         '''
-        self._send(name, data)
+        return self._send(name, data)
 
     def _send(self, name, data={}, invokeid=None, toQueue=None):
-        self.interpreter.send(name, data, invokeid, toQueue)
+        return self.interpreter.send(name, data, invokeid, toQueue)
 
     def In(self, statename):
         '''
@@ -175,11 +220,14 @@ class StateMachine(object):
     def on_exit(self, sender, final):
         if sender is self.interpreter:
             self.is_finished = True
+            timers = self.compiler.timers
             for timer in self.compiler.timer_mapping.values():
-                if bpy.app.timers.is_registered(timer):
-                    bpy.app.timers.unregister(timer)
+                if timers.is_registered(timer):
+                    timers.unregister(timer)
                 del timer
-            dispatcher.disconnect(self, DispatcherConstants.exit, self.interpreter)
+            self.interpreter.removeObserver(self)
+            self.registry.send(DispatcherConstants.exit, self, final=final)
+            self.registry.clear()
             dispatcher.send(DispatcherConstants.exit, self, final=final)
 
     def __enter__(self):
@@ -193,7 +241,10 @@ class StateMachine(object):
 
 class MultiSession(object):
 
-    def __init__(self, default_scxml_source=None, init_sessions={}, default_datamodel="python", log_function=default_logfunction):
+    def __init__(
+            self, default_scxml_source=None, init_sessions={}, default_datamodel="python", log_function=default_logfunction,
+            queue_size=0, queue_policy=QueuePolicy.block, queue_timeout=1.0, coalesce=None,
+            dependency_tracking=None):
         '''
         MultiSession is a local runtime environment for multiple StateMachine sessions. It's
         the base class for the PySCXMLServer. You probably won't need to instantiate it directly.
@@ -204,18 +255,29 @@ class MultiSession(object):
         make_session(key, value) on each init_sessions pair, thus initalizing
         a set of sessions. Set value to None as a shorthand for deferring to the
         default xml for that session.
+        @param queue_size, queue_policy, queue_timeout, coalesce, dependency_tracking: the external queue bound,
+        the coalescible events and the cond tracking of the sessions created from the sources (see StateMachine)
         '''
         self.default_scxml_source = default_scxml_source
         self.sm_mapping = {}
         self.get = self.sm_mapping.get
         self.default_datamodel = default_datamodel
         self.log_function = log_function
+        self.queue_size = queue_size
+        self.queue_policy = queue_policy
+        self.queue_timeout = queue_timeout
+        self.coalesce = coalesce
+        self.dependency_tracking = dependency_tracking
         self.logger = logging.getLogger("pyscxml.multisession")
+        # NOTE: the fleet metrics (see enable_metrics), sessionid -> metrics.SessionCounters
+        self.session_counters = None
+        self.metrics_sink = None
+        self.metrics_interval = 10.0
         for sessionid, xml in init_sessions.items():
             self.make_session(sessionid, xml)
 
     def __iter__(self):
-        return iter(list(self.sm_mapping.itervalues()))
+        return iter(list(self.sm_mapping.values()))
 
     def __delitem__(self, val):
         del self.sm_mapping[val]
@@ -244,22 +306,77 @@ class MultiSession(object):
         not been started, only initialized.
          '''
         assert source or self.default_scxml_source
-        if isinstance(source, str):
+        if not source or isinstance(source, str):
             sm = StateMachine(
                 source or self.default_scxml_source,
                 sessionid=sessionid,
                 default_datamodel=self.default_datamodel,
                 setup_session=False,
-                log_function=self.log_function)
+                log_function=self.log_function,
+                queue_size=self.queue_size,
+                queue_policy=self.queue_policy,
+                queue_timeout=self.queue_timeout,
+                coalesce=self.coalesce,
+                dependency_tracking=self.dependency_tracking)
         else:
             sm = source  # source is assumed to be a StateMachine instance
         self.sm_mapping[sessionid] = sm
 
         sm.datamodel.sessions = self
         self.set_processors(sm)
-        dispatcher.connect(self.on_sm_exit, DispatcherConstants.exit, sm)
+        sm.registry.connect(self.on_sm_exit, DispatcherConstants.exit, sm)
+        if self.session_counters is not None:
+            self.attach_counters(sessionid, sm)
         return sm
 
+    def attach_counters(self, sessionid, sm):
+        counters = self.session_counters[sessionid] = metrics.SessionCounters()
+        sm.interpreter.addObserver(counters)
+
+    def enable_metrics(self, sink=None, interval=10.0):
+        '''
+        Starts counting the events and the microsteps of the sessions
+        @param sink: metrics.PrometheusFileSink, metrics.PrometheusHttpSink or any object with write(text)
+        @param interval: seconds returned by export_metrics, so it can be registered in bpy.app.timers
+        '''
+        self.metrics_sink = sink
+        self.metrics_interval = interval
+        if self.session_counters is None:
+            self.session_counters = {}
+            for sessionid, sm in list(self.sm_mapping.items()):
+                self.attach_counters(sessionid, sm)
+
+    def disable_metrics(self):
+        if self.session_counters is not None:
+            for sessionid, counters in self.session_counters.items():
+                sm = self.sm_mapping.get(sessionid)
+                if sm is not None:
+                    sm.interpreter.removeObserver(counters)
+            self.session_counters = None
+        if self.metrics_sink is not None:
+            self.metrics_sink.close()
+            self.metrics_sink = None
+
+    def metrics_samples(self):
+        '''returns {sessionid: metric values} of the sessions (see metrics.session_sample)'''
+        p_counters = self.session_counters or {}
+        return {
+            sessionid: metrics.session_sample(sm, p_counters.get(sessionid))
+            for sessionid, sm in list(self.sm_mapping.items())}
+
+    def export_metrics(self):
+        '''
+        Writes the metrics of the sessions to the sink in the Prometheus text format
+        @return: the interval of the next export, None when the metrics are disabled
+        '''
+        if self.metrics_sink is None:
+            return None
+        try:
+            self.metrics_sink.write(metrics.render_prometheus(self.metrics_samples()))
+        except Exception as e:
+            self.logger.error(f"metrics export failed: {e}")
+        return self.metrics_interval
+
     def set_processors(self, sm):
         processors = {
             "scxml": {
@@ -271,12 +388,15 @@ class MultiSession(object):
 
     def send(self, event, data={}, to_session=None):
         '''send an event to the specified session. if to_session is None or "",
-        the event is sent to all active sessions.'''
+        the event is sent to all active sessions.
+        NOTE: every session copies the top level of dict data (see Interpreter.send),
+        list data is passed to the sessions as is
+        @return: the sessionids whose bounded external queues dropped the event'''
         if to_session:
-            self[to_session].send(event, data)
-        else:
-            for session in self.sm_mapping:
-                self.sm_mapping[session].send(event, data)
+            return [] if self[to_session].send(event, data) is not False else [to_session]
+        return [
+            sessionid for sessionid, sm in list(self.sm_mapping.items())
+            if sm.send(event, data) is False]
 
     def cancel(self):
         for sm in self:
@@ -286,6 +406,8 @@ class MultiSession(object):
         if sender.sessionid in self:
             self.logger.debug("The session '%s' finished" % sender.sessionid)
             del self[sender.sessionid]
+            if self.session_counters is not None:
+                self.session_counters.pop(sender.sessionid, None)
         else:
             self.logger.error(
                 "The session '%s' reported exit but it "
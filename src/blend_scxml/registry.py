@@ -0,0 +1,107 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Copyright 2024, Alex Zhornyak, alexander.zhornyak@gmail.com
+
+""" Scoped signal registries.
+
+The global louie dispatcher keeps its routing tables for the whole Blender
+session. The signals between a session and its invokes ('created',
+'invoke_log', 'init.invoke.*', ..., 'exit' of the StateMachine) are routed
+through the SignalRegistry of the owning StateMachine instead: the routes
+are released by disconnect_sender() when an invoke is cancelled and all at
+once by clear() when the session exits.
+"""
+
+# author="Patrick K. O'Brien and contributors",
+# url="https://github.com/11craft/louie/",
+# download_url="https://pypi.python.org/pypi/Louie",
+# license="BSD"
+from .louie import robustapply
+from .louie.sender import Anonymous, Any
+
+
+class SignalRegistry(object):
+    '''
+    Signal routing table of one session, receivers are called with louie
+    semantics (see louie.robustapply). Senders and receivers are strongly
+    referenced until they are disconnected or the registry is cleared.
+    '''
+
+    __slots__ = ("connections",)
+
+    def __init__(self):
+        # NOTE: { id(sender) : (sender, { signal : [receivers...] }) }
+        self.connections = {}
+
+    def __len__(self):
+        return len(self.connections)
+
+    def connect(self, receiver, signal, sender=Any):
+        entry = self.connections.get(id(sender))
+        if entry is None:
+            entry = self.connections[id(sender)] = (sender, {})
+        receivers = entry[1].setdefault(signal, [])
+        if receiver not in receivers:
+            receivers.append(receiver)
+
+    def disconnect(self, receiver, signal, sender=Any):
+        entry = self.connections.get(id(sender))
+        if entry is None:
+            return
+        signals = entry[1]
+        receivers = signals.get(signal)
+        if receivers and receiver in receivers:
+            receivers.remove(receiver)
+            if not receivers:
+                del signals[signal]
+                if not signals:
+                    del self.connections[id(sender)]
+
+    def disconnect_sender(self, sender):
+        '''removes all the routes of the sender'''
+        self.connections.pop(id(sender), None)
+
+    def clear(self):
+        '''removes all the routes, the registry may be used again'''
+        self.connections.clear()
+
+    def get_receivers(self, sender, signal):
+        '''returns the receivers of the signal from the sender followed by the receivers from Any'''
+        t_receivers = []
+        for senderkey in (id(sender), id(Any)):
+            entry = self.connections.get(senderkey)
+            if entry is not None:
+                receivers = entry[1].get(signal)
+                if receivers:
+                    t_receivers.extend(receivers)
+        return t_receivers
+
+    def send(self, signal, sender=Anonymous, *arguments, **named):
+        '''
+        Sends the signal from the sender to the connected receivers
+        @return: list of tuple pairs [(receiver, response), ...] like louie.dispatcher.send
+        '''
+        if not self.connections:
+            return []
+        responses = []
+        for receiver in self.get_receivers(sender, signal):
+            response = robustapply.robust_apply(
+                receiver, receiver, signal=signal, sender=sender, *arguments, **named)
+            responses.append((receiver, response))
+        return responses
@@ -0,0 +1,289 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Copyright 2024, Alex Zhornyak, alexander.zhornyak@gmail.com
+
+""" Deterministic replay of the recorded event streams.
+
+ReplayRecorder writes the events sent to a machine (StateMachine.send) with
+their data and timestamps, and the configuration after every macrostep,
+as json lines. Attach it right before the machine is started:
+
+    recorder = ReplayRecorder(sm, "/tmp/machine.replay")
+    sm.start()
+
+replay() feeds the recorded events to a fresh StateMachine which is stepped
+manually in the virtual time of ManualTimers: the delayed sends and the
+invoked sessions are fired when the virtual clock reaches them, so they are
+not fed from the recording, they are regenerated and verified. The report
+lists the macrosteps whose configuration differs from the recording and the
+time of every macrostep:
+
+    report = replay(source, "/tmp/machine.replay")
+    print(report.summary())
+
+The ordering of an input and a delayed event which are closer than one
+timer tick may differ from the recording.
+"""
+
+import json
+import time
+import heapq
+import logging
+import itertools
+
+from .observer import InterpreterObserver
+
+REPLAY_FORMAT = "blend_scxml.replay"
+REPLAY_VERSION = 1
+
+
+class ManualTimers(object):
+    '''
+    Scheduler with the bpy.app.timers interface which runs in the virtual time,
+    the functions are called only by fire_next()
+    '''
+
+    def __init__(self):
+        self.now = 0.0
+        # NOTE: (due time, order, function), the entries of unregistered functions are skipped
+        self.heap = []
+        self.functions = {}
+        self.counter = itertools.count()
+
+    def register(self, function, first_interval=0, persistent=False):
+        entry = (self.now + first_interval, next(self.counter), function)
+        self.functions[function] = entry
+        heapq.heappush(self.heap, entry)
+
+    def unregister(self, function):
+        if self.functions.pop(function, None) is None:
+            raise ValueError(f"Error: function is not registered: {function}")
+
+    def is_registered(self, function):
+        return function in self.functions
+
+    def next_due(self):
+        '''returns the due time of the next function or None'''
+        heap = self.heap
+        while heap and self.functions.get(heap[0][2]) is not heap[0]:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    def fire_next(self, until):
+        '''
+        Advances the clock to the next function which is due not later than 'until' and calls it,
+        the function is registered again if it returns the next interval
+        @return: False if nothing is due, the clock is advanced to 'until'
+        '''
+        due = self.next_due()
+        if due is None or due > until:
+            self.now = max(self.now, until)
+            return False
+
+        entry = heapq.heappop(self.heap)
+        function = entry[2]
+        del self.functions[function]
+        self.now = max(self.now, due)
+        interval = function()
+        if interval is not None and function not in self.functions:
+            self.register(function, interval)
+        return True
+
+
+class ReplayRecorder(InterpreterObserver):
+    '''
+    Records the inputs and the macrosteps of the machine for replay()
+    @param sm: the StateMachine, its 'send' is wrapped by the recorder
+    @param filepath: the recording, it is created or overwritten
+    '''
+
+    def __init__(self, sm, filepath):
+        self.sm = sm
+        self.filepath = filepath
+        self.logger = logging.getLogger("pyscxml.replay")
+        # NOTE: the type names of the values which were recorded as their repr, each is warned once
+        self.unserializable = set()
+        self.file = open(filepath, "w", encoding="utf-8")
+        self.start = time.monotonic()
+        self.write({
+            "format": REPLAY_FORMAT, "version": REPLAY_VERSION,
+            "document": sm.filename, "name": sm.name})
+
+        self.send = sm.send
+        sm.send = self.on_send
+        sm.interpreter.addObserver(self)
+
+    def write(self, p_line):
+        if self.file is not None:
+            self.file.write(json.dumps(p_line, default=self._json_default) + "\n")
+
+    def _json_default(self, value):
+        name = type(value).__name__
+        if name not in self.unserializable:
+            self.unserializable.add(name)
+            self.logger.warning(
+                f"'{self.filepath}': the value of type '{name}' is not json, "
+                f"it is recorded as its repr and is replayed as a string: {value!r}")
+        return repr(value)
+
+    def on_send(self, name, data={}):
+        t = time.monotonic() - self.start
+        result = self.send(name, data)
+        # NOTE: the events dropped by the bounded external queue are not inputs of the machine
+        if result is not False:
+            self.write({"t": t, "input": name, "data": data})
+        return result
+
+    def on_macrostep(self, interpreter, record):
+        self.write({
+            "t": time.monotonic() - self.start,
+            "macrostep": record.event.name if record.event is not None else None,
+            "configuration": sorted(state.id for state in interpreter.configuration)})
+
+    def on_exit(self, interpreter, final):
+        self.close()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            self.sm.send = self.send
+            self.sm.interpreter.removeObserver(self)
+
+
+def read_recording(filepath):
+    '''returns (header, lines) of the recording'''
+    with open(filepath, "r", encoding="utf-8") as f:
+        t_lines = [json.loads(line) for line in f if line.strip()]
+    if not t_lines or t_lines[0].get("format") != REPLAY_FORMAT or t_lines[0].get("version") != REPLAY_VERSION:
+        raise ValueError(f"'{filepath}' is not a replay recording of version {REPLAY_VERSION}")
+    return t_lines[0], t_lines[1:]
+
+
+class ReplayReport(InterpreterObserver):
+    '''
+    Collects the macrosteps of the replayed machine
+    - macrosteps: (event name, configuration) of each macrostep
+    - timings: seconds of each macrostep
+    - mismatches: (index, expected, actual) of the macrosteps which differ from the recording
+    '''
+
+    def __init__(self):
+        self.macrosteps = []
+        self.timings = []
+        self.mismatches = []
+        self.inputs = 0
+        self.mark = time.perf_counter()
+
+    def on_macrostep(self, interpreter, record):
+        now = time.perf_counter()
+        self.timings.append(now - self.mark)
+        self.macrosteps.append((
+            record.event.name if record.event is not None else None,
+            sorted(state.id for state in interpreter.configuration)))
+        self.mark = time.perf_counter()
+
+    def verify(self, t_expected):
+        for idx, expected in enumerate(t_expected):
+            actual = self.macrosteps[idx] if idx < len(self.macrosteps) else None
+            if actual != expected:
+                self.mismatches.append((idx, expected, actual))
+        for idx in range(len(t_expected), len(self.macrosteps)):
+            self.mismatches.append((idx, None, self.macrosteps[idx]))
+
+    @property
+    def ok(self):
+        return not self.mismatches
+
+    def summary(self, slowest=5):
+        t_sorted = sorted(self.timings)
+        count = len(t_sorted)
+
+        def percentile(p):
+            return t_sorted[min(count - 1, int(p * count))] if count else 0.0
+
+        return {
+            "ok": self.ok,
+            "inputs": self.inputs,
+            "macrosteps": count,
+            "mismatches": len(self.mismatches),
+            "first_mismatch": self.mismatches[0] if self.mismatches else None,
+            "total_s": sum(t_sorted),
+            "mean_s": sum(t_sorted) / count if count else 0.0,
+            "p50_s": percentile(0.5),
+            "p95_s": percentile(0.95),
+            "max_s": t_sorted[-1] if count else 0.0,
+            "slowest": [
+                (idx, self.macrosteps[idx][0], self.timings[idx])
+                for idx in sorted(range(count), key=self.timings.__getitem__, reverse=True)[:slowest]],
+        }
+
+
+def run_until_idle(interpreter):
+    '''steps the interpreter until its queues are empty'''
+    interpreter.externalQueueGuard = False
+    while interpreter.running and not interpreter.externalQueueGuard:
+        interpreter.mainEventLoop()
+    if not interpreter.running and not interpreter.exited:
+        interpreter.mainEventLoop()
+
+
+def replay(source, filepath, log_function=None, **kwargs):
+    '''
+    Replays the recording on a fresh StateMachine of the source
+    @param log_function: the <log> output, discarded by default to keep the timings clean
+    @param kwargs: the other StateMachine arguments, for example interpreter_class
+    @return: ReplayReport
+    '''
+    from .py_blend_scxml import StateMachine
+
+    _, t_lines = read_recording(filepath)
+
+    timers = ManualTimers()
+    sm = StateMachine(
+        source, log_function=log_function or (lambda label, msg: None),
+        setup_session=False, timers=timers, **kwargs)
+    report = ReplayReport()
+    interpreter = sm.interpreter
+    interpreter.addObserver(report)
+
+    report.mark = time.perf_counter()
+    sm._start()
+    run_until_idle(interpreter)
+
+    def advance(until):
+        while timers.fire_next(until):
+            report.mark = time.perf_counter()
+            run_until_idle(interpreter)
+
+    for p_line in t_lines:
+        if "input" not in p_line:
+            continue
+        advance(p_line["t"])
+        report.inputs += 1
+        sm.send(p_line["input"], p_line["data"])
+        report.mark = time.perf_counter()
+        run_until_idle(interpreter)
+
+    # NOTE: the delayed events after the last input
+    if t_lines:
+        advance(t_lines[-1]["t"])
+
+    report.verify([(x["macrostep"], x["configuration"]) for x in t_lines if "macrostep" in x])
+    return report
@@ -0,0 +1,279 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Copyright 2024, Alex Zhornyak, alexander.zhornyak@gmail.com
+
+""" State and transition coverage of the documents.
+
+CoverageMap preallocates one bit per state and per transition (source
+state id, transition index as in 'on_taking_transition') of a document and
+observes the interpreters, every entry and every taken transition sets its
+bit. The sessions of one document share the map, CoverageCollector keeps
+one map per document and merges them with the saved files, so the
+coverage accumulates across the sessions and the process restarts:
+
+    collector = CoverageCollector("/tmp/coverage")
+    collector.attach(sm)
+    ...
+    collector.save()
+
+The reports (see scxml_coverage.py launcher) are the SCXML source annotated
+with the coverage:hit attributes and an HTML page.
+"""
+
+import os
+import copy
+import json
+import html
+import hashlib
+from xml.etree import ElementTree as etree
+
+from .observer import InterpreterObserver
+
+COVERAGE_VERSION = 1
+COVERAGE_NAMESPACE = "http://www.blend-scxml.org/coverage"
+
+_scxml_ns = "http://www.w3.org/2005/07/scxml"
+_state_tags = frozenset(("state", "parallel", "final", "history"))
+
+
+def document_keys(doc):
+    '''returns (state ids, (source state id, transition index)) of the document in the document order'''
+    t_states = []
+    t_transitions = []
+    for node in doc.stateDict.values():
+        t_states.append(node.id)
+        for idx, _ in enumerate(getattr(node, "transition", ())):
+            t_transitions.append((node.id, idx))
+    return t_states, t_transitions
+
+
+class CoverageMap(InterpreterObserver):
+    '''
+    @param states: the state ids
+    @param transitions: (source state id, transition index) of the transitions
+    '''
+
+    def __init__(self, states, transitions, name=""):
+        self.name = name
+        self.states = list(states)
+        self.transitions = [tuple(x) for x in transitions]
+        self.bits = bytearray((len(self.states) + len(self.transitions) + 7) // 8)
+        # NOTE: key -> (byte index, bit mask)
+        self.state_masks = {key: (i >> 3, 1 << (i & 7)) for i, key in enumerate(self.states)}
+        offset = len(self.states)
+        self.transition_masks = {
+            key: ((offset + i) >> 3, 1 << ((offset + i) & 7)) for i, key in enumerate(self.transitions)}
+        self.fingerprint = hashlib.sha1(
+            json.dumps([self.states, self.transitions]).encode("utf-8")).hexdigest()
+
+    @classmethod
+    def from_document(cls, doc):
+        t_states, t_transitions = document_keys(doc)
+        return cls(t_states, t_transitions, name=doc.name)
+
+    def on_enter_state(self, interpreter, state):
+        mask = self.state_masks.get(state)
+        if mask is not None:
+            self.bits[mask[0]] |= mask[1]
+
+    def on_taking_transition(self, interpreter, state, transition_index):
+        mask = self.transition_masks.get((state, transition_index))
+        if mask is not None:
+            self.bits[mask[0]] |= mask[1]
+
+    def _is_set(self, mask):
+        return bool(self.bits[mask[0]] & mask[1])
+
+    def state_hit(self, state_id):
+        return self._is_set(self.state_masks[state_id])
+
+    def transition_hit(self, key):
+        return self._is_set(self.transition_masks[tuple(key)])
+
+    def merge(self, other):
+        '''sets the bits of the keys which are covered by the other map, the keys missing here are skipped'''
+        if other.fingerprint == self.fingerprint:
+            for i, byte in enumerate(other.bits):
+                self.bits[i] |= byte
+            return
+        for key, mask in other.state_masks.items():
+            if other._is_set(mask) and key in self.state_masks:
+                self.on_enter_state(None, key)
+        for key, mask in other.transition_masks.items():
+            if other._is_set(mask) and key in self.transition_masks:
+                self.on_taking_transition(None, *key)
+
+    def summary(self):
+        states_hit = sum(1 for mask in self.state_masks.values() if self._is_set(mask))
+        transitions_hit = sum(1 for mask in self.transition_masks.values() if self._is_set(mask))
+        return {
+            "states": len(self.states), "states_hit": states_hit,
+            "transitions": len(self.transitions), "transitions_hit": transitions_hit,
+        }
+
+    def to_dict(self):
+        return {
+            "version": COVERAGE_VERSION, "name": self.name, "fingerprint": self.fingerprint,
+            "states": self.states, "transitions": self.transitions, "bits": self.bits.hex()}
+
+    @classmethod
+    def from_dict(cls, p_dict):
+        if p_dict.get("version") != COVERAGE_VERSION:
+            raise ValueError(f"coverage of version {COVERAGE_VERSION} is expected")
+        coverage_map = cls(p_dict["states"], p_dict["transitions"], name=p_dict.get("name", ""))
+        bits = bytes.fromhex(p_dict["bits"])
+        coverage_map.bits[:len(bits)] = bits[:len(coverage_map.bits)]
+        return coverage_map
+
+    @classmethod
+    def load(cls, filepath):
+        with open(filepath, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+    def save(self, filepath, merge=True):
+        '''
+        Writes the map atomically
+        @param merge: the coverage of the existing file is merged first
+        '''
+        if merge and os.path.exists(filepath):
+            self.merge(CoverageMap.load(filepath))
+        s_tmp = filepath + ".tmp"
+        with open(s_tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(s_tmp, filepath)
+
+
+class CoverageCollector(object):
+    '''
+    Keeps one CoverageMap per document
+    @param directory: the directory of the saved maps, one file per document
+    '''
+
+    def __init__(self, directory="."):
+        self.directory = directory
+        # NOTE: fingerprint -> CoverageMap
+        self.maps = {}
+
+    def attach(self, sm):
+        '''starts the coverage of the StateMachine, call it before the machine is started'''
+        coverage_map = CoverageMap.from_document(sm.doc)
+        coverage_map = self.maps.setdefault(coverage_map.fingerprint, coverage_map)
+        sm.interpreter.addObserver(coverage_map)
+        return coverage_map
+
+    def detach(self, sm):
+        for coverage_map in self.maps.values():
+            sm.interpreter.removeObserver(coverage_map)
+
+    def filepath(self, coverage_map):
+        return os.path.join(
+            self.directory, f"{coverage_map.name or 'scxml'}_{coverage_map.fingerprint[:12]}.coverage.json")
+
+    def save(self):
+        '''merges the maps with the saved ones, returns the file paths'''
+        os.makedirs(self.directory, exist_ok=True)
+        t_paths = []
+        for coverage_map in self.maps.values():
+            filepath = self.filepath(coverage_map)
+            coverage_map.save(filepath)
+            t_paths.append(filepath)
+        return t_paths
+
+
+def _local_tag(elem):
+    return elem.tag.rsplit("}", 1)[-1] if isinstance(elem.tag, str) else ""
+
+
+def iter_coverage_elements(root):
+    '''
+    yields (element, state id) of the states and (element, (source state id, transition index))
+    of the transitions of the <scxml> element, the inline documents of <invoke> are skipped
+    '''
+    stack = [root]
+    while stack:
+        elem = stack.pop()
+        yield elem, elem.get("id")
+        transition_index = 0
+        t_children = []
+        for child in elem:
+            tag = _local_tag(child)
+            if tag in _state_tags:
+                t_children.append(child)
+            elif tag == "transition":
+                yield child, (elem.get("id"), transition_index)
+                transition_index += 1
+        stack.extend(reversed(t_children))
+
+
+def annotate_scxml(root, coverage_map):
+    '''
+    returns the SCXML source of the <scxml> element (Compiler.root)
+    with coverage:hit="true|false" on the states and the transitions
+    '''
+    etree.register_namespace("", _scxml_ns)
+    etree.register_namespace("coverage", COVERAGE_NAMESPACE)
+    root = copy.deepcopy(root)
+    s_attr = "{%s}hit" % COVERAGE_NAMESPACE
+    for elem, key in iter_coverage_elements(root):
+        if isinstance(key, tuple):
+            hit = key in coverage_map.transition_masks and coverage_map.transition_hit(key)
+        else:
+            hit = key in coverage_map.state_masks and coverage_map.state_hit(key)
+        elem.set(s_attr, "true" if hit else "false")
+    return etree.tostring(root, encoding="unicode")
+
+
+def html_report(coverage_map, root=None, title=None):
+    '''returns the HTML page of the coverage, the transitions are described by the <scxml> element if any'''
+    p_transitions = {}
+    if root is not None:
+        for elem, key in iter_coverage_elements(root):
+            if isinstance(key, tuple):
+                p_transitions[key] = " ".join(
+                    f"{attr}=\"{elem.get(attr)}\"" for attr in ("event", "cond", "target") if elem.get(attr))
+
+    p_summary = coverage_map.summary()
+
+    def percent(hit, total):
+        return 100.0 * hit / total if total else 100.0
+
+    def row(hit, *cells):
+        s_cells = "".join(f"<td>{html.escape(str(x))}</td>" for x in cells)
+        return f'<tr class="{"hit" if hit else "miss"}">{s_cells}<td>{"yes" if hit else "no"}</td></tr>'
+
+    title = html.escape(title or coverage_map.name or "scxml")
+    t_lines = [
+        "<!DOCTYPE html>",
+        f"<html><head><meta charset=\"utf-8\"><title>Coverage of {title}</title>",
+        "<style>body{font-family:sans-serif} table{border-collapse:collapse} td,th{border:1px solid #ccc;padding:2px 8px}"
+        " tr.hit{background:#dfd} tr.miss{background:#fdd}</style></head><body>",
+        f"<h1>Coverage of {title}</h1>",
+        "<p>States: %d of %d (%.1f%%), transitions: %d of %d (%.1f%%)</p>" % (
+            p_summary["states_hit"], p_summary["states"], percent(p_summary["states_hit"], p_summary["states"]),
+            p_summary["transitions_hit"], p_summary["transitions"],
+            percent(p_summary["transitions_hit"], p_summary["transitions"])),
+        "<h2>States</h2><table><tr><th>state</th><th>covered</th></tr>",
+    ]
+    for state_id in coverage_map.states:
+        t_lines.append(row(coverage_map.state_hit(state_id), state_id))
+    t_lines.append("</table><h2>Transitions</h2><table><tr><th>source</th><th>index</th><th>transition</th><th>covered</th></tr>")
+    for key in coverage_map.transitions:
+        t_lines.append(row(coverage_map.transition_hit(key), key[0], key[1], p_transitions.get(key, "")))
+    t_lines.append("</table></body></html>")
+    return "\n".join(t_lines)
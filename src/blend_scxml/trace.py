@@ -0,0 +1,257 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Copyright 2024, Alex Zhornyak, alexander.zhornyak@gmail.com
+
+""" Flight recorder of the microsteps.
+
+TraceRecorder is an interpreter observer which writes one fixed-size slot
+per microstep into a memory-mapped ring file, the oldest slots are
+overwritten. The names are replaced by ids, the id -> name lines are
+appended to the '<filepath>.names' file when a name is seen first.
+
+    sm.interpreter.addObserver(TraceRecorder("/tmp/machine.trace"))
+    ...
+    for record in read_trace("/tmp/machine.trace"):
+        print(record)
+
+File layout, little-endian:
+    header: 4s magic, H version, H slot size, I slot count, Q next sequence number (updated by flush)
+    slot:   Q timestamp ns (time.monotonic_ns), Q sequence number (0 - empty slot),
+            H event id (0xFFFF - eventless), B exited count, B entered count,
+            B transitions count, B flags (1 - the ids or the counts were truncated),
+            H ids[]: exited state ids, entered state ids, (source state id, transition index) pairs
+
+The counts above 255 are clamped with the truncated flag. The names after
+the first 0xFFFE ones of a kind, and the transition indexes above it, are
+recorded as UNKNOWN_ID. The recorder never raises into the interpreter,
+the microsteps which can't be packed are counted in 'errors'.
+
+The slot after the sequence number depends only on the names of the
+microstep, it is packed once and kept in 'tails' (up to MAX_TAILS distinct
+microsteps), a repeated microstep costs one pack_into of the timestamp,
+the sequence number and the cached bytes. The budget of 1 us per microstep
+is a known marginal miss: a repeated microstep takes 0.8-1.5 us and a new
+one 4-5 us on a slow single CPU, see benchmarks/bench_trace.py.
+"""
+
+import os
+import mmap
+import time
+import struct
+import logging
+
+from .observer import InterpreterObserver
+
+TRACE_MAGIC = b"SCXT"
+TRACE_VERSION = 1
+
+NO_EVENT = 0xFFFF
+UNKNOWN_ID = 0xFFFE
+MAX_COUNT = 0xFF
+FLAG_TRUNCATED = 1
+# NOTE: the distinct microsteps whose packed slots are cached, the others are packed every time
+MAX_TAILS = 4096
+
+_header = struct.Struct("<4sHHIQ")
+_slot_header = struct.Struct("<QQHBBBB")
+_slot_prefix = struct.Struct("<QQ")
+HEADER_SIZE = _header.size
+
+
+class TraceRecorder(InterpreterObserver):
+    '''
+    @param filepath: the ring file, it is created or overwritten
+    @param slots: the count of the recorded microsteps before the oldest ones are overwritten
+    @param slot_size: bytes per microstep, the ids over the slot capacity are truncated
+    '''
+
+    def __init__(self, filepath, slots=65536, slot_size=64):
+        self.filepath = filepath
+        self.slots = slots
+        self.slot_size = slot_size
+        self.capacity = (slot_size - _slot_header.size) // 2
+        self.sequence = 0
+        # NOTE: the rest of the slot header and the ids, one struct per count of the ids
+        self.tail_structs = [
+            struct.Struct("<" + _slot_header.format[len(_slot_prefix.format):] + "%dH" % n)
+            for n in range(self.capacity + 1)]
+        # NOTE: (event name, exited, entered, transitions) -> the packed rest of the slot
+        self.tails = {}
+        self.slot_struct = struct.Struct("%s%ds" % (_slot_prefix.format, slot_size - _slot_prefix.size))
+        # NOTE: bound once, they are called on every microstep
+        self.pack_slot = self.slot_struct.pack_into
+        self.clock = time.monotonic_ns
+
+        size = _header.size + slots * slot_size
+        with open(filepath, "wb") as f:
+            f.truncate(size)
+        self.file = open(filepath, "r+b")
+        self.mm = mmap.mmap(self.file.fileno(), size)
+        _header.pack_into(self.mm, 0, TRACE_MAGIC, TRACE_VERSION, slot_size, slots, 0)
+
+        # NOTE: name -> id, the new names are appended to the names file by 'declare'
+        self.names = open(filepath + ".names", "w", encoding="utf-8")
+        self.events = {}
+        self.states = {}
+        # NOTE: True after a name got UNKNOWN_ID, the slots are checked for it then
+        self.unknown_names = False
+        self.errors = 0
+        self.logger = logging.getLogger("pyscxml.trace")
+
+    def declare(self, record):
+        '''assigns the ids of the names of the record which are seen first'''
+        t_lines = []
+        t_states = record.exited + record.entered + [state for state, _ in record.transitions]
+        for table, kind, t_names in (
+                (self.states, "state", t_states),
+                (self.events, "event", [record.event.name] if record.event is not None else [])):
+            for name in t_names:
+                if name not in table:
+                    if len(table) >= UNKNOWN_ID:
+                        table[name] = UNKNOWN_ID
+                        self.unknown_names = True
+                        continue
+                    table[name] = len(table)
+                    t_lines.append(f"{kind}\t{table[name]}\t{name}\n")
+        self.names.writelines(t_lines)
+        self.names.flush()
+
+    def on_microstep(self, interpreter, record):
+        mm = self.mm
+        if mm is None:
+            return
+        # NOTE: the hot path of every microstep, one dict lookup and one pack_into
+        try:
+            event = record.event
+            key = (
+                None if event is None else event.name,
+                tuple(record.exited), tuple(record.entered), tuple(record.transitions))
+            tail = self.tails.get(key)
+            if tail is None:
+                tail = self.pack_tail(record)
+                if len(self.tails) < MAX_TAILS:
+                    self.tails[key] = tail
+            self.sequence = sequence = self.sequence + 1
+            self.pack_slot(mm, HEADER_SIZE + (sequence % self.slots) * self.slot_size, self.clock(), sequence, tail)
+        except Exception as e:
+            self.errors += 1
+            if self.errors == 1:
+                self.logger.error(f"The microstep can't be recorded to '{self.filepath}': {e}")
+
+    def pack_tail(self, record):
+        '''returns the packed slot of the record after the timestamp and the sequence number'''
+        states = self.states
+        exited, entered, transitions = record.exited, record.entered, record.transitions
+        flags = 0
+        if len(exited) > MAX_COUNT or len(entered) > MAX_COUNT or len(transitions) > MAX_COUNT:
+            exited, entered, transitions = exited[:MAX_COUNT], entered[:MAX_COUNT], transitions[:MAX_COUNT]
+            flags = FLAG_TRUNCATED
+        t_ids = []
+        append = t_ids.append
+        try:
+            for state in exited:
+                append(states[state])
+            for state in entered:
+                append(states[state])
+            for state, transition_index in transitions:
+                append(states[state])
+                append(transition_index if transition_index < UNKNOWN_ID else UNKNOWN_ID)
+            event = record.event
+            event_id = NO_EVENT if event is None else self.events[event.name]
+        except KeyError:
+            self.declare(record)
+            return self.pack_tail(record)
+
+        if len(t_ids) > self.capacity:
+            del t_ids[self.capacity:]
+            flags = FLAG_TRUNCATED
+        if self.unknown_names and (event_id == UNKNOWN_ID or UNKNOWN_ID in t_ids):
+            flags = FLAG_TRUNCATED
+
+        return self.tail_structs[len(t_ids)].pack(
+            event_id, len(exited), len(entered), len(transitions), flags, *t_ids)
+
+    def on_exit(self, interpreter, final):
+        self.flush()
+
+    def flush(self):
+        if self.mm is not None:
+            _header.pack_into(self.mm, 0, TRACE_MAGIC, TRACE_VERSION, self.slot_size, self.slots, self.sequence + 1)
+            self.mm.flush()
+
+    def close(self):
+        if self.mm is not None:
+            self.flush()
+            self.mm.close()
+            self.mm = None
+            self.file.close()
+            self.names.close()
+
+
+def read_names(filepath):
+    '''returns ({event id: name}, {state id: name}) of the trace'''
+    events, states = {}, {}
+    names_path = filepath + ".names"
+    if os.path.exists(names_path):
+        with open(names_path, "r", encoding="utf-8") as f:
+            for line in f:
+                kind, name_id, name = line.rstrip("\n").split("\t", 2)
+                (events if kind == "event" else states)[int(name_id)] = name
+    return events, states
+
+
+def read_trace(filepath):
+    '''
+    yields the recorded microsteps from the oldest one as dicts with the keys
+    sequence, timestamp_ns, event, exited, entered, transitions, truncated,
+    the names of UNKNOWN_ID are None
+    '''
+    events, states = read_names(filepath)
+    events[UNKNOWN_ID] = None
+    states[UNKNOWN_ID] = None
+    with open(filepath, "rb") as f:
+        data = f.read()
+
+    magic, version, slot_size, slots, _ = _header.unpack_from(data, 0)
+    if magic != TRACE_MAGIC or version != TRACE_VERSION:
+        raise ValueError(f"'{filepath}' is not a trace file of version {TRACE_VERSION}")
+
+    t_slots = []
+    for i in range(slots):
+        offset = _header.size + i * slot_size
+        timestamp, sequence, event_id, n_exited, n_entered, n_transitions, flags = _slot_header.unpack_from(data, offset)
+        if sequence:
+            t_slots.append((sequence, offset, timestamp, event_id, n_exited, n_entered, n_transitions, flags))
+    t_slots.sort()
+
+    capacity = (slot_size - _slot_header.size) // 2
+    for sequence, offset, timestamp, event_id, n_exited, n_entered, n_transitions, flags in t_slots:
+        t_ids = struct.unpack_from("<%dH" % capacity, data, offset + _slot_header.size)
+        exited = t_ids[:n_exited]
+        entered = t_ids[n_exited: n_exited + n_entered]
+        t_pairs = t_ids[n_exited + n_entered: n_exited + n_entered + 2 * n_transitions]
+        yield {
+            "sequence": sequence,
+            "timestamp_ns": timestamp,
+            "event": None if event_id == NO_EVENT else events.get(event_id, event_id),
+            "exited": [states.get(x, x) for x in exited],
+            "entered": [states.get(x, x) for x in entered],
+            "transitions": [(states.get(t_pairs[i], t_pairs[i]), t_pairs[i + 1]) for i in range(0, len(t_pairs) - 1, 2)],
+            "truncated": bool(flags & FLAG_TRUNCATED),
+        }
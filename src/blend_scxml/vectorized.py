@@ -0,0 +1,183 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Copyright 2024, Alex Zhornyak, alexander.zhornyak@gmail.com
+
+""" Multi-instance engine for event-only charts.
+
+Steps N identical instances of one chart at once. Every distinct
+configuration (together with its history values) gets a small integer
+index and each event has a transition table which maps a configuration
+index to the configuration after the macrostep. The tables are filled
+lazily by the regular Interpreter of a probe StateMachine, so the semantics
+are the scalar ones, and every following step is a NumPy gather.
+
+The chart must not have datamodel side effects: executable content is
+executed only the first time a configuration meets an event.
+"""
+
+import queue
+
+import numpy as np
+
+from .compiler import prepend_ns
+from .datastructures import OrderedSet
+from .py_blend_scxml import StateMachine
+
+
+# NOTE: elements which make a macrostep depend on more than the configuration
+unsupportedTags = frozenset(prepend_ns(tag) for tag in [
+    "datamodel", "data", "assign", "script", "send", "cancel", "foreach", "invoke"])
+
+NO_EVENT = -1
+
+
+class VectorizedMachine(object):
+    '''
+    Runs 'count' instances of the same event-only chart.
+    @param source: an scxml document source (see StateMachine for the format).
+    '''
+
+    def __init__(self, source, count, log_function=None, filedir="", filename=""):
+        self.probe = StateMachine(
+            source, log_function=log_function or (lambda label, msg: None),
+            setup_session=False, filedir=filedir, filename=filename)
+
+        for elem in self.probe.compiler.root.iter():
+            if elem.tag in unsupportedTags:
+                raise NotImplementedError(
+                    "The element '%s' is not supported by the vectorized engine." % elem.tag.split("}")[-1])
+
+        self.doc = self.probe.doc
+        self.interpreter = self.probe.interpreter
+        self.state_ids = sorted(self.doc.stateDict, key=lambda x: self.doc.stateDict[x].n)
+        self.state_index = {s_id: i for i, s_id in enumerate(self.state_ids)}
+
+        self.keys = []
+        self.key_index = {}
+        self.bits = np.zeros((16, len(self.state_ids)), dtype=bool)
+        self.finished = np.zeros(16, dtype=bool)
+
+        self.event_names = []
+        self.event_index = {}
+        self.tables = []
+
+        self.probe._start()
+        if self.interpreter.running:
+            self.interpreter.mainEventLoop()
+        initial = self.add_key(self.get_key())
+        self.configuration = np.full(count, initial, dtype=np.int32)
+
+    @property
+    def count(self):
+        return len(self.configuration)
+
+    def event_id(self, name):
+        '''Returns the integer id of the event name, which is used by step_all'''
+        idx = self.event_index.get(name)
+        if idx is None:
+            idx = self.event_index[name] = len(self.event_names)
+            self.event_names.append(name)
+            self.tables.append(np.full(len(self.bits), -1, dtype=np.int32))
+        return idx
+
+    def step_all(self, event_ids):
+        '''
+        Takes one macrostep in every instance.
+        @param event_ids: a sequence of 'count' event ids, NO_EVENT skips the instance
+        '''
+        event_ids = np.asarray(event_ids)
+        if event_ids.shape != self.configuration.shape:
+            raise ValueError("Expected %d event ids, got %d" % (len(self.configuration), len(event_ids)))
+
+        for event in np.unique(event_ids[event_ids != NO_EVENT]):
+            idx = np.nonzero(event_ids == event)[0]
+            current = self.configuration[idx]
+            table = self.tables[event]
+            for key in np.unique(current[table[current] < 0]):
+                target = self.discover(int(key), self.event_names[event])
+                table = self.tables[event]
+                table[key] = target
+            self.configuration[idx] = table[current]
+
+    def send_all(self, name):
+        '''Sends the same event to every instance'''
+        self.step_all(np.full(self.count, self.event_id(name), dtype=np.int32))
+
+    def In(self, statename):
+        '''Returns the boolean array of the instances which are in the state'''
+        return self.bits[self.configuration, self.state_index[statename]]
+
+    def configuration_bits(self):
+        '''Returns (count x len(state_ids)) boolean array of active states'''
+        return self.bits[self.configuration]
+
+    def isFinished(self):
+        '''
+        Returns the boolean array of the instances which reached top-level final state.
+        NOTE: finished instances keep their final configuration
+        '''
+        return self.finished[self.configuration]
+
+    def getConfigurationIDs(self, instance):
+        return [s_id for s_id in self.keys[self.configuration[instance]][0] if s_id != "__main__"]
+
+    def get_key(self):
+        return (
+            tuple(s.id for s in self.interpreter.configuration),
+            tuple(sorted((h_id, tuple(s.id for s in states)) for h_id, states in self.interpreter.historyValue.items())),
+            not self.interpreter.running)
+
+    def set_key(self, key):
+        s_ids, history, _ = key
+        getState = self.doc.getState
+        self.interpreter.configuration = OrderedSet(getState(s_id) for s_id in s_ids)
+        self.interpreter.historyValue = {h_id: [getState(s_id) for s_id in states] for h_id, states in history}
+        self.interpreter.running = True
+        self.interpreter.externalQueueGuard = False
+        self.interpreter.internalQueue = queue.Queue()
+        self.interpreter.statesToInvoke.clear()
+
+    def add_key(self, key):
+        idx = self.key_index.get(key)
+        if idx is not None:
+            return idx
+
+        idx = self.key_index[key] = len(self.keys)
+        self.keys.append(key)
+        if idx == len(self.bits):
+            self.bits = np.concatenate([self.bits, np.zeros_like(self.bits)])
+            self.finished = np.concatenate([self.finished, np.zeros_like(self.finished)])
+            self.tables = [np.concatenate([table, np.full_like(table, -1)]) for table in self.tables]
+        for s_id in key[0]:
+            self.bits[idx, self.state_index[s_id]] = True
+        self.finished[idx] = key[2]
+        return idx
+
+    def discover(self, key, event):
+        '''Runs the macrostep of the scalar interpreter for the configuration and the event'''
+        if self.keys[key][2]:
+            # NOTE: finished instances do not accept events
+            return key
+
+        self.set_key(self.keys[key])
+        self.interpreter.send(event)
+        self.interpreter.mainEventLoop()
+        if self.interpreter.running:
+            self.interpreter.mainEventLoop()
+        return self.add_key(self.get_key())